@@ -13,29 +13,87 @@ Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
 import datetime
 import json
+import re
+import time
+from typing import Iterable, Optional
 
 from contract import TermContract, MTMContract, PrepaidContract
 from customer import Customer
+from eventstream import stream_data
+from filter import ResetFilter
 from phoneline import PhoneLine
-from visualizer import Visualizer
 from call import Call
+from callstore import CallStore
+from ledger import BillLedger
+from registry import NumberRegistry
 
+# Format of the "time" field of every event in the dataset
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 
-def import_data() -> dict[str, list[dict]]:
-    """ Open the file <dataset.json> which stores the json data, and return
+# Dataset shown by the application
+DATASET_FILE = "dataset.json"
+
+# Directory of the snapshot of the processed dataset, saved and reused by the
+# application, and of its memory-mapped call columns, which are shared by all
+# the processes using the snapshot (see snapshot.snapshot_paths). If None,
+# they are saved next to the dataset.
+SNAPSHOT_DIR = None
+
+# Exact shape of a TIME_FORMAT timestamp with zero-padded fields, the only
+# shape that parse_timestamp hands to its fast path
+_TIMESTAMP_SHAPE = re.compile(r'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d', re.ASCII)
+
+
+def import_data(filename: str = DATASET_FILE, stream: bool = False,
+                start_event: int = 0) -> dict[str, Iterable[dict]]:
+    """ Open the file <filename> which stores the json data, and return
     a dictionary that stores this data in a format as described in the A1
     handout.
 
-    Precondition: the dataset file must be in the json format.
+    If <stream> is True, the file is not loaded into memory. Instead, the
+    "customers" and "events" values are iterators which read the records one
+    at a time; see eventstream.stream_data. Such a dictionary can be passed to
+    create_customers() and then process_event_history(), in that order.
+
+    The "events" start at the event at index <start_event>, e.g. the first
+    event after an EventCursor. When streaming, the events before it are
+    skipped without being decoded.
+
+    Precondition: the dataset file must be in the json format, or in the
+    JSON-Lines format (with a .jsonl extension) if <stream> is True.
     """
-    with open("dataset.json") as o:
+    if stream:
+        return stream_data(filename, start_event)
+    with open(filename) as o:
         log = json.load(o)
+        if start_event > 0:
+            log['events'] = log['events'][start_event:]
         return log
 
 
-def create_customers(log: dict[str, list[dict]]) -> list[Customer]:
+def parse_timestamp(timestamp: str) -> datetime.datetime:
+    """ Return the datetime for the event time <timestamp>, which is in the
+    TIME_FORMAT format (e.g. "2018-01-03 02:14:31").
+
+    Timestamps of exactly that shape, with every field zero-padded, are
+    parsed with datetime.fromisoformat, which is much faster than strptime.
+    Anything else falls back to strptime, so a timestamp is accepted (or
+    rejected with a ValueError) exactly as strptime with TIME_FORMAT would.
+    """
+    if _TIMESTAMP_SHAPE.fullmatch(timestamp):
+        return datetime.datetime.fromisoformat(timestamp)
+    return datetime.datetime.strptime(timestamp, TIME_FORMAT)
+
+
+def create_customers(log: dict[str, Iterable[dict]],
+                     ledger: Optional[BillLedger] = None,
+                     registry: Optional[NumberRegistry] = None) \
+        -> list[Customer]:
     """ Returns a list of Customer instances for each customer from the input
-    dataset from the dictionary <log>.
+    dataset from the dictionary <log>. If <ledger> is given, the bills of
+    every phone line are stored in it. If <registry> is given, the number of
+    every phone line is registered in it, and the line keeps the registry's
+    string for its number.
 
     Precondition:
     - The <log> dictionary contains the input data in the correct format,
@@ -57,23 +115,49 @@ def create_customers(log: dict[str, list[dict]]) -> list[Customer]:
             else:
                 print("ERROR: unknown contract type")
 
-            line = PhoneLine(line['number'], contract)
+            number = line['number']
+            if registry is not None:
+                number = registry.canonical(number)
+            line = PhoneLine(number, contract, ledger)
             customer.add_phone_line(line)
         customer_list.append(customer)
     return customer_list
 
 
-def find_customer_by_number(number: str, customer_list: list[Customer]) \
-        -> Customer:
+def build_number_index(customer_list: list[Customer]) \
+        -> tuple[dict[str, Customer], dict[str, PhoneLine]]:
+    """ Return a tuple of two dictionaries built from <customer_list>:
+    (number -> Customer that owns it, number -> PhoneLine for that number)
+
+    Building the index is linear in the total number of phone lines, and it
+    lets every event be routed to its customer in constant time instead of
+    scanning all customers.
+    """
+    customer_index = {}
+    line_index = {}
+    for customer in customer_list:
+        for line in customer.get_phone_lines():
+            customer_index[line.get_number()] = customer
+            line_index[line.get_number()] = line
+    return customer_index, line_index
+
+
+def find_customer_by_number(number: str, customer_list: list[Customer],
+                            customer_index: Optional[dict[str, Customer]]
+                            = None) -> Optional[Customer]:
     """ Return the Customer with the phone number <number> in the list of
     customers <customer_list>.
     If the number does not belong to any customer, return None.
+
+    If <customer_index> (as built by build_number_index) is given, it is used
+    instead of scanning <customer_list>.
     """
-    cust = None
+    if customer_index is not None:
+        return customer_index.get(number)
     for customer in customer_list:
         if number in customer:
-            cust = customer
-    return cust
+            return customer
+    return None
 
 
 def new_month(customer_list: list[Customer], month: int, year: int) -> None:
@@ -84,8 +168,88 @@ def new_month(customer_list: list[Customer], month: int, year: int) -> None:
         cust.new_month(month, year)
 
 
-def process_event_history(log: dict[str, list[dict]],
-                          customer_list: list[Customer]) -> None:
+class IngestStats:
+    """ Counters for the time spent in each phase of process_event_history.
+
+    === Public Attributes ===
+    events:
+         number of events processed
+    month_changes:
+         number of times all customers were advanced to a new month
+    month_time:
+         seconds spent advancing customers to a new month
+    billing_time:
+         seconds spent creating calls and registering (and billing) them with
+         the customers involved
+    """
+    events: int
+    month_changes: int
+    month_time: float
+    billing_time: float
+
+    def __init__(self) -> None:
+        """ Create a new IngestStats with all counters at zero.
+        """
+        self.events = 0
+        self.month_changes = 0
+        self.month_time = 0.0
+        self.billing_time = 0.0
+
+    def __str__(self) -> str:
+        """ Return a one-line report of these counters.
+        """
+        return f'events: {self.events}  month changes: {self.month_changes}' \
+               f'  month advancement: {self.month_time:.3f}s' \
+               f'  billing: {self.billing_time:.3f}s'
+
+
+class EventCursor:
+    """ The position in a chronological event log up to which the events have
+    been processed, so that processing can later resume after it.
+
+    The position is the index of the next event in the log, so that the
+    events before it can be skipped without parsing them (see import_data).
+
+    === Public Attributes ===
+    time:
+         time of the last processed event, or None if no event was processed
+    index:
+         number of events of the log processed so far
+    """
+    time: Optional[datetime.datetime]
+    index: int
+
+    def __init__(self, event_time: Optional[datetime.datetime] = None,
+                 index: int = 0) -> None:
+        """ Create a cursor after the first <index> events of the log, the
+        last of which has the time <event_time> (None if <index> is 0).
+        """
+        self.time = event_time
+        self.index = index
+
+    def advance(self, event_time: datetime.datetime) -> None:
+        """ Record that the next event, which has the time <event_time>, was
+        processed.
+
+        Raise a ValueError if the event is older than the last processed
+        event, e.g. when resuming on a log that does not start with the
+        events this cursor counted.
+        """
+        if self.time is not None and event_time < self.time:
+            raise ValueError(f'event at {event_time} is older than the last '
+                             f'processed event, at {self.time}')
+        self.time = event_time
+        self.index += 1
+
+
+def process_event_history(log: dict[str, Iterable[dict]],
+                          customer_list: list[Customer],
+                          customer_index: Optional[dict[str, Customer]]
+                          = None,
+                          stats: Optional[IngestStats] = None,
+                          store: Optional[CallStore] = None,
+                          cursor: Optional[EventCursor] = None,
+                          registry: Optional[NumberRegistry] = None) -> None:
     """ Process the calls from the <log> dictionary. The <customer_list>
     list contains all the customers that exist in the <log> dictionary.
 
@@ -96,6 +260,27 @@ def process_event_history(log: dict[str, list[dict]],
     function, everytime a new month is detected for the current event you are
     extracting.
 
+    The current (month, year) is remembered between events, so customers are
+    only advanced when an event falls in a different month than the previous
+    one. If <stats> is given, the time spent in each phase is added to it.
+
+    If <store> is given, the calls are added to it and registered as CallRow
+    views, instead of being created as separate Call objects.
+
+    Every phone number is interned in <registry> (the registry of <store>
+    if a store is given, or a new one if None): all the calls share one
+    string per number, and each event is routed by the integer ids of its
+    numbers straight to the phone lines, which are looked up in a list. If
+    <store> shares <registry>, the calls are added to it by these ids too.
+
+    If <cursor> is given, it is advanced past each event processed. To
+    resume from a cursor (e.g. restored from a checkpoint), the <log> must
+    only hold the events after it; see import_data.
+
+    The calls of each phone line are billed in one batch per month (see
+    PhoneLine.bill_calls), when the next month starts or all the events are
+    processed, with the same result as billing them one by one.
+
     Preconditions:
     - All calls are ordered chronologically (based on the call's date and time),
     when retrieved from the dictionary <log>, as specified in the handout.
@@ -104,37 +289,110 @@ def process_event_history(log: dict[str, list[dict]],
     - The <log> dictionary is in the correct format, as defined in the
     handout.
     - The <customer_list> already contains all the customers from the <log>.
+    - If <customer_index> is given, it maps every number in <customer_list>
+    to its owner, as built by build_number_index. Otherwise it is built here.
     """
+    if customer_index is None:
+        customer_index = build_number_index(customer_list)[0]
+    if registry is None:
+        registry = store.registry if store is not None else NumberRegistry()
+    lines = _lines_by_id(customer_index, registry)
+    by_id = store is not None and store.registry is registry
+    current_month = None
+    # The durations of the calls made this month on each line, not billed yet
+    unbilled = {}
     for event_data in log['events']:
-        billing_date = datetime.datetime.strptime(event_data['time'],
-                                                  "%Y-%m-%d %H:%M:%S")
-        new_month(customer_list, billing_date.month, billing_date.year)
+        start = time.perf_counter() if stats is not None else 0.0
+        billing_date = parse_timestamp(event_data['time'])
+        if cursor is not None:
+            cursor.advance(billing_date)
+        if (billing_date.month, billing_date.year) != current_month:
+            current_month = (billing_date.month, billing_date.year)
+            _bill_unbilled(unbilled)
+            new_month(customer_list, billing_date.month, billing_date.year)
+            if stats is not None:
+                stats.month_changes += 1
+                now = time.perf_counter()
+                stats.month_time += now - start
+                start = now
         if event_data['type'] == "call":
             # Create call object
-            sn = event_data['src_number']
-            dn = event_data['dst_number']
-            time = datetime.datetime.strptime(event_data['time'],
-                                              "%Y-%m-%d %H:%M:%S")
+            src_id = registry.intern(event_data['src_number'])
+            dst_id = registry.intern(event_data['dst_number'])
+            sn = registry.numbers[src_id]
+            dn = registry.numbers[dst_id]
+            call_time = billing_date
             duration = event_data['duration']
             sl = (event_data['src_loc'][0], event_data['src_loc'][1])
             dl = (event_data['dst_loc'][0], event_data['dst_loc'][1])
-            call = Call(sn, dn, time, duration, sl, dl)
-            # Assign the call to the customer
-            customer_send = find_customer_by_number(sn, customer_list)
-            customer_receive = find_customer_by_number(dn, customer_list)
-            customer_send.make_call(call)
-            customer_receive.receive_call(call)
+            if by_id:
+                call = store.add_ids(src_id, dst_id, call_time, duration, sl,
+                                     dl)
+            elif store is None:
+                call = Call(sn, dn, call_time, duration, sl, dl)
+            else:
+                call = store.add(sn, dn, call_time, duration, sl, dl)
+            # Assign the call to the phone lines of its customers
+            src_line = lines[src_id]
+            src_line.record_call(call)
+            if src_line in unbilled:
+                unbilled[src_line].append(duration)
+            else:
+                unbilled[src_line] = [duration]
+            lines[dst_id].receive_call(call)
+        if stats is not None:
+            stats.events += 1
+            stats.billing_time += time.perf_counter() - start
+    start = time.perf_counter() if stats is not None else 0.0
+    _bill_unbilled(unbilled)
+    if stats is not None:
+        stats.billing_time += time.perf_counter() - start
+
+
+def _bill_unbilled(unbilled: dict[PhoneLine, list[int]]) -> None:
+    """ Bill the calls of each phone line in <unbilled>, which maps the line
+    to the durations of its calls not billed yet, and empty <unbilled>.
+    """
+    for line, durations in unbilled.items():
+        line.bill_calls(durations)
+    unbilled.clear()
+
+
+def _lines_by_id(customer_index: dict[str, Customer],
+                 registry: NumberRegistry) -> list[Optional[PhoneLine]]:
+    """ Return a list where the item at position i is the PhoneLine of the
+    phone number with id i in <registry>, from the Customer that owns it
+    according to <customer_index>, or None if the number is not in
+    <customer_index>. Every number in <customer_index> is registered first.
+    """
+    ids = [(registry.intern(number), customer.get_phone_line(number))
+           for number, customer in customer_index.items()]
+    lines = [None] * len(registry)
+    for nid, line in ids:
+        lines[nid] = line
+    return lines
 
 
 if __name__ == '__main__':
+    # Imported here so that loading and billing never require pygame
+    from visualizer import Visualizer
+
     v = Visualizer()
     print("Toronto map coordinates:")
     print("  Lower-left corner: -79.697878, 43.576959")
     print("  Upper-right corner: -79.196382, 43.799568")
 
-    input_dictionary = import_data()
-    customers = create_customers(input_dictionary)
-    process_event_history(input_dictionary, customers)
+    # Imported here since snapshot itself uses this module
+    from snapshot import load_state, snapshot_paths
+
+    # The snapshot saved by an earlier run is reused until the dataset
+    # changes; if it cannot be loaded, the dataset is processed again
+    snapshot_file, columns_dir = snapshot_paths(DATASET_FILE, SNAPSHOT_DIR)
+    ingest_stats = IngestStats()
+    customers = load_state(DATASET_FILE, snapshot_file, columns_dir,
+                           stats=ingest_stats)[0]
+    if ingest_stats.events > 0:
+        print(ingest_stats)
 
     # ----------------------------------------------------------------------
     # NOTE: You do not need to understand any of the implementation below,
@@ -145,10 +403,7 @@ if __name__ == '__main__':
     # Gather all calls to be drawn on screen for filtering, but we only want
     # to plot each call only once, so only plot the outgoing calls to screen.
     # (Each call is registered as both an incoming and outgoing)
-    all_calls = []
-    for c in customers:
-        hist = c.get_history()
-        all_calls.extend(hist[0])
+    all_calls = ResetFilter().apply(customers, [], "")
     print("\n-----------------------------------------")
     print("Total Calls in the dataset:", len(all_calls))
 
@@ -176,8 +431,9 @@ if __name__ == '__main__':
 
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing', 'json', 'datetime',
-            'visualizer', 'customer', 'call', 'contract', 'phoneline'
+            'python_ta', 'typing', 'json', 'datetime', 're', 'time',
+            'visualizer', 'snapshot', 'customer', 'call', 'contract',
+            'phoneline', 'eventstream', 'callstore', 'filter', 'ledger', 'registry'
         ],
         'allowed-io': [
             'create_customers', 'import_data'
@@ -0,0 +1,286 @@
+"""
+CSC148, Winter 2024
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains a benchmark of the ingestion pipeline: it generates
+synthetic datasets in the format of dataset.json (see data.py), and times
+each phase of loading them: reading the JSON file, create_customers,
+build_number_index and process_event_history. The results, including the
+number of events processed per second and the peak memory of the process,
+are written as JSON, so they can be compared between runs.
+
+For example:
+
+    python bench.py --customers 1000 --lines 3 --events 200000 --months 12
+    python bench.py --suite -o bench.json
+    python bench.py --suite --store --ledger -o bench.json
+
+The --registry, --store and --ledger options load the dataset the way the
+application and the billing CLI can: with the phone numbers interned in a
+shared NumberRegistry, the calls in a CallStore (which shares its registry
+with the phone lines), and the bills in a BillLedger.
+
+Each benchmark runs in a fresh process, so that its peak memory is not
+affected by the benchmarks before it.
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Optional
+
+from application import IngestStats, TIME_FORMAT, build_number_index, \
+    create_customers, import_data, process_event_history
+from callstore import CallStore
+from ledger import BillLedger
+from registry import NumberRegistry
+from spatial import MAP_LOWER_LEFT, MAP_UPPER_RIGHT
+
+try:
+    import resource
+except ImportError:  # not available on Windows; peak memory is then unknown
+    resource = None
+
+# Sizes of the datasets of the benchmark suite:
+# (customers, lines per customer, events, months)
+SUITE = [(100, 2, 10000, 3),
+         (1000, 3, 100000, 12),
+         (5000, 3, 500000, 24)]
+
+# Contract types of the generated phone lines
+CONTRACTS = ('mtm', 'term', 'prepaid')
+
+# Date of the first generated event
+START = datetime.datetime(2018, 1, 1)
+
+
+def generate_dataset(customers: int, lines: int, events: int, months: int,
+                     seed: int = 0) -> dict[str, list[dict]]:
+    """ Return a random dataset in the format of dataset.json, with
+    <customers> customers of <lines> phone lines each, and <events> events
+    (calls and SMSs between these lines) spread over <months> months from
+    START, in chronological order.
+
+    Every month has at least one event, as the dataset format requires, and
+    the same <seed> always gives the same dataset.
+
+    Precondition: customers >= 1, lines >= 1, events >= months >= 1, and
+    customers * lines <= 10 ** 7
+    """
+    rng = random.Random(seed)
+    numbers = [f'{n // 10000:03d}-{n % 10000:04d}'
+               for n in rng.sample(range(10 ** 7), customers * lines)]
+    customer_data = []
+    for i in range(customers):
+        customer_data.append({
+            'id': 1000 + i,
+            'lines': [{'number': numbers[i * lines + j],
+                       'contract': rng.choice(CONTRACTS)}
+                      for j in range(lines)]})
+
+    month_starts = [_add_months(START, m) for m in range(months + 1)]
+    span = (month_starts[-1] - START).total_seconds()
+    # One event at the start of each month, the others anywhere
+    offsets = [(start - START).total_seconds() for start in month_starts[:-1]]
+    offsets.extend(rng.uniform(0, span) for _ in range(events - months))
+    offsets.sort()
+
+    event_data = []
+    for offset in offsets:
+        event = {'type': 'call' if rng.random() < 0.5 else 'sms',
+                 'src_number': rng.choice(numbers),
+                 'dst_number': rng.choice(numbers),
+                 'time': (START + datetime.timedelta(seconds=int(offset)))
+                 .strftime(TIME_FORMAT),
+                 'src_loc': _random_location(rng),
+                 'dst_loc': _random_location(rng)}
+        if event['type'] == 'call':
+            event['duration'] = rng.randint(1, 3600)
+        event_data.append(event)
+    return {'events': event_data, 'customers': customer_data}
+
+
+def run_benchmark(filename: str, store: bool = False, registry: bool = False,
+                  ledger: bool = False) -> dict[str, Any]:
+    """ Load the dataset in <filename> and return the time taken by each
+    phase, in seconds, along with the number of events, the number of events
+    processed per second, and the peak memory of this process in kilobytes
+    (None if unknown).
+
+    If <store> is True, the calls are kept in a CallStore, whose registry
+    also interns the numbers of the phone lines. Otherwise, if <registry> is
+    True, the numbers of the phone lines and of the calls are interned in
+    one NumberRegistry. If <ledger> is True, the bills are kept in a
+    BillLedger.
+    """
+    phases = {}
+    start = time.perf_counter()
+    log = import_data(filename)
+    phases['load_json'] = time.perf_counter() - start
+
+    call_store = CallStore() if store else None
+    if call_store is not None:
+        numbers = call_store.registry
+    else:
+        numbers = NumberRegistry() if registry else None
+    start = time.perf_counter()
+    customers = create_customers(log, BillLedger() if ledger else None,
+                                 numbers)
+    phases['create_customers'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    customer_index = build_number_index(customers)[0]
+    phases['build_number_index'] = time.perf_counter() - start
+
+    stats = IngestStats()
+    start = time.perf_counter()
+    process_event_history(log, customers, customer_index, stats, call_store,
+                          registry=numbers)
+    phases['process_event_history'] = time.perf_counter() - start
+    phases['month_changes'] = stats.month_time
+    phases['billing'] = stats.billing_time
+
+    ingest = phases['create_customers'] + phases['build_number_index'] \
+        + phases['process_event_history']
+    return {'events': stats.events,
+            'month_changes': stats.month_changes,
+            'phases': phases,
+            'events_per_sec': stats.events / ingest if ingest > 0 else None,
+            'peak_rss_kb': peak_rss_kb()}
+
+
+def write_dataset(filename: str, customers: int, lines: int, events: int,
+                  months: int, seed: int = 0) -> None:
+    """ Write a dataset generated with the given parameters (see
+    generate_dataset) to the file <filename>, in JSON.
+    """
+    data = generate_dataset(customers, lines, events, months, seed)
+    with open(filename, 'w') as o:
+        json.dump(data, o)
+
+
+def run_suite(cases: list[tuple[int, int, int, int]], store: bool = False,
+              seed: int = 0, registry: bool = False, ledger: bool = False) \
+        -> dict[str, Any]:
+    """ Benchmark the ingestion of a dataset generated for each of the
+    (customers, lines, events, months) <cases>, with the <store>,
+    <registry> and <ledger> options of run_benchmark, and return the results
+    (see run_benchmark) with the parameters of each case, along with a
+    description of the machine they ran on.
+
+    Each dataset is generated, then loaded, in a new process, so that the
+    peak memory of each benchmark only counts its own ingestion.
+    """
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for customers, lines, events, months in cases:
+        fd, filename = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            with context.Pool(1) as pool:
+                pool.apply(write_dataset, (filename, customers, lines,
+                                           events, months, seed))
+            with context.Pool(1) as pool:
+                result = pool.apply(run_benchmark, (filename, store,
+                                                    registry, ledger))
+        finally:
+            os.remove(filename)
+        results.append({'customers': customers, 'lines': lines,
+                        'months': months, 'store': store,
+                        'registry': registry or store, 'ledger': ledger,
+                        'seed': seed, **result})
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results}
+
+
+def peak_rss_kb() -> Optional[int]:
+    """ Return the peak resident memory of this process so far, in
+    kilobytes, or None if it cannot be measured on this platform.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, but macOS reports bytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _add_months(moment: datetime.datetime, months: int) -> datetime.datetime:
+    """ Return the first day of the month <months> months after the month of
+    <moment>.
+    """
+    month = moment.month - 1 + months
+    return datetime.datetime(moment.year + month // 12, month % 12 + 1, 1)
+
+
+def _random_location(rng: random.Random) -> list[float]:
+    """ Return a random [longitude, latitude] on the Toronto map.
+    """
+    return [rng.uniform(MAP_LOWER_LEFT[0], MAP_UPPER_RIGHT[0]),
+            rng.uniform(MAP_LOWER_LEFT[1], MAP_UPPER_RIGHT[1])]
+
+
+def _parse_args(argv: Optional[list[str]]) -> Any:
+    """ Return the parsed command line arguments <argv>.
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark the ingestion of synthetic datasets.')
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--lines', type=int, default=3,
+                        help='phone lines per customer')
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--months', type=int, default=12,
+                        help='number of months the events span')
+    parser.add_argument('--suite', action='store_true',
+                        help='run every case of the benchmark suite instead')
+    parser.add_argument('--store', action='store_true',
+                        help='keep the calls in a CallStore, sharing its '
+                             'registry with the phone lines')
+    parser.add_argument('--registry', action='store_true',
+                        help='intern the phone numbers in a NumberRegistry')
+    parser.add_argument('--ledger', action='store_true',
+                        help='keep the bills in a BillLedger')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the generated datasets')
+    parser.add_argument('-o', '--output', default='-',
+                        help='output file, or - for standard output')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """ Run the benchmark with the command line arguments <argv> (or
+    sys.argv if None), and return the exit status.
+    """
+    args = _parse_args(argv)
+    cases = SUITE if args.suite else \
+        [(args.customers, args.lines, args.events, args.months)]
+    report = run_suite(cases, args.store, args.seed, args.registry,
+                       args.ledger)
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as out:
+            json.dump(report, out, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
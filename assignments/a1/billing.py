@@ -0,0 +1,324 @@
+"""
+CSC148, Winter 2024
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains a headless batch billing entry point: it loads a dataset,
+generates the bill of every customer for every month found in the dataset,
+and writes all the bills to a CSV or JSON file in one pass.
+
+Nothing here (or in the modules it uses) imports pygame, so it can run on a
+server without a display. For example:
+
+    python billing.py dataset.json -o bills.csv
+    python billing.py dataset.json --format json --stream -o bills.json
+    python billing.py dataset.json --workers 8 -o bills.csv
+    python billing.py dataset.json --checkpoint state.json -o bills.csv
+    python billing.py dataset.json --snapshot -o bills.csv
+"""
+import argparse
+import csv
+import json
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Iterable, Iterator, Optional, TextIO
+
+from application import build_number_index, create_customers, import_data, \
+    process_event_history
+from bill import Bill
+from checkpoint import backfill
+from customer import Customer
+from ledger import BillLedger, LedgerBills
+from registry import NumberRegistry
+from snapshot import load_state, snapshot_paths
+
+# Columns of the CSV output; there is one row per phone line and month
+CSV_FIELDS = ['customer_id', 'month', 'year', 'number', 'type', 'fixed',
+              'free_mins', 'billed_mins', 'min_rate', 'total']
+
+# Number of customers sent to a worker process at a time
+CHUNK_SIZE = 2000
+
+# The state of one line's bill sent to a worker process:
+# (number, type, fixed_cost, free_min, billed_min, min_rate)
+BillState = tuple[str, str, float, int, int, float]
+
+
+def billing_months(customers: list[Customer]) -> list[tuple[int, int]]:
+    """ Return every (month, year) billing cycle that any phone line of the
+    <customers> has a bill for, in chronological order.
+    """
+    months = set()
+    for customer in customers:
+        for line in customer.get_phone_lines():
+            months.update(line.bills)
+    return sorted(months, key=lambda m: (m[1], m[0]))
+
+
+def _bill_states(customers: list[Customer], month: int, year: int) \
+        -> list[tuple[int, list[BillState]]]:
+    """ Return, for each of the <customers>, its id and the state of the bill
+    of each of its lines for <month> and <year>, in line order. Lines without
+    a bill for that month are left out.
+
+    This is all a worker process needs to build the bill summaries, and it is
+    much cheaper to send than the customers themselves.
+    """
+    states = []
+    for customer in customers:
+        lines = []
+        for line in customer.get_phone_lines():
+            bill = line.bills.get((month, year))
+            if bill is not None:
+                lines.append((line.get_number(), bill.type, bill.fixed_cost,
+                              bill.free_min, bill.billed_min, bill.min_rate))
+        states.append((customer.get_id(), lines))
+    return states
+
+
+def _summarize(states: list[tuple[int, list[BillState]]]) \
+        -> list[tuple[int, float, list[dict]]]:
+    """ Return the bill summary of each customer in <states>, exactly as
+    Customer.generate_bill would for the same bills.
+    """
+    summaries = []
+    for cid, lines in states:
+        bills = []
+        total = 0
+        for number, bill_type, fixed, free_min, billed_min, rate in lines:
+            bill = Bill()
+            bill.set_rates(bill_type, rate)
+            bill.fixed_cost = fixed
+            bill.free_min = free_min
+            bill.billed_min = billed_min
+            line_bill = bill.get_summary()
+            line_bill['number'] = number
+            bills.append(line_bill)
+            total += line_bill['total']
+        summaries.append((cid, total, bills))
+    return summaries
+
+
+def _ledger_of(customers: list[Customer]) -> Optional[BillLedger]:
+    """ Return the BillLedger holding the bills of every phone line of the
+    <customers>, or None if they are not all in the same ledger.
+    """
+    ledger = None
+    for customer in customers:
+        for line in customer.get_phone_lines():
+            if not isinstance(line.bills, LedgerBills) or \
+                    (ledger is not None and line.bills.ledger is not ledger):
+                return None
+            ledger = line.bills.ledger
+    return ledger
+
+
+def _ledger_bills(customers: list[Customer], ledger: BillLedger, month: int,
+                  year: int) -> list[tuple[int, float, list[dict]]]:
+    """ Return the bill summary of each of the <customers> for <month> and
+    <year>, exactly as Customer.generate_bill would, with the totals of all
+    the customers computed at once by their <ledger>.
+    """
+    groups = []
+    summaries = []
+    for customer in customers:
+        rows = []
+        bills = []
+        for line in customer.get_phone_lines():
+            row = line.bills.rows.get((month, year))
+            if row is not None:
+                rows.append(row)
+                line_bill = ledger.summary(row)
+                line_bill['number'] = line.get_number()
+                bills.append(line_bill)
+        groups.append(rows)
+        summaries.append((customer.get_id(), bills))
+    return [(cid, total, bills) for (cid, bills), total
+            in zip(summaries, ledger.totals(groups))]
+
+
+def run_bills(customers: list[Customer], month: int, year: int,
+              executor: Optional[Executor] = None,
+              chunk_size: int = CHUNK_SIZE) \
+        -> list[tuple[int, float, list[dict]]]:
+    """ Return the bill summary of each of the <customers> for <month> and
+    <year>, in the same order and format as Customer.generate_bill.
+
+    If <executor> is given (e.g. a ProcessPoolExecutor), the customers are
+    split in chunks of <chunk_size> and the chunks are summarized by the
+    executor's workers. Otherwise, if the bills of all the customers are in
+    the same BillLedger, their totals are computed by the ledger at once.
+    The result is identical either way.
+    """
+    if executor is None:
+        ledger = _ledger_of(customers)
+        if ledger is not None:
+            return _ledger_bills(customers, ledger, month, year)
+        return [customer.generate_bill(month, year) for customer in customers]
+    chunks = [_bill_states(customers[i:i + chunk_size], month, year)
+              for i in range(0, len(customers), chunk_size)]
+    summaries = []
+    for result in executor.map(_summarize, chunks):
+        summaries.extend(result)
+    return summaries
+
+
+def generate_bills(customers: list[Customer],
+                   months: Iterable[tuple[int, int]],
+                   workers: int = 1) -> Iterator[dict]:
+    """ Yield the bill of each of the <customers> for each of the <months>,
+    month by month, as a dictionary with the keys:
+    "customer_id", "month", "year", "total" and "lines"
+    where "lines" is the list of line bill summaries from
+    Customer.generate_bill.
+
+    If <workers> is more than 1, the bills are generated by that many worker
+    processes.
+    """
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        for month, year in months:
+            for cid, total, lines in run_bills(customers, month, year,
+                                               executor):
+                yield {'customer_id': cid, 'month': month, 'year': year,
+                       'total': total, 'lines': lines}
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def write_csv(bills: Iterable[dict], out: TextIO) -> int:
+    """ Write the <bills> to <out> in CSV format, one row per line bill, and
+    return the number of customer bills written.
+    """
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    count = 0
+    for bill in bills:
+        for line in bill['lines']:
+            row = {'customer_id': bill['customer_id'], 'month': bill['month'],
+                   'year': bill['year']}
+            row.update(line)
+            writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_json(bills: Iterable[dict], out: TextIO) -> int:
+    """ Write the <bills> to <out> as a JSON list, one bill per line, and
+    return the number of customer bills written.
+    """
+    count = 0
+    out.write('[')
+    for bill in bills:
+        out.write(',\n' if count > 0 else '\n')
+        json.dump(bill, out)
+        count += 1
+    out.write('\n]\n')
+    return count
+
+
+def load_customers(filename: str, stream: bool = False,
+                   checkpoint: Optional[str] = None, snapshot: bool = False,
+                   snapshot_dir: Optional[str] = None) -> list[Customer]:
+    """ Return the customers of the dataset in <filename>, with all of its
+    events processed. If <stream> is True, the dataset is read
+    incrementally instead of being loaded into memory.
+
+    If <checkpoint> is given, the customers are restored from that
+    checkpoint file (if it exists), only the newer events are processed,
+    and the checkpoint is updated; see checkpoint.backfill. Bills do not
+    need the call histories, so they are left out of the checkpoint.
+
+    Otherwise, if <snapshot> is True, the customers are loaded from the
+    snapshot of the dataset and its memory-mapped call columns, next to the
+    dataset or in <snapshot_dir> if given (see snapshot.snapshot_paths), as
+    the application does. If the snapshot is not current, the dataset is
+    processed in memory and the snapshot is saved; see snapshot.load_state.
+
+    The bills are stored in a BillLedger rather than one Bill per line and
+    month, and the phone numbers are interned in a single NumberRegistry.
+    """
+    if checkpoint is not None:
+        return backfill(filename, checkpoint, stream, BillLedger(),
+                        histories=False)
+    if snapshot:
+        snapshot_file, columns_dir = snapshot_paths(filename, snapshot_dir)
+        return load_state(filename, snapshot_file, columns_dir,
+                          ledger=BillLedger())[0]
+    log = import_data(filename, stream)
+    registry = NumberRegistry()
+    customers = create_customers(log, BillLedger(), registry)
+    process_event_history(log, customers, build_number_index(customers)[0],
+                          registry=registry)
+    return customers
+
+
+def _parse_args(argv: Optional[list[str]]) -> Any:
+    """ Return the parsed command line arguments <argv>.
+    """
+    parser = argparse.ArgumentParser(
+        description='Generate every monthly bill of a MewbileTech dataset.')
+    parser.add_argument('dataset', nargs='?', default='dataset.json',
+                        help='dataset file (.json or .jsonl)')
+    parser.add_argument('-o', '--output', default='-',
+                        help='output file, or - for standard output')
+    parser.add_argument('-f', '--format', choices=['csv', 'json'],
+                        help='output format (default: from the output '
+                             'file extension, or csv)')
+    parser.add_argument('--stream', action='store_true',
+                        help='read the dataset incrementally')
+    parser.add_argument('--checkpoint', metavar='FILE',
+                        help='resume from this checkpoint file if it exists, '
+                             'and save the state to it')
+    parser.add_argument('--snapshot', action='store_true',
+                        help='load the state from the snapshot of the '
+                             'dataset and its memory-mapped columns, and '
+                             'save the snapshot if it is not current')
+    parser.add_argument('--snapshot-dir', metavar='DIR',
+                        help='directory of the snapshot (default: next to '
+                             'the dataset); implies --snapshot')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='number of worker processes for generating '
+                             'the bills')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """ Run the batch billing with the command line arguments <argv> (or
+    sys.argv if None), and return the exit status.
+    """
+    args = _parse_args(argv)
+    output_format = args.format
+    if output_format is None:
+        output_format = 'json' if args.output.endswith('.json') else 'csv'
+
+    customers = load_customers(args.dataset, args.stream, args.checkpoint,
+                               args.snapshot or args.snapshot_dir is not None,
+                               args.snapshot_dir)
+    bills = generate_bills(customers, billing_months(customers),
+                           args.workers)
+    writer = write_json if output_format == 'json' else write_csv
+
+    if args.output == '-':
+        count = writer(bills, sys.stdout)
+    else:
+        with open(args.output, 'w', newline='') as out:
+            count = writer(bills, out)
+    print(f'{count} bills written for {len(customers)} customers',
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
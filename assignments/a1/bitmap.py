@@ -0,0 +1,231 @@
+"""
+CSC148, Winter 2024
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the CallIndex and CallBitmap classes, which represent a
+subset of a fixed list of calls as a bitmap: one bit per call, stored in a
+single Python int.
+
+Combining two bitmaps (intersection, union, difference) or building the
+bitmap of all calls works a machine word at a time, and a bitmap only takes
+one bit per call, however many calls are in it.
+"""
+from typing import Any, Iterable, Iterator
+
+from call import Call
+
+
+class CallIndex:
+    """ A fixed list of calls, where each call is identified by its position
+    in the list. Bitmaps of calls are always relative to a CallIndex.
+
+    === Public Attributes ===
+    calls:
+         the calls of this index, in order
+    """
+    # === Private Attributes ===
+    # _positions:
+    #     maps each call in <calls> to its (first) position in <calls>
+    # _unique:
+    #     the bitmap of the first position of each call in <calls>
+    # _columns:
+    #     maps the name of a call attribute to the list of that attribute of
+    #     each call in <calls>, for the attributes asked for so far
+    calls: list[Call]
+    _positions: dict[Call, int]
+    _unique: int
+    _columns: dict[str, list]
+
+    def __init__(self, calls: list[Call]) -> None:
+        """ Create an index over <calls>.
+        """
+        self.calls = calls
+        self._positions = {}
+        for position, call in enumerate(calls):
+            self._positions.setdefault(call, position)
+        if len(self._positions) == len(calls):
+            self._unique = (1 << len(calls)) - 1
+        else:
+            self._unique = positions_to_mask(self._positions.values(),
+                                             len(calls))
+        self._columns = {}
+
+    def __len__(self) -> int:
+        """ Return the number of calls in this index.
+        """
+        return len(self.calls)
+
+    def position(self, call: Call) -> int:
+        """ Return the position of <call> in this index.
+
+        Precondition: <call> is in this index.
+        """
+        return self._positions[call]
+
+    def bitmap(self, calls: Iterable[Call]) -> 'CallBitmap':
+        """ Return the bitmap of the <calls>.
+
+        Precondition: every call in <calls> is in this index.
+        """
+        return CallBitmap(self, positions_to_mask(
+            (self._positions[call] for call in calls), len(self.calls)))
+
+    def bitmap_within(self, calls: Iterable[Call]) -> 'CallBitmap':
+        """ Return the bitmap of those of the <calls> that are in this index.
+        The other calls are ignored.
+        """
+        positions = self._positions
+        return CallBitmap(self, positions_to_mask(
+            (positions[call] for call in calls if call in positions),
+            len(self.calls)))
+
+    def column(self, attribute: str) -> list[Any]:
+        """ Return the <attribute> of each call of this index, in order.
+        The list is built the first time, and reused after that.
+        """
+        if attribute not in self._columns:
+            self._columns[attribute] = [getattr(call, attribute)
+                                        for call in self.calls]
+        return self._columns[attribute]
+
+    def unique(self) -> 'CallBitmap':
+        """ Return the bitmap of the first position of each call in this
+        index, so that a call repeated in the index is only in it once.
+        """
+        return CallBitmap(self, self._unique)
+
+    def full(self) -> 'CallBitmap':
+        """ Return the bitmap of all the calls in this index.
+        """
+        return CallBitmap(self, (1 << len(self.calls)) - 1)
+
+    def empty(self) -> 'CallBitmap':
+        """ Return the bitmap of no calls.
+        """
+        return CallBitmap(self, 0)
+
+
+class CallBitmap:
+    """ A set of calls from a CallIndex, stored as a bitmap.
+
+    === Public Attributes ===
+    index:
+         the CallIndex the bits refer to
+    bits:
+         the bitmap; bit i is set if the call at position i of <index> is
+         in this set
+
+    === Representation Invariants ===
+    - 0 <= bits < 2 ** len(index)
+    """
+    index: CallIndex
+    bits: int
+
+    def __init__(self, index: CallIndex, bits: int) -> None:
+        """ Create the set of calls of <index> given by the bitmap <bits>.
+        """
+        self.index = index
+        self.bits = bits
+
+    def __and__(self, other: 'CallBitmap') -> 'CallBitmap':
+        """ Return the calls in both this set and <other>.
+
+        Precondition: both sets are from the same index.
+        """
+        return CallBitmap(self.index, self.bits & other.bits)
+
+    def __or__(self, other: 'CallBitmap') -> 'CallBitmap':
+        """ Return the calls in this set or <other>.
+
+        Precondition: both sets are from the same index.
+        """
+        return CallBitmap(self.index, self.bits | other.bits)
+
+    def __sub__(self, other: 'CallBitmap') -> 'CallBitmap':
+        """ Return the calls in this set but not in <other>.
+
+        Precondition: both sets are from the same index.
+        """
+        return CallBitmap(self.index, self.bits & ~other.bits)
+
+    def __eq__(self, other: object) -> bool:
+        """ Return whether <other> is the same set of calls of the same index.
+        """
+        return isinstance(other, CallBitmap) and self.index is other.index \
+            and self.bits == other.bits
+
+    def __len__(self) -> int:
+        """ Return the number of calls in this set.
+        """
+        return self.bits.bit_count()
+
+    def __contains__(self, call: Call) -> bool:
+        """ Return whether <call> is in this set.
+        """
+        try:
+            return (self.bits >> self.index.position(call)) & 1 == 1
+        except KeyError:
+            return False
+
+    def positions(self) -> list[int]:
+        """ Return the positions of the calls in this set, in order.
+        """
+        return mask_to_positions(self.bits)
+
+    def __iter__(self) -> Iterator[Call]:
+        """ Yield the calls in this set, in the order of the index.
+        """
+        calls = self.index.calls
+        for position in mask_to_positions(self.bits):
+            yield calls[position]
+
+    def to_list(self) -> list[Call]:
+        """ Return a list of the calls in this set, in the order of the index.
+        """
+        calls = self.index.calls
+        return [calls[position] for position in mask_to_positions(self.bits)]
+
+
+def positions_to_mask(positions: Iterable[int], size: int) -> int:
+    """ Return a bitmap (as an int) of <size> bits, where the bits at
+    <positions> are set.
+    """
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def mask_to_positions(mask: int) -> list[int]:
+    """ Return the positions of the set bits of the bitmap <mask>, in
+    increasing order.
+    """
+    # Binary digits of <mask>, least significant first
+    digits = bin(mask)[:1:-1]
+    positions = []
+    position = digits.find('1')
+    while position != -1:
+        positions.append(position)
+        position = digits.find('1', position + 1)
+    return positions
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'call'
+        ],
+        'generated-members': 'pygame.*'
+    })
@@ -13,14 +13,34 @@ Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
 import datetime
 import os
-from typing import Optional
-import pygame
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pygame
 
 
 # Sprite files to display the start and end of a call
 START_CALL_SPRITE = 'data/call-start-2.png'
 END_CALL_SPRITE = 'data/call-end-2.png'
 
+# Sprites that were already loaded and scaled, keyed by sprite file.
+# pygame is only imported the first time a sprite is needed, so code that
+# never draws anything (e.g. billing) does not depend on it.
+_SPRITE_CACHE: dict[str, 'pygame.Surface'] = {}
+
+
+def load_sprite(sprite_file: str) -> 'pygame.Surface':
+    """ Return the image in <sprite_file>, scaled to the size of a sprite.
+    Each file is only read from disk and scaled once; the same Surface is
+    shared by every Drawable using it.
+    """
+    if sprite_file not in _SPRITE_CACHE:
+        import pygame
+        _SPRITE_CACHE[sprite_file] = pygame.transform.smoothscale(
+            pygame.image.load(os.path.join(os.path.dirname(__file__),
+                                           sprite_file)), (13, 13))
+    return _SPRITE_CACHE[sprite_file]
+
 
 # ----------------------------------------------------------------------------
 # NOTE: You do not need to understand the implementation of the Drawable class
@@ -40,7 +60,7 @@ class Drawable:
         If none, then must have sprite
     loc: location (longitude/latitude pair)
     """
-    sprite: Optional[pygame.Surface]
+    sprite: Optional['pygame.Surface']
     linelimits: Optional[tuple[float, float]]
     loc: Optional[tuple[float, float]]
 
@@ -57,9 +77,7 @@ class Drawable:
         self.loc = None
 
         if sprite_file is not None and location is not None:
-            self.sprite = pygame.transform.smoothscale(
-                pygame.image.load(os.path.join(os.path.dirname(__file__),
-                                               sprite_file)), (13, 13))
+            self.sprite = load_sprite(sprite_file)
             self.loc = location
         else:
             self.linelimits = linelimits
@@ -95,22 +113,26 @@ class Call:
          location of the destination of this Call; a Tuple containing the
          longitude and latitude coordinates
     drawables:
-         sprites for drawing the source and destination of this Call
+         sprites for drawing the source and destination of this Call, or None
+         if they have not been needed yet
     connection:
          connecting line between the two sprites representing the source and
-         destination of this Call
+         destination of this Call, or None if it has not been needed yet
 
     === Representation Invariants ===
     -   duration >= 0
     """
+    # Calls are numerous, so they do not carry a per-instance __dict__
+    __slots__ = ('src_number', 'dst_number', 'time', 'duration', 'src_loc',
+                 'dst_loc', 'drawables', 'connection')
     src_number: str
     dst_number: str
     time: datetime.datetime
     duration: int
     src_loc: tuple[float, float]
     dst_loc: tuple[float, float]
-    drawables: list[Drawable]
-    connection: Drawable
+    drawables: Optional[list[Drawable]]
+    connection: Optional[Drawable]
 
     def __init__(self, src_nr: str, dst_nr: str,
                  calltime: datetime.datetime, duration: int,
@@ -124,12 +146,9 @@ class Call:
         self.duration = duration
         self.src_loc = src_loc
         self.dst_loc = dst_loc
-        self.drawables = [Drawable(sprite_file=START_CALL_SPRITE,
-                                   location=src_loc),
-                          Drawable(sprite_file=END_CALL_SPRITE,
-                                   location=dst_loc)]
-
-        self.connection = Drawable(linelimits=(src_loc, dst_loc))
+        # The drawables are only created when this Call is first displayed
+        self.drawables = None
+        self.connection = None
 
     def get_bill_date(self) -> tuple[int, int]:
         """ Return the billing date for this Call, as a tuple containing the
@@ -146,11 +165,19 @@ class Call:
     def get_drawables(self) -> list[Drawable]:
         """ Return the list of drawable sprites for this Call
         """
+        if self.drawables is None:
+            self.drawables = [Drawable(sprite_file=START_CALL_SPRITE,
+                                       location=self.src_loc),
+                              Drawable(sprite_file=END_CALL_SPRITE,
+                                       location=self.dst_loc)]
         return self.drawables
 
     def get_connection(self) -> Drawable:
         """ Return the connecting line for this Call start and end locations
         """
+        if self.connection is None:
+            self.connection = Drawable(linelimits=(self.src_loc,
+                                                   self.dst_loc))
         return self.connection
 
     def __str__(self) -> str:
@@ -166,6 +193,6 @@ if __name__ == '__main__':
         'allowed-import-modules': [
             'python_ta', 'typing', 'datetime', 'os', 'pygame'
         ],
-        'disable': ['R0902', 'R0913'],
+        'disable': ['R0902', 'R0913', 'C0415'],
         'generated-members': 'pygame.*'
     })
@@ -11,7 +11,123 @@ any changes, are expressly prohibited.
 All of the files in this directory and all subdirectories are:
 Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Sequence
+from typing import Any, Collection, Iterator, Union
 from call import Call
+from callstore import CallRow, RowList, new_call_list
+
+# Number of changes made so far to any call history, or to which call
+# histories a customer owns. Data derived from the call histories can be
+# cached along with this number, and reused as long as it has not changed.
+_version = 0
+
+
+def history_version() -> int:
+    """ Return the number of changes made so far to the call histories.
+    """
+    return _version
+
+
+def mark_history_changed() -> None:
+    """ Record that a call history changed, invalidating any data cached
+    with an older history_version().
+    """
+    global _version
+    _version += 1
+
+
+class CallsView(Sequence):
+    """ A read-only view of one or more lists of calls, seen as a single
+    sequence. The view is not a copy: calls added to the lists later are also
+    seen through the view.
+
+    A view compares equal to any list or view holding the same calls, in
+    the same order.
+    """
+    # === Private Attributes ===
+    # _parts:
+    #     the sequences of calls this is a view of, in order. This may be a
+    #     live collection, such as the list holding the calls of a history,
+    #     so that sequences put in it later are also seen.
+    __slots__ = ('_parts',)
+    _parts: Collection[Sequence[Call]]
+
+    def __init__(self, *parts: Sequence[Call]) -> None:
+        """ Create a read-only view of the calls of <parts>, one sequence
+        after the other.
+        """
+        self._parts = parts
+
+    @classmethod
+    def of_parts(cls, parts: Collection[Sequence[Call]]) -> 'CallsView':
+        """ Return a read-only view of the calls of each sequence in <parts>,
+        one after the other. <parts> is not copied: sequences added to it
+        later are also seen through the view.
+        """
+        view = cls()
+        view._parts = parts
+        return view
+
+    def __len__(self) -> int:
+        """ Return the number of calls in this view.
+        """
+        return sum(len(part) for part in self._parts)
+
+    def __getitem__(self, item: Union[int, slice]) -> Any:
+        """ Return the call at position <item>, or a new list of calls if
+        <item> is a slice.
+        """
+        if isinstance(self._parts, (tuple, list)) and len(self._parts) == 1:
+            return self._parts[0][item]
+        if isinstance(item, slice):
+            return list(self)[item]
+        if item < 0:
+            item += len(self)
+        if item >= 0:
+            for part in self._parts:
+                if item < len(part):
+                    return part[item]
+                item -= len(part)
+        raise IndexError('call index out of range')
+
+    def __iter__(self) -> Iterator[Call]:
+        """ Yield the calls of this view, in order.
+        """
+        for part in self._parts:
+            yield from part
+
+    def __contains__(self, item: object) -> bool:
+        """ Return whether <item> is one of the calls of this view.
+        """
+        return any(item in part for part in self._parts)
+
+    def __eq__(self, other: object) -> bool:
+        """ Return whether <other> is a list or view of the same calls, in the
+        same order.
+        """
+        if not isinstance(other, (list, Sequence)) or \
+                isinstance(other, (str, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and \
+            all(a == b for a, b in zip(self, other))
+
+    def __add__(self, other: Sequence) -> list[Call]:
+        """ Return a new list with the calls of this view followed by the
+        calls of <other>.
+        """
+        return list(self) + list(other)
+
+    def __radd__(self, other: Sequence) -> list[Call]:
+        """ Return a new list with the calls of <other> followed by the calls
+        of this view.
+        """
+        return list(other) + list(self)
+
+    def __repr__(self) -> str:
+        """ Return a representation of this view, like that of a list.
+        """
+        return f'CallsView({list(self)!r})'
 
 
 class CallHistory:
@@ -24,31 +140,90 @@ class CallHistory:
     outgoing_calls:
          Dictionary of outgoing calls. Keys are tuples containing a month and a
          year, values are a List of Call objects for that month and year.
+
+    Calls registered as CallRow views of a CallStore are kept in a RowList
+    instead of a list, which only stores the index of each call.
     """
-    incoming_calls: dict[tuple[int, int], list[Call]]
-    outgoing_calls: dict[tuple[int, int], list[Call]]
+    # === Private Attributes ===
+    # _months:
+    #     the (year, month) of every billing cycle with a call in this
+    #     history, in chronological order
+    # _all_outgoing, _all_incoming:
+    #     a list holding a single list of all the outgoing (incoming) calls,
+    #     month by month in the order of the keys of outgoing_calls
+    #     (incoming_calls), and in the order they were registered within a
+    #     month. Views of all the calls are over this holder, so they also
+    #     see the calls when the list in it is replaced.
+    # _outgoing_ends, _incoming_ends:
+    #     the position in the list of _all_outgoing (_all_incoming) just after
+    #     the last call of each month, keyed by (month, year)
+    incoming_calls: dict[tuple[int, int], Union[list[Call], RowList]]
+    outgoing_calls: dict[tuple[int, int], Union[list[Call], RowList]]
+    _months: list[tuple[int, int]]
+    _all_outgoing: list[Union[list[Call], RowList]]
+    _all_incoming: list[Union[list[Call], RowList]]
+    _outgoing_ends: dict[tuple[int, int], int]
+    _incoming_ends: dict[tuple[int, int], int]
 
     def __init__(self) -> None:
         """ Create an empty CallHistory.
         """
         self.outgoing_calls = {}
         self.incoming_calls = {}
+        self._months = []
+        self._all_outgoing = [[]]
+        self._all_incoming = [[]]
+        self._outgoing_ends = {}
+        self._incoming_ends = {}
 
-    def register_outgoing_call(self, call: Call) -> None:
+    def register_outgoing_call(self, call: Union[Call, CallRow]) -> None:
         """ Register a Call <call> into this outgoing call history
         """
-        month = call.time.month
-        year = call.time.year
-        key = (month, year)
-        self.outgoing_calls.setdefault(key, []).append(call)
+        key = call.get_bill_date()
+        if key not in self.outgoing_calls:
+            self._add_month(key)
+            self.outgoing_calls[key] = new_call_list(call)
+        self.outgoing_calls[key].append(call)
+        _add_call(self._all_outgoing, self._outgoing_ends, key, call)
+        mark_history_changed()
 
-    def register_incoming_call(self, call: Call) -> None:
+    def register_incoming_call(self, call: Union[Call, CallRow]) -> None:
         """ Register a Call <call> into this incoming call history
         """
-        month = call.time.month
-        year = call.time.year
-        key = (month, year)
-        self.incoming_calls.setdefault(key, []).append(call)
+        key = call.get_bill_date()
+        if key not in self.incoming_calls:
+            self._add_month(key)
+            self.incoming_calls[key] = new_call_list(call)
+        self.incoming_calls[key].append(call)
+        _add_call(self._all_incoming, self._incoming_ends, key, call)
+        mark_history_changed()
+
+    def _add_month(self, key: tuple[int, int]) -> None:
+        """ Add the billing cycle <key>, a (month, year) tuple, to the month
+        index of this history, unless it is already there.
+        """
+        if key not in self.outgoing_calls and key not in self.incoming_calls:
+            insort(self._months, (key[1], key[0]))
+
+    def set_calls(self, outgoing_calls: dict[tuple[int, int], RowList],
+                  incoming_calls: dict[tuple[int, int], RowList]) -> None:
+        """ Replace all the calls of this history with the monthly lists of
+        <outgoing_calls> and <incoming_calls>, keyed by (month, year) like
+        the attributes of the same name, and in the same order. The lists
+        are used as they are, not copied.
+
+        Views returned by get_all_outgoing and get_all_incoming see the new
+        calls.
+        """
+        self.outgoing_calls.clear()
+        self.outgoing_calls.update(outgoing_calls)
+        self.incoming_calls.clear()
+        self.incoming_calls.update(incoming_calls)
+        self._all_outgoing[0], self._outgoing_ends = _flatten(outgoing_calls)
+        self._all_incoming[0], self._incoming_ends = _flatten(incoming_calls)
+        self._months = sorted({(year, month) for month, year
+                               in list(outgoing_calls) + list(incoming_calls)})
+        mark_history_changed()
 
     # ----------------------------------------------------------
     # NOTE: You do not need to understand the implementation of
@@ -57,45 +232,121 @@ class CallHistory:
     # ----------------------------------------------------------
 
     def get_monthly_history(self, month: int = None, year: int = None) -> \
-            tuple[list[Call], list[Call]]:
+            tuple[Sequence[Call], Sequence[Call]]:
         """ Return all outgoing and incoming calls for <month> and <year>,
         as a Tuple containing two lists in the following order:
         (outgoing calls, incoming calls)
 
         If <month> and <year> are both None, then return all calls from this
-        call history.
+        call history (see get_all_outgoing and get_all_incoming). These are
+        returned as read-only CallsViews, without copying the calls.
 
         Precondition:
         - <month> and <year> are either both specified, or are both missing/None
         - if <month> and <year> are specified (non-None), they are both valid
         monthly cycles according to the input dataset
         """
+        if month is None or year is None:
+            return self.get_all_outgoing(), self.get_all_incoming()
         monthly_history = ([], [])
-        if month is not None and year is not None:
-            if (month, year) in self.outgoing_calls:
-                for call in self.outgoing_calls[(month, year)]:
-                    monthly_history[0].append(call)
-
-            if (month, year) in self.incoming_calls:
-                for call in self.incoming_calls[(month, year)]:
-                    monthly_history[1].append(call)
-        else:
-            for entry in self.outgoing_calls:
-                for call in self.outgoing_calls[entry]:
-                    monthly_history[0].append(call)
-            for entry in self.incoming_calls:
-                for call in self.incoming_calls[entry]:
-                    monthly_history[1].append(call)
+        if (month, year) in self.outgoing_calls:
+            for call in self.outgoing_calls[(month, year)]:
+                monthly_history[0].append(call)
+
+        if (month, year) in self.incoming_calls:
+            for call in self.incoming_calls[(month, year)]:
+                monthly_history[1].append(call)
         return monthly_history
 
+    def get_all_outgoing(self) -> CallsView:
+        """ Return a read-only view of all outgoing calls, month by month in
+        the order the months were first seen, and in the order they were
+        registered within a month. For calls registered in chronological
+        order, this is the order they were registered.
+
+        The view is over a single list of all the calls, so its length and
+        indexing take constant time.
+        """
+        return CallsView.of_parts(self._all_outgoing)
+
+    def get_all_incoming(self) -> CallsView:
+        """ Return a read-only view of all incoming calls, in the same order
+        as get_all_outgoing.
+        """
+        return CallsView.of_parts(self._all_incoming)
+
+    def get_months(self) -> list[tuple[int, int]]:
+        """ Return the (month, year) of every billing cycle with a call in
+        this history, in chronological order.
+        """
+        return [(month, year) for year, month in self._months]
+
+    def get_history_range(self, start: tuple[int, int],
+                          end: tuple[int, int]) -> tuple[CallsView, CallsView]:
+        """ Return all outgoing and incoming calls from the billing cycles
+        between <start> and <end>, both (month, year) tuples and both
+        included, as a tuple in the following order:
+        (outgoing calls, incoming calls)
+
+        The calls are in chronological order of billing cycle, and in the
+        order they were registered within a billing cycle. They are returned
+        as read-only CallsViews over the monthly lists, without copying any
+        call.
+        """
+        lo = bisect_left(self._months, (start[1], start[0]))
+        hi = bisect_right(self._months, (end[1], end[0]))
+        keys = [(month, year) for year, month in self._months[lo:hi]]
+        return (CallsView(*[self.outgoing_calls[key] for key in keys
+                            if key in self.outgoing_calls]),
+                CallsView(*[self.incoming_calls[key] for key in keys
+                            if key in self.incoming_calls]))
+
+
+def _add_call(holder: list[Union[list[Call], RowList]],
+              ends: dict[tuple[int, int], int], key: tuple[int, int],
+              call: Union[Call, CallRow]) -> None:
+    """ Add <call>, from the billing cycle <key>, to the list of all calls in
+    <holder>, after the other calls of that billing cycle, whose <ends> are
+    updated.
+    """
+    if not holder[0]:
+        holder[0] = new_call_list(call)
+    calls = holder[0]
+    end = ends.get(key, len(calls))
+    if end == len(calls):
+        calls.append(call)
+    else:
+        # A call of an earlier billing cycle than the last one added: this
+        # only happens for calls registered out of order
+        calls.insert(end, call)
+        for other, other_end in ends.items():
+            if other_end > end:
+                ends[other] = other_end + 1
+    ends[key] = end + 1
+
+
+def _flatten(monthly: dict[tuple[int, int], Union[list[Call], RowList]]) \
+        -> tuple[Union[list[Call], RowList], dict[tuple[int, int], int]]:
+    """ Return a single list of the calls of the lists in <monthly>, one
+    after the other, and the position after the last call of each of them.
+    """
+    calls = []
+    ends = {}
+    for key, part in monthly.items():
+        if not ends and isinstance(part, RowList):
+            calls = RowList(part.store)
+        calls.extend(part)
+        ends[key] = len(calls)
+    return calls, ends
+
 
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing', 'datetime', 'call'
-            ''
+            'python_ta', 'typing', 'datetime', 'call', 'callstore',
+            'collections.abc', 'bisect'
         ],
-        'disable': ['R0902', 'R0913'],
+        'disable': ['R0902', 'R0913', 'W0603'],
         'generated-members': 'pygame.*'
     })
@@ -0,0 +1,482 @@
+"""
+CSC148, Winter 2024
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the CallStore class, a compact column-based storage for a
+large number of calls, and the CallRow and RowList classes, which present the
+calls in a CallStore with the same interface as Call objects and lists of
+Call objects.
+
+A CallStore keeps each attribute of all of its calls in a parallel array, so
+a call costs a few dozen bytes instead of a full Python object with its own
+datetime and location tuples.
+
+The columns of a CallStore can also be saved to a directory, one .npy file
+per column, and memory-mapped back by any number of processes (see
+save_columns and map_columns). The mapped columns are read in place from the
+files, so all of these processes share a single copy of the calls in the
+operating system's page cache.
+"""
+import ast
+import datetime
+import json
+import mmap
+import os
+import sys
+from array import array
+from typing import Iterable, Iterator, Optional, Union
+
+from call import Call, Drawable, START_CALL_SPRITE, END_CALL_SPRITE
+from registry import NumberRegistry
+
+# Call times are stored as whole seconds since this moment
+EPOCH = datetime.datetime(1970, 1, 1)
+_SECOND = datetime.timedelta(seconds=1)
+
+# Columns of a CallStore, in order
+COLUMNS = ('src_ids', 'dst_ids', 'times', 'durations',
+           'src_x', 'src_y', 'dst_x', 'dst_y')
+
+# Start of every .npy file (format version 1.0)
+_NPY_MAGIC = b'\x93NUMPY\x01\x00'
+
+
+class CallStore:
+    """ A column-based store of calls. Each call is identified by its index in
+    the store, in the order the calls were added.
+
+    === Public Attributes ===
+    registry:
+         the NumberRegistry giving the id of each phone number; it can be
+         shared with other stores and with the rest of the application
+    numbers:
+         the phone numbers of <registry>; a number is identified by its
+         index in this list
+    number_ids:
+         maps each phone number in <numbers> to its index
+    src_ids:
+         source number id of each call
+    dst_ids:
+         destination number id of each call
+    times:
+         time of each call, in whole seconds since EPOCH
+    durations:
+         duration of each call, in seconds
+    src_x, src_y:
+         longitude and latitude of the source of each call
+    dst_x, dst_y:
+         longitude and latitude of the destination of each call
+
+    A store whose columns are memory-mapped (see map_columns) holds them as
+    read-only memoryviews instead of arrays, and no call can be added to it.
+
+    === Representation Invariants ===
+    - all the arrays have the same length, which is the number of calls
+    - numbers[number_ids[n]] == n for every number n in <number_ids>
+    """
+    # === Private Attributes ===
+    # _sprites:
+    #     maps the index of each call drawn so far to its drawable sprites
+    #     and connecting line, so that they are only created once per call,
+    #     as for a Call
+    registry: NumberRegistry
+    numbers: list[str]
+    number_ids: dict[str, int]
+    src_ids: Union[array, memoryview]
+    dst_ids: Union[array, memoryview]
+    times: Union[array, memoryview]
+    durations: Union[array, memoryview]
+    src_x: Union[array, memoryview]
+    src_y: Union[array, memoryview]
+    dst_x: Union[array, memoryview]
+    dst_y: Union[array, memoryview]
+    _sprites: dict[int, tuple[list[Drawable], Drawable]]
+
+    def __init__(self, registry: Optional[NumberRegistry] = None) -> None:
+        """ Create an empty CallStore, with the phone numbers of <registry>
+        (or of a new registry, if None).
+        """
+        self.registry = NumberRegistry() if registry is None else registry
+        self.numbers = self.registry.numbers
+        self.number_ids = self.registry.ids
+        self.src_ids = array('i')
+        self.dst_ids = array('i')
+        self.times = array('q')
+        self.durations = array('i')
+        self.src_x = array('d')
+        self.src_y = array('d')
+        self.dst_x = array('d')
+        self.dst_y = array('d')
+        self._sprites = {}
+
+    def __len__(self) -> int:
+        """ Return the number of calls in this store.
+        """
+        return len(self.times)
+
+    def number_id(self, number: str) -> int:
+        """ Return the id of the phone number <number>, giving it a new id if
+        it has not been seen before.
+        """
+        return self.registry.intern(number)
+
+    def add(self, src_nr: str, dst_nr: str, calltime: datetime.datetime,
+            duration: int, src_loc: tuple[float, float],
+            dst_loc: tuple[float, float]) -> 'CallRow':
+        """ Add a call with the given attributes (the same ones as for a Call)
+        to this store, and return a row view of it.
+
+        Precondition: <calltime> has no microseconds.
+        """
+        return self.add_ids(self.number_id(src_nr), self.number_id(dst_nr),
+                            calltime, duration, src_loc, dst_loc)
+
+    def add_ids(self, src_id: int, dst_id: int, calltime: datetime.datetime,
+                duration: int, src_loc: tuple[float, float],
+                dst_loc: tuple[float, float]) -> 'CallRow':
+        """ Add a call with the given attributes to this store, as add()
+        does, but with the ids in <registry> of its source and destination
+        numbers instead of the numbers, and return a row view of it.
+
+        Precondition: <calltime> has no microseconds, and <src_id> and
+        <dst_id> are ids of <registry>.
+        """
+        if isinstance(self.times, memoryview):
+            raise ValueError('cannot add calls to a memory-mapped CallStore')
+        self.src_ids.append(src_id)
+        self.dst_ids.append(dst_id)
+        self.times.append((calltime - EPOCH) // _SECOND)
+        self.durations.append(duration)
+        self.src_x.append(src_loc[0])
+        self.src_y.append(src_loc[1])
+        self.dst_x.append(dst_loc[0])
+        self.dst_y.append(dst_loc[1])
+        return CallRow(self, len(self.times) - 1)
+
+    def add_call(self, call: Call) -> 'CallRow':
+        """ Add a copy of <call> to this store, and return a row view of it.
+        """
+        return self.add(call.src_number, call.dst_number, call.time,
+                        call.duration, call.src_loc, call.dst_loc)
+
+    def row(self, index: int) -> 'CallRow':
+        """ Return a row view of the call at <index>.
+        """
+        if not 0 <= index < len(self.times):
+            raise IndexError('call index out of range')
+        return CallRow(self, index)
+
+    def sprites(self, index: int) -> tuple[list[Drawable], Drawable]:
+        """ Return the drawable sprites and the connecting line of the call at
+        <index>. They are created the first time, and reused after that.
+        """
+        sprites = self._sprites.get(index)
+        if sprites is None:
+            row = CallRow(self, index)
+            sprites = ([Drawable(sprite_file=START_CALL_SPRITE,
+                                 location=row.src_loc),
+                        Drawable(sprite_file=END_CALL_SPRITE,
+                                 location=row.dst_loc)],
+                       Drawable(linelimits=(row.src_loc, row.dst_loc)))
+            self._sprites[index] = sprites
+        return sprites
+
+    def rows(self) -> Iterator['CallRow']:
+        """ Yield a row view of every call in this store, in order.
+        """
+        for index in range(len(self.times)):
+            yield CallRow(self, index)
+
+
+class CallRow:
+    """ A lightweight view of one call in a CallStore. It offers the same
+    attributes and methods as a Call, computed from the store on access.
+
+    Two rows are equal if they view the same call of the same store, so a
+    fresh row can be used to look up a call in a list or a set.
+
+    === Public Attributes ===
+    store:
+         the CallStore holding this call
+    index:
+         the index of this call in <store>
+    """
+    __slots__ = ('store', 'index')
+    store: CallStore
+    index: int
+
+    def __init__(self, store: CallStore, index: int) -> None:
+        """ Create a view of the call at <index> in <store>.
+        """
+        self.store = store
+        self.index = index
+
+    @property
+    def src_number(self) -> str:
+        """ The source number of this call. """
+        return self.store.numbers[self.store.src_ids[self.index]]
+
+    @property
+    def dst_number(self) -> str:
+        """ The destination number of this call. """
+        return self.store.numbers[self.store.dst_ids[self.index]]
+
+    @property
+    def src_id(self) -> int:
+        """ The id of the source number of this call. """
+        return self.store.src_ids[self.index]
+
+    @property
+    def dst_id(self) -> int:
+        """ The id of the destination number of this call. """
+        return self.store.dst_ids[self.index]
+
+    @property
+    def time(self) -> datetime.datetime:
+        """ The date and time of this call. """
+        return EPOCH + datetime.timedelta(seconds=self.store.times[self.index])
+
+    @property
+    def duration(self) -> int:
+        """ The duration of this call, in seconds. """
+        return self.store.durations[self.index]
+
+    @property
+    def src_loc(self) -> tuple[float, float]:
+        """ The (longitude, latitude) of the source of this call. """
+        return self.store.src_x[self.index], self.store.src_y[self.index]
+
+    @property
+    def dst_loc(self) -> tuple[float, float]:
+        """ The (longitude, latitude) of the destination of this call. """
+        return self.store.dst_x[self.index], self.store.dst_y[self.index]
+
+    def get_bill_date(self) -> tuple[int, int]:
+        """ Return the billing date for this call, as a tuple containing the
+        month and the year
+        """
+        time = self.time
+        return time.month, time.year
+
+    def get_drawables(self) -> list[Drawable]:
+        """ Return the list of drawable sprites for this call. They are kept
+        by the store, so every row of the call returns the same sprites.
+        """
+        return self.store.sprites(self.index)[0]
+
+    def get_connection(self) -> Drawable:
+        """ Return the connecting line for this call start and end locations
+        """
+        return self.store.sprites(self.index)[1]
+
+    def to_call(self) -> Call:
+        """ Return a new, standalone Call with the attributes of this call.
+        """
+        return Call(self.src_number, self.dst_number, self.time,
+                    self.duration, self.src_loc, self.dst_loc)
+
+    def __eq__(self, other: object) -> bool:
+        """ Return whether <other> views the same call of the same store.
+        """
+        return isinstance(other, CallRow) and self.store is other.store \
+            and self.index == other.index
+
+    def __hash__(self) -> int:
+        """ Return a hash consistent with __eq__.
+        """
+        return hash((id(self.store), self.index))
+
+    def __str__(self) -> str:
+        """ Return the string representation of this call, as for a Call"""
+        return "srcnum" + self.src_number + "srcdst" + self.dst_number + "time"\
+            + str(self.time) + "dur" + str(self.duration) + "srcloc"\
+            + str(self.src_loc) + "dstloc" + str(self.dst_loc)
+
+
+class RowList:
+    """ A list of calls from a single CallStore, which only keeps the index of
+    each call. It supports the list operations used on lists of calls:
+    append, insert, extend, len, iteration, indexing and membership.
+
+    === Public Attributes ===
+    store:
+         the CallStore holding the calls in this list
+    indices:
+         the index in <store> of each call in this list, in order
+    """
+    __slots__ = ('store', 'indices')
+    store: CallStore
+    indices: array
+
+    def __init__(self, store: CallStore,
+                 indices: Iterable[int] = ()) -> None:
+        """ Create a list of the calls at <indices> in <store>.
+        """
+        self.store = store
+        self.indices = array('i', indices)
+
+    def append(self, row: CallRow) -> None:
+        """ Add <row> to the end of this list.
+
+        Precondition: <row> is a row of this list's store.
+        """
+        self.indices.append(row.index)
+
+    def insert(self, position: int, row: CallRow) -> None:
+        """ Insert <row> before the call at <position> in this list.
+
+        Precondition: <row> is a row of this list's store.
+        """
+        self.indices.insert(position, row.index)
+
+    def extend(self, rows: Iterable[CallRow]) -> None:
+        """ Add each of the <rows> to the end of this list, in order.
+
+        Precondition: every row is a row of this list's store.
+        """
+        if isinstance(rows, RowList):
+            self.indices.extend(rows.indices)
+        else:
+            self.indices.extend(row.index for row in rows)
+
+    def __len__(self) -> int:
+        """ Return the number of calls in this list.
+        """
+        return len(self.indices)
+
+    def __iter__(self) -> Iterator[CallRow]:
+        """ Yield a row view of each call in this list, in order.
+        """
+        store = self.store
+        for index in self.indices:
+            yield CallRow(store, index)
+
+    def __getitem__(self, item: Union[int, slice]) \
+            -> Union[CallRow, 'RowList']:
+        """ Return the row at position <item>, or a new RowList if <item> is
+        a slice.
+        """
+        if isinstance(item, slice):
+            return RowList(self.store, self.indices[item])
+        return CallRow(self.store, self.indices[item])
+
+    def __contains__(self, item: object) -> bool:
+        """ Return whether <item> is a row of a call in this list.
+        """
+        return isinstance(item, CallRow) and item.store is self.store \
+            and item.index in self.indices
+
+
+def new_call_list(call: Union[Call, CallRow]) -> Union[list, RowList]:
+    """ Return a new empty list suitable for holding <call> and other calls
+    like it: a RowList over the same store if <call> is a CallRow, and a
+    plain list otherwise.
+    """
+    if isinstance(call, CallRow):
+        return RowList(call.store)
+    return []
+
+
+def save_columns(store: CallStore, directory: str) -> None:
+    """ Save the columns of <store> to <directory>, which is created if
+    needed: one <column>.npy file per column (which numpy.load can also
+    read), and the phone numbers in numbers.json.
+
+    Each file is written under a temporary name, then renamed over the
+    previous one, so that processes which have the previous columns mapped
+    keep reading them intact.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name in COLUMNS:
+        column = getattr(store, name)
+        typecode = column.format if isinstance(column, memoryview) \
+            else column.typecode
+        filename = os.path.join(directory, name + '.npy')
+        with open(filename + '.tmp', 'wb') as o:
+            o.write(_npy_header(typecode, len(column)))
+            o.write(column)
+        os.replace(filename + '.tmp', filename)
+    filename = os.path.join(directory, 'numbers.json')
+    with open(filename + '.tmp', 'w') as o:
+        json.dump(store.numbers, o)
+    os.replace(filename + '.tmp', filename)
+
+
+def map_columns(directory: str) -> CallStore:
+    """ Return a read-only CallStore whose columns are memory-mapped from the
+    files saved by save_columns in <directory>.
+
+    Raise a ValueError if the columns do not all have the same length.
+    """
+    with open(os.path.join(directory, 'numbers.json')) as o:
+        store = CallStore(NumberRegistry(json.load(o)))
+    for name in COLUMNS:
+        typecode = getattr(store, name).typecode
+        setattr(store, name,
+                _map_npy(os.path.join(directory, name + '.npy'), typecode))
+    if len({len(getattr(store, name)) for name in COLUMNS}) != 1:
+        raise ValueError(f'the columns in {directory} have different lengths')
+    return store
+
+
+def _npy_descr(typecode: str) -> str:
+    """ Return the numpy type description of the array <typecode>, in the
+    byte order of this machine.
+    """
+    kind = 'f' if typecode in 'fd' else 'i'
+    order = '<' if sys.byteorder == 'little' else '>'
+    return f'{order}{kind}{array(typecode).itemsize}'
+
+
+def _npy_header(typecode: str, length: int) -> bytes:
+    """ Return the .npy header of a one dimensional array of <length> items
+    of the array <typecode>, padded so the data is aligned to 64 bytes.
+    """
+    header = f"{{'descr': '{_npy_descr(typecode)}', 'fortran_order': False, " \
+             f"'shape': ({length},), }}"
+    size = len(_NPY_MAGIC) + 2 + len(header) + 1
+    header += ' ' * (-size % 64) + '\n'
+    return _NPY_MAGIC + len(header).to_bytes(2, 'little') + header.encode()
+
+
+def _map_npy(filename: str, typecode: str) -> memoryview:
+    """ Return a read-only memoryview of the data of the .npy file
+    <filename>, memory-mapped and cast to the array <typecode>.
+    """
+    with open(filename, 'rb') as o:
+        if o.read(len(_NPY_MAGIC)) != _NPY_MAGIC:
+            raise ValueError(f'{filename} is not a version 1.0 .npy file')
+        header_len = int.from_bytes(o.read(2), 'little')
+        header = ast.literal_eval(o.read(header_len).decode())
+        if header['descr'] != _npy_descr(typecode) or \
+                header['fortran_order'] or len(header['shape']) != 1:
+            raise ValueError(f'{filename} does not hold a column of type '
+                             f'{_npy_descr(typecode)}')
+        offset = len(_NPY_MAGIC) + 2 + header_len
+        end = offset + header['shape'][0] * array(typecode).itemsize
+        mapped = mmap.mmap(o.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped)[offset:end].cast(typecode)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'datetime', 'array', 'call', 'ast',
+            'json', 'mmap', 'os', 'sys', 'registry'
+        ],
+        'allowed-io': ['save_columns', 'map_columns', '_map_npy'],
+        'disable': ['R0902'],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,300 @@
+"""
+CSC148, Winter 2024
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains functions to save the billing state of all customers to a
+checkpoint file, restore it, and resume processing an event log from where
+the checkpoint left off.
+
+A checkpoint holds the customers, their phone lines, the state of each
+contract (including its current bill and, for prepaid contracts, the
+balance), every monthly bill, the EventCursor of the last processed event
+and, unless left out, the call history of every line. Each call is saved
+once, and the histories refer to it by its position in the list of calls,
+so a restored call is shared by its caller and its receiver, as it is after
+processing the events. Without the histories, a restored customer only has
+the calls processed after the checkpoint.
+
+With a checkpoint, a monthly billing run only processes the new events, and
+the events before the cursor are skipped without being parsed:
+
+    customers = backfill('dataset.json', 'state.json')
+"""
+import datetime
+import json
+import os
+from typing import Any, Optional, Union
+
+from application import EventCursor, TIME_FORMAT, build_number_index, \
+    create_customers, import_data, process_event_history
+from bill import Bill
+from call import Call
+from callhistory import CallHistory
+from callstore import CallRow
+from contract import MTMContract, PrepaidContract, TermContract
+from customer import Customer
+from ledger import BillLedger, LedgerBill, LedgerBills
+from phoneline import PhoneLine
+
+# Version of the checkpoint format, saved in every checkpoint
+CHECKPOINT_VERSION = 2
+
+# Contract type names used in checkpoints, as in the dataset
+_CONTRACT_TYPES = {TermContract: 'term', MTMContract: 'mtm',
+                   PrepaidContract: 'prepaid'}
+
+
+def save_checkpoint(filename: str, customers: list[Customer],
+                    cursor: EventCursor, histories: bool = True) -> None:
+    """ Save the billing state of the <customers>, who have processed the
+    events up to <cursor>, to the checkpoint file <filename>. Their call
+    histories are saved too, unless <histories> is False.
+
+    The file is replaced atomically, so an interrupted save leaves the
+    previous checkpoint intact.
+    """
+    calls = {}
+    customer_states = []
+    for customer in customers:
+        lines = []
+        for line in customer.get_phone_lines():
+            state = line_state(line)
+            if histories:
+                state['history'] = _history_state(line.get_call_history(),
+                                                  calls)
+            lines.append(state)
+        customer_states.append({'id': customer.get_id(), 'lines': lines})
+    state = {
+        'version': CHECKPOINT_VERSION,
+        'cursor': {'time': _format_date(cursor.time, TIME_FORMAT),
+                   'index': cursor.index},
+        'customers': customer_states
+    }
+    if histories:
+        state['calls'] = [_call_state(call) for call in calls]
+    temp = filename + '.tmp'
+    with open(temp, 'w') as o:
+        json.dump(state, o)
+    os.replace(temp, filename)
+
+
+def load_checkpoint(filename: str, ledger: Optional[BillLedger] = None) \
+        -> tuple[list[Customer], EventCursor]:
+    """ Return the customers saved in the checkpoint file <filename>, and
+    the EventCursor of the last event they processed. If <ledger> is given,
+    the bills of the restored phone lines are stored in it.
+    """
+    with open(filename) as o:
+        state = json.load(o)
+    if state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f'unsupported checkpoint version in {filename}')
+    calls = [_restore_call(call_state)
+             for call_state in state.get('calls', [])]
+    customers = []
+    for customer_state in state['customers']:
+        customer = Customer(customer_state['id'])
+        for state_of_line in customer_state['lines']:
+            line = restore_line(state_of_line, ledger)
+            if 'history' in state_of_line:
+                _restore_history(line.get_call_history(),
+                                 state_of_line['history'], calls)
+            customer.add_phone_line(line)
+        customers.append(customer)
+    cursor = EventCursor(_parse_date(state['cursor']['time'], TIME_FORMAT),
+                         state['cursor']['index'])
+    return customers, cursor
+
+
+def backfill(dataset: str, filename: str, stream: bool = False,
+             ledger: Optional[BillLedger] = None,
+             histories: bool = True) -> list[Customer]:
+    """ Return the customers of the dataset in <dataset> with all of its
+    events processed, and save their state to the checkpoint file
+    <filename>.
+
+    If <filename> already exists, the customers are restored from it and
+    only the events after its cursor are read and processed. Otherwise the
+    customers are created from the dataset and all of its events are
+    processed. If <stream> is True, the dataset is read incrementally. If
+    <ledger> is given, the bills are stored in it. If <histories> is False,
+    the call histories are left out of the checkpoint.
+
+    Precondition: the events of <dataset> start with all the events that
+    were processed when the checkpoint was saved.
+    """
+    if os.path.exists(filename):
+        customers, cursor = load_checkpoint(filename, ledger)
+        log = import_data(dataset, stream, cursor.index)
+    else:
+        log = import_data(dataset, stream)
+        customers, cursor = create_customers(log, ledger), EventCursor()
+    process_event_history(log, customers, build_number_index(customers)[0],
+                          cursor=cursor)
+    save_checkpoint(filename, customers, cursor, histories)
+    return customers
+
+
+def line_state(line: PhoneLine) -> dict[str, Any]:
+    """ Return the state of <line> and its contract, as saved in a
+    checkpoint.
+    """
+    contract = line.contract
+    contract_state = {'type': _CONTRACT_TYPES[type(contract)],
+                      'start': _format_date(contract.start, '%Y-%m-%d'),
+                      'bill': None}
+    if isinstance(contract, TermContract):
+        contract_state['end'] = _format_date(contract.end, '%Y-%m-%d')
+        contract_state['current'] = [getattr(contract, 'current_month', None),
+                                     getattr(contract, 'current_year', None)]
+    elif isinstance(contract, PrepaidContract):
+        contract_state['balance'] = contract.balance
+
+    bills = []
+    for (month, year), bill in line.bills.items():
+        bills.append([month, year, bill.type, bill.fixed_cost, bill.free_min,
+                      bill.billed_min, bill.min_rate])
+        if _same_bill(bill, contract.bill):
+            contract_state['bill'] = [month, year]
+    return {'number': line.get_number(), 'contract': contract_state,
+            'bills': bills}
+
+
+def restore_line(state: dict[str, Any],
+                 ledger: Optional[BillLedger]) -> PhoneLine:
+    """ Return the phone line saved as <state> in a checkpoint, with its
+    bills stored in <ledger> if given.
+    """
+    contract_state = state['contract']
+    start = _parse_date(contract_state['start'], '%Y-%m-%d')
+    if contract_state['type'] == 'term':
+        contract = TermContract(start, _parse_date(contract_state['end'],
+                                                   '%Y-%m-%d'))
+        month, year = contract_state['current']
+        if month is not None:
+            contract.current_month = month
+            contract.current_year = year
+    elif contract_state['type'] == 'prepaid':
+        contract = PrepaidContract(start, 0)
+        contract.balance = contract_state['balance']
+    else:
+        contract = MTMContract(start)
+
+    line = PhoneLine(state['number'], contract, ledger)
+    for month, year, bill_type, fixed, free_min, billed_min, rate \
+            in state['bills']:
+        if isinstance(line.bills, LedgerBills):
+            bill = line.bills.add((month, year))
+        else:
+            bill = Bill()
+            line.bills[(month, year)] = bill
+        bill.set_rates(bill_type, rate)
+        bill.fixed_cost = fixed
+        bill.free_min = free_min
+        bill.billed_min = billed_min
+    if contract_state['bill'] is not None:
+        contract.bill = line.bills[tuple(contract_state['bill'])]
+    return line
+
+
+def _history_state(history: CallHistory,
+                   calls: dict[Union[Call, CallRow], int]) \
+        -> dict[str, list[list[Any]]]:
+    """ Return the state of the call history <history>, as saved in a
+    checkpoint: the [month, year, positions] of each month of outgoing and
+    of incoming calls, where <calls> maps each call to its position. The
+    calls of <history> that are not in <calls> yet are added to it, at the
+    next position.
+    """
+    state = {}
+    for side, monthly in (('outgoing', history.outgoing_calls),
+                          ('incoming', history.incoming_calls)):
+        months = []
+        for (month, year), month_calls in monthly.items():
+            positions = []
+            for call in month_calls:
+                if call not in calls:
+                    calls[call] = len(calls)
+                positions.append(calls[call])
+            months.append([month, year, positions])
+        state[side] = months
+    return state
+
+
+def _restore_history(history: CallHistory, state: dict[str, list[list[Any]]],
+                     calls: list[Call]) -> None:
+    """ Register the calls of the history saved as <state> in <history>,
+    taking them from <calls> by position.
+    """
+    for _, _, positions in state['outgoing']:
+        for position in positions:
+            history.register_outgoing_call(calls[position])
+    for _, _, positions in state['incoming']:
+        for position in positions:
+            history.register_incoming_call(calls[position])
+
+
+def _call_state(call: Union[Call, CallRow]) -> list[Any]:
+    """ Return the state of <call>, as saved in a checkpoint.
+    """
+    return [call.src_number, call.dst_number,
+            _format_date(call.time, TIME_FORMAT), call.duration,
+            list(call.src_loc), list(call.dst_loc)]
+
+
+def _restore_call(state: list[Any]) -> Call:
+    """ Return the call saved as <state> in a checkpoint.
+    """
+    src_number, dst_number, call_time, duration, src_loc, dst_loc = state
+    return Call(src_number, dst_number, _parse_date(call_time, TIME_FORMAT),
+                duration, (src_loc[0], src_loc[1]), (dst_loc[0], dst_loc[1]))
+
+
+def _same_bill(bill: Bill, other: Optional[Bill]) -> bool:
+    """ Return whether <bill> and <other> are the same bill, either as the
+    same object or as views of the same ledger row.
+    """
+    if isinstance(bill, LedgerBill) and isinstance(other, LedgerBill):
+        return bill.ledger is other.ledger and bill.row == other.row
+    return bill is other
+
+
+def _format_date(value: Optional[datetime.date], date_format: str) \
+        -> Optional[str]:
+    """ Return <value> formatted with <date_format>, or None if <value> is
+    None.
+    """
+    return None if value is None else value.strftime(date_format)
+
+
+def _parse_date(value: Optional[str], date_format: str) -> Any:
+    """ Return the date (or date and time, if <date_format> has a time) in
+    <value> formatted with <date_format>, or None if <value> is None.
+    """
+    if value is None:
+        return None
+    parsed = datetime.datetime.strptime(value, date_format)
+    return parsed if '%H' in date_format else parsed.date()
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'datetime', 'json', 'os', 'application',
+            'bill', 'call', 'callhistory', 'callstore', 'contract',
+            'customer', 'ledger', 'phoneline'
+        ],
+        'allowed-io': ['save_checkpoint', 'load_checkpoint'],
+        'generated-members': 'pygame.*'
+    })
@@ -13,10 +13,15 @@ Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
 import datetime
 from math import ceil
-from typing import Optional
+from typing import Optional, Sequence
 from bill import Bill
 from call import Call
 
+try:
+    import numpy
+except ImportError:  # numpy is optional; calls are then rated one by one
+    numpy = None
+
 
 # Constants for the month-to-month contract monthly fee and term deposit
 MTM_MONTHLY_FEE = 50.00
@@ -77,6 +82,16 @@ class Contract:
         """
         self.bill.add_billed_minutes(ceil(call.duration / 60.0))
 
+    def bill_calls(self, durations: Sequence[int]) -> None:
+        """ Add calls lasting <durations> seconds, in order, to the bill, with
+        the same result as calling bill_call on each of them.
+
+        Precondition:
+        - as for bill_call, self.bill is the bill of the month+year when all
+        of the calls were made.
+        """
+        self.bill.add_billed_minutes(_total(call_minutes(durations)))
+
     def cancel_contract(self) -> float:
         """ Return the amount owed in order to close the phone line associated
         with this contract.
@@ -151,6 +166,24 @@ class TermContract(Contract):
         else:
             self.bill.add_billed_minutes(duration)
 
+    def bill_calls(self, durations: Sequence[int]) -> None:
+        """ Add calls lasting <durations> seconds, in order, to the bill, with
+        the same result as calling bill_call on each of them: the calls use
+        up the free minutes left this month, and the rest is billed.
+
+        Precondition:
+        - as for bill_call, self.bill is the bill of the month+year when all
+        of the calls were made.
+        """
+        total = _total(call_minutes(durations))
+        free_min = self.bill.free_min
+        if free_min >= TERM_MINS or total == 0:
+            self.bill.add_billed_minutes(total)
+            return
+        free = min(TERM_MINS, free_min + total) - free_min
+        self.bill.add_free_minutes(free)
+        self.bill.add_billed_minutes(total - free)
+
     def cancel_contract(self) -> float:
         """ Return the amount owed in order to close the phone line associated
         with this contract. If the customer cancels the contract early, 
@@ -239,6 +272,18 @@ class PrepaidContract(Contract):
         self.bill.add_billed_minutes(ceil(call.duration / 60.0))
         self.balance = self.bill.get_cost()
 
+    def bill_calls(self, durations: Sequence[int]) -> None:
+        """ Add calls lasting <durations> seconds, in order, to the bill, with
+        the same result as calling bill_call on each of them. Also change the
+        balance according to bill.
+
+        Precondition:
+        - as for bill_call, self.bill is the bill of the month+year when all
+        of the calls were made.
+        """
+        super().bill_calls(durations)
+        self.balance = self.bill.get_cost()
+
     def cancel_contract(self) -> float:
         """ Return the amount owed in order to close the phone line associated 
         with this prepaid contract. If the contract still has some credit 
@@ -257,11 +302,30 @@ class PrepaidContract(Contract):
         return self.balance
 
 
+def call_minutes(durations: Sequence[int]) -> Sequence[int]:
+    """ Return the number of minutes billed for calls lasting <durations>
+    seconds: each call is rounded up to the next whole minute.
+    """
+    if numpy is not None:
+        # -(-d // 60) is ceil(d / 60) computed exactly on integers
+        return -(-numpy.asarray(durations, dtype=numpy.int64) // 60)
+    return [ceil(duration / 60.0) for duration in durations]
+
+
+def _total(minutes: Sequence[int]) -> int:
+    """ Return the sum of <minutes>, as returned by call_minutes.
+    """
+    if numpy is not None:
+        return int(numpy.sum(minutes))
+    return sum(minutes)
+
+
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing', 'datetime', 'bill', 'call', 'math'
+            'python_ta', 'typing', 'datetime', 'bill', 'call', 'math',
+            'numpy'
         ],
         'disable': ['R0902', 'R0913'],
         'generated-members': 'pygame.*'
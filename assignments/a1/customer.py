@@ -11,10 +11,10 @@ any changes, are expressly prohibited.
 All of the files in this directory and all subdirectories are:
 Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
-from typing import Union
+from typing import Optional, Union
 from phoneline import PhoneLine
 from call import Call
-from callhistory import CallHistory
+from callhistory import CallHistory, CallsView, mark_history_changed
 
 
 class Customer:
@@ -26,14 +26,24 @@ class Customer:
     #     this customer's 4 digit Customer id
     # _phone_lines:
     #     this customer's phone lines
+    # _lines_by_number:
+    #     this customer's phone lines, keyed by their phone number.
+    #     It always holds the same lines as <_phone_lines>.
+    # _history:
+    #     the (outgoing, incoming) views returned by get_history, built the
+    #     first time it is called, or None if the phone lines changed since
     _id: int
     _phone_lines: list[PhoneLine]
+    _lines_by_number: dict[str, PhoneLine]
+    _history: Optional[tuple[CallsView, CallsView]]
 
     def __init__(self, cid: int) -> None:
         """ Create a new Customer with the <cid> id
         """
         self._id = cid
         self._phone_lines = []
+        self._lines_by_number = {}
+        self._history = None
 
     def new_month(self, month: int, year: int) -> None:
         """ Advance to a new month (specified by <month> and <year>) in the
@@ -51,11 +61,9 @@ class Customer:
         Precondition: The phone line associated with the source phone number of
         <call>, is owned by this customer
         """
-        src_number = call.src_number
-        for phone_line in self._phone_lines:
-            number = phone_line.get_number()
-            if number == src_number:
-                phone_line.make_call(call)
+        phone_line = self._lines_by_number.get(call.src_number)
+        if phone_line is not None:
+            phone_line.make_call(call)
 
     def receive_call(self, call: Call) -> None:
         """ Record that a call was made to the destination phone number of
@@ -64,23 +72,28 @@ class Customer:
         Precondition: The phone line associated with the destination phone
         number of <call>, is owned by this customer
         """
-        dst_number = call.dst_number
-        for phone_line in self._phone_lines:
-            number = phone_line.get_number()
-            if number == dst_number:
-                phone_line.receive_call(call)
+        phone_line = self._lines_by_number.get(call.dst_number)
+        if phone_line is not None:
+            phone_line.receive_call(call)
+
+    def get_phone_line(self, number: str) -> Optional[PhoneLine]:
+        """ Return the PhoneLine of this customer with the number <number>,
+        or None if <number> is not owned by this customer.
+        """
+        return self._lines_by_number.get(number)
 
     def cancel_phone_line(self, number: str) -> Union[float, None]:
         """ Remove PhoneLine with number <number> from this customer and return
         the amount still owed by this customer.
         Return None if <number> is not owned by this customer.
         """
-        fee = None
-        for pl in self._phone_lines:
-            if pl.get_number() == number:
-                self._phone_lines.remove(pl)
-                fee = pl.cancel_line()
-        return fee
+        pl = self._lines_by_number.pop(number, None)
+        if pl is None:
+            return None
+        self._phone_lines.remove(pl)
+        self._history = None
+        mark_history_changed()
+        return pl.cancel_line()
 
     # ----------------------------------------------------------
     # NOTE: You do not need to understand the implementation of
@@ -92,6 +105,14 @@ class Customer:
         """ Add a new PhoneLine to this customer.
         """
         self._phone_lines.append(pline)
+        self._lines_by_number[pline.get_number()] = pline
+        self._history = None
+        mark_history_changed()
+
+    def get_phone_lines(self) -> list[PhoneLine]:
+        """ Return a list of all of the phone lines this customer owns
+        """
+        return self._phone_lines[:]
 
     def get_phone_numbers(self) -> list[str]:
         """ Return a list of all of the numbers this customer owns
@@ -109,11 +130,7 @@ class Customer:
     def __contains__(self, item: str) -> bool:
         """ Check if this customer owns the phone number <item>
         """
-        contains = False
-        for line in self._phone_lines:
-            if line.get_number() == item:
-                contains = True
-        return contains
+        return item in self._lines_by_number
 
     def generate_bill(self, month: int, year: int) \
             -> tuple[int, float, list[dict]]:
@@ -148,31 +165,42 @@ class Customer:
             print("\tnumber: " + line['number'] + "  type: " + line['type'])
         print("==========================")
 
-    def get_history(self) \
-            -> tuple[list[Call], list[Call]]:
+    def get_history(self) -> tuple[CallsView, CallsView]:
         """ Return all the calls from the call history of this
         customer, as a tuple in the following format:
         (outgoing calls, incoming calls)
+
+        The calls are grouped by phone line, in the order the lines were
+        added, and each line's calls are in the order of its
+        get_monthly_history().
+
+        The calls are returned as read-only CallsViews over the call histories
+        of the lines, which are not copies: they see calls registered after
+        this method returns, until a phone line is added or cancelled. Their
+        length and indexing take time proportional to the number of phone
+        lines, not to the number of calls.
         """
-        history = ([], [])
-        for line in self._phone_lines:
-            line_history = line.get_monthly_history()
-            history[0].extend(line_history[0])
-            history[1].extend(line_history[1])
-        return history
+        if self._history is None:
+            self._history = (
+                CallsView(*[line.callhistory.get_all_outgoing()
+                            for line in self._phone_lines]),
+                CallsView(*[line.callhistory.get_all_incoming()
+                            for line in self._phone_lines]))
+        return self._history
 
     def get_call_history(self, number: str = None) -> list[CallHistory]:
         """ Return the call history for <number>, stored into a list.
         If <number> is not provided, return a list of all call histories for all
         phone lines owned by this customer.
         """
+        if number is not None:
+            line = self._lines_by_number.get(number)
+            if line is None:
+                return []
+            return [line.get_call_history()]
         history = []
         for line in self._phone_lines:
-            if number is not None:
-                if line.get_number() == number:
-                    history.append(line.get_call_history())
-            else:
-                history.append(line.get_call_history())
+            history.append(line.get_call_history())
         return history
 
 
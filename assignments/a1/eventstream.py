@@ -0,0 +1,283 @@
+"""
+CSC148, Winter 2024
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains incremental readers for the input dataset, so that the
+customers and events can be processed one at a time without loading the
+whole file into memory.
+
+Two file formats are supported:
+- the regular dataset format (a single JSON object with an "events" list and
+  a "customers" list, in any order), as described in the A1 handout.
+- JSON-Lines, where every line holds one JSON object: either a customer
+  (with "id" and "lines" keys) or an event (with a "type" key). All customer
+  lines must come before the first event line.
+"""
+import json
+import re
+from typing import Any, Iterator, TextIO
+
+# Number of characters read from the file at a time
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Characters that matter while skipping over a value without decoding it
+_STRUCTURAL = re.compile(r'["\[\]{}]')
+_STRING_END = re.compile(r'["\\]')
+
+
+class _JsonStream:
+    """ A buffered reader over a text file containing JSON, which decodes
+    one value at a time.
+
+    Only the part of the file that has not been consumed yet (plus at most one
+    chunk) is kept in memory.
+    """
+    # === Private Attributes ===
+    # _file:
+    #     the open file being read
+    # _buf:
+    #     text read from <_file> that has not been discarded yet
+    # _pos:
+    #     index in <_buf> of the next character to consume
+    # _eof:
+    #     whether the whole file has been read into <_buf>
+    _file: TextIO
+    _buf: str
+    _pos: int
+    _eof: bool
+
+    def __init__(self, file: TextIO) -> None:
+        """ Create a stream reading JSON text from <file>.
+        """
+        self._file = file
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """ Read one more chunk into the buffer. Return False if the end of the
+        file was already reached.
+        """
+        if self._eof:
+            return False
+        if self._pos > CHUNK_SIZE:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        chunk = self._file.read(CHUNK_SIZE)
+        if chunk == '':
+            self._eof = True
+            return False
+        self._buf += chunk
+        return True
+
+    def peek(self) -> str:
+        """ Skip any whitespace and return the next character, without
+        consuming it. Return '' at the end of the file.
+        """
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        """ Consume the next non-whitespace character, which must be <char>.
+        """
+        found = self.peek()
+        if found != char:
+            raise ValueError(f'expected {char!r} but found {found!r}')
+        self._pos += 1
+
+    def decode(self) -> Any:
+        """ Decode and return the next JSON value.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number could continue in the next chunk
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def skip(self) -> None:
+        """ Consume the next JSON value without building it in memory.
+        """
+        if self.peek() not in '[{"':
+            self.decode()
+            return
+        depth = 0
+        while True:
+            match = _STRUCTURAL.search(self._buf, self._pos)
+            if match is None:
+                self._pos = len(self._buf)
+                if not self._fill():
+                    raise ValueError('unexpected end of file')
+                continue
+            self._pos = match.end()
+            char = match.group()
+            if char == '"':
+                self._skip_string_tail()
+            elif char in '[{':
+                depth += 1
+            else:
+                depth -= 1
+            if depth == 0:
+                return
+
+    def _skip_string_tail(self) -> None:
+        """ Consume the rest of a string whose opening quote was just consumed.
+        """
+        while True:
+            match = _STRING_END.search(self._buf, self._pos)
+            if match is None or (match.group() == '\\'
+                                 and match.end() == len(self._buf)):
+                if not self._fill():
+                    raise ValueError('unterminated string')
+                continue
+            if match.group() == '"':
+                self._pos = match.end()
+                return
+            # skip the escaped character
+            self._pos = match.end() + 1
+
+
+def _iter_key(filename: str, key: str, start: int = 0) -> Iterator[Any]:
+    """ Yield the items of the list stored under <key> in the top-level JSON
+    object of the file <filename>, one at a time, from the item at index
+    <start>.
+    The values stored under any other key, and the first <start> items, are
+    skipped without being decoded.
+    """
+    with open(filename) as file:
+        stream = _JsonStream(file)
+        stream.expect('{')
+        if stream.peek() == '}':
+            return
+        while True:
+            name = stream.decode()
+            stream.expect(':')
+            if name != key:
+                stream.skip()
+            else:
+                stream.expect('[')
+                if stream.peek() == ']':
+                    return
+                while True:
+                    if start > 0:
+                        stream.skip()
+                        start -= 1
+                    else:
+                        yield stream.decode()
+                    if stream.peek() == ']':
+                        return
+                    stream.expect(',')
+            if stream.peek() == '}':
+                return
+            stream.expect(',')
+
+
+def _iter_jsonl(filename: str, customers: bool, start: int = 0) \
+        -> Iterator[dict]:
+    """ Yield the customer records (if <customers> is True) or the event
+    records (otherwise) from the JSON-Lines file <filename>, one at a time.
+    The first <start> event records are skipped without being decoded.
+    """
+    with open(filename) as file:
+        for line in file:
+            if line.strip() == '':
+                continue
+            record = json.loads(line)
+            is_event = 'type' in record
+            if customers and is_event:
+                # Customers always come before the first event
+                return
+            if customers or is_event:
+                break
+        else:
+            return
+        if customers or start == 0:
+            yield record
+        else:
+            start -= 1
+        # Every line from here on holds a record of the same kind
+        for line in file:
+            if line.strip() == '':
+                continue
+            if start > 0:
+                start -= 1
+                continue
+            record = json.loads(line)
+            if customers and 'type' in record:
+                return
+            yield record
+
+
+def is_jsonl(filename: str) -> bool:
+    """ Return whether <filename> should be read as JSON-Lines, based on its
+    extension.
+    """
+    return filename.endswith('.jsonl') or filename.endswith('.ndjson')
+
+
+def iter_customers(filename: str) -> Iterator[dict]:
+    """ Yield the customer records of the dataset file <filename>, one at a
+    time.
+    """
+    if is_jsonl(filename):
+        return _iter_jsonl(filename, True)
+    return _iter_key(filename, 'customers')
+
+
+def iter_events(filename: str, start: int = 0) -> Iterator[dict]:
+    """ Yield the event records of the dataset file <filename>, one at a
+    time, in the order they appear in the file, from the event at index
+    <start>. The events before it are skipped without being decoded.
+    """
+    if is_jsonl(filename):
+        return _iter_jsonl(filename, False, start)
+    return _iter_key(filename, 'events', start)
+
+
+def stream_data(filename: str, start_event: int = 0) \
+        -> dict[str, Iterator[dict]]:
+    """ Return a dictionary with the same keys as the dataset format
+    ("customers" and "events"), whose values are iterators reading the
+    records from <filename> lazily. The events start at the event at index
+    <start_event>.
+
+    The "customers" iterator should be consumed before the "events" one, as
+    create_customers() and process_event_history() do.
+    """
+    return {'customers': iter_customers(filename),
+            'events': iter_events(filename, start_event)}
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'json', 're'
+        ],
+        'allowed-io': ['_iter_key', '_iter_jsonl'],
+        'generated-members': 'pygame.*'
+    })
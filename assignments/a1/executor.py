@@ -0,0 +1,258 @@
+"""
+CSC148, Winter 2024
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the FilterExecutor class, which applies a filter to a list
+of calls by splitting the list in chunks, filtering the chunks concurrently,
+and merging the results back in order.
+
+Three modes are available:
+- "serial": the chunks are filtered one after the other, in this process.
+- "thread": the chunks are filtered by a pool of threads. This only helps
+  when the filter waits on I/O, since the filters themselves hold the GIL.
+- "process": the chunks are filtered by a pool of worker processes. The
+  workers are forked once, with the customers and the calls already in
+  memory, and reused for every later application to the same customers and
+  to calls among those. Only the filter and the positions of the calls of
+  each chunk are sent to them, and they only send back the positions of the
+  calls that passed the filter. Where processes cannot be forked, this mode
+  falls back to threads.
+
+The pools are kept until close() is called.
+"""
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, \
+    ThreadPoolExecutor
+from typing import Any, Optional, Sequence, Union
+
+from bitmap import CallIndex
+from call import Call
+from customer import Customer
+from filter import Filter
+
+MODES = ('serial', 'thread', 'process')
+
+# The customers and calls a worker process was forked with (see
+# _init_worker), and the filter it last applied along with the number of
+# that application, so that later chunks of the same application reuse it
+_worker_data: Optional[tuple[list[Customer], Sequence[Call]]] = None
+_worker_filter: Optional[tuple[int, Filter]] = None
+
+
+def _init_worker(customers: list[Customer], calls: Sequence[Call]) -> None:
+    """ Remember the customers and calls of the application in a worker
+    process.
+    """
+    global _worker_data
+    _worker_data = (customers, calls)
+
+
+def _filter_chunk(f: Filter, customers: list[Customer], data: Sequence[Call],
+                  filter_string: str, positions: Union[range, list[int]]) \
+        -> tuple[Optional[list[int]], float]:
+    """ Apply <f> to the calls of <data> at <positions>, and return the
+    positions (in <data>) of the calls in the result, in the order of the
+    result, or None if <f> returned its calls unchanged; along with the time
+    taken in seconds.
+    """
+    t1 = time.perf_counter()
+    if isinstance(positions, range):
+        chunk = data[positions.start:positions.stop]
+    else:
+        chunk = [data[position] for position in positions]
+    result = f.apply(customers, chunk, filter_string)
+    if result is chunk:
+        return None, time.perf_counter() - t1
+    where = {}
+    for position, call in zip(positions, chunk):
+        where.setdefault(call, position)
+    return [where[call] for call in result], time.perf_counter() - t1
+
+
+def _filter_worker_chunk(application: int, f: Filter, filter_string: str,
+                         positions: Union[range, list[int]]) \
+        -> tuple[Optional[list[int]], float]:
+    """ Filter the calls at <positions> of the calls the worker process was
+    forked with, as part of the <application>th application of a filter.
+    The filter received with the first chunk of an application is used for
+    all of its chunks, so anything it caches is reused between them.
+    """
+    global _worker_filter
+    if _worker_filter is None or _worker_filter[0] != application:
+        _worker_filter = (application, f)
+    customers, calls = _worker_data
+    return _filter_chunk(_worker_filter[1], customers, calls, filter_string,
+                         positions)
+
+
+class FilterExecutor:
+    """ Applies filters to lists of calls in chunks, with a pluggable way of
+    running the chunks.
+
+    === Public Attributes ===
+    mode:
+         how the chunks are run; one of MODES
+    workers:
+         the number of threads or processes used
+    chunk_size:
+         the number of calls in each chunk, or None to split the calls in
+         <workers> chunks of equal size
+    timings:
+         the time in seconds taken by each chunk of the last application,
+         in chunk order
+
+    === Representation Invariants ===
+    - mode in MODES
+    - workers >= 1
+    - chunk_size is None or chunk_size >= 1
+    """
+    # === Private Attributes ===
+    # _pool:
+    #     the pool of threads or processes running the chunks, or None if
+    #     none was needed yet
+    # _bound:
+    #     if <_pool> is a process pool, the customers and calls its workers
+    #     were forked with, and an index of those calls; otherwise None
+    # _applications:
+    #     the number of applications run by the process pool
+    mode: str
+    workers: int
+    chunk_size: Optional[int]
+    timings: list[float]
+    _pool: Optional[Executor]
+    _bound: Optional[tuple[list[Customer], Sequence[Call], CallIndex]]
+    _applications: int
+
+    def __init__(self, mode: str = 'serial', workers: int = 1,
+                 chunk_size: Optional[int] = None) -> None:
+        """ Create an executor running chunks in <mode> with <workers>
+        threads or processes, splitting the calls in chunks of <chunk_size>.
+        """
+        if mode not in MODES:
+            raise ValueError(f'unknown mode {mode!r}')
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.timings = []
+        self._pool = None
+        self._bound = None
+        self._applications = 0
+
+    def chunks(self, size: int) -> list[tuple[int, int]]:
+        """ Return the (start, stop) boundaries of the chunks for a list of
+        <size> calls, in order.
+        """
+        if self.chunk_size is not None:
+            step = self.chunk_size
+        else:
+            step = max(1, -(-size // self.workers))
+        return [(start, min(start + step, size))
+                for start in range(0, size, step)]
+
+    def apply(self, f: Filter, customers: list[Customer], data: list[Call],
+              filter_string: str) -> list[Call]:
+        """ Return the result of applying <f> with <filter_string> to <data>,
+        computed chunk by chunk: the results of the chunks are concatenated
+        in order, and a call kept by several chunks is only kept the first
+        time. If <f> returns its data unchanged (e.g. for an invalid filter
+        string), <data> itself is returned.
+        """
+        bounds = self.chunks(len(data))
+        base = data
+        positions = range(len(data))
+        if self.mode == 'serial' or len(bounds) <= 1:
+            results = [_filter_chunk(f, customers, data, filter_string,
+                                     positions[start:stop])
+                       for start, stop in bounds]
+        elif self.mode == 'process' and \
+                'fork' in multiprocessing.get_all_start_methods():
+            base, positions = self._bind(customers, data)
+            self._applications += 1
+            futures = [self._pool.submit(_filter_worker_chunk,
+                                         self._applications, f,
+                                         filter_string, positions[start:stop])
+                       for start, stop in bounds]
+            results = [future.result() for future in futures]
+        else:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.workers)
+            futures = [self._pool.submit(_filter_chunk, f, customers, data,
+                                         filter_string, positions[start:stop])
+                       for start, stop in bounds]
+            results = [future.result() for future in futures]
+
+        self.timings = [elapsed for _, elapsed in results]
+        if all(kept is None for kept, _ in results):
+            return data
+        calls = []
+        seen = set()
+        for (start, stop), (kept, _) in zip(bounds, results):
+            for position in (positions[start:stop] if kept is None else kept):
+                call = base[position]
+                if call not in seen:
+                    seen.add(call)
+                    calls.append(call)
+        return calls
+
+    def _bind(self, customers: list[Customer], data: list[Call]) \
+            -> tuple[Sequence[Call], Union[range, list[int]]]:
+        """ Return the calls the process pool was forked with, and the
+        positions of the calls of <data> among them. If there is no process
+        pool yet, or if it was forked for other customers or for calls that
+        do not include all of <data>, a new pool is forked for <customers>
+        and <data>.
+        """
+        if self._bound is not None and self._bound[0] is customers:
+            calls, index = self._bound[1], self._bound[2]
+            if data is calls:
+                return calls, range(len(calls))
+            try:
+                return calls, [index.position(call) for call in data]
+            except KeyError:
+                pass
+        self.close()
+        self._pool = ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context('fork'),
+            initializer=_init_worker, initargs=(customers, data))
+        self._bound = (customers, data, CallIndex(data))
+        return data, range(len(data))
+
+    def close(self) -> None:
+        """ Shut down the threads or processes of this executor, if any. They
+        are started again if needed by a later application.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+        self._pool = None
+        self._bound = None
+
+    def report(self) -> dict[str, Any]:
+        """ Return a summary of the last application: the mode, the number
+        of chunks, and the time taken by each chunk.
+        """
+        return {'mode': self.mode, 'workers': self.workers,
+                'chunks': len(self.timings), 'timings': self.timings[:]}
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'time', 'multiprocessing',
+            'concurrent.futures', 'bitmap', 'call', 'customer', 'filter'
+        ],
+        'disable': ['W0603'],
+        'generated-members': 'pygame.*'
+    })
@@ -13,8 +13,19 @@ Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
 import time
 import datetime
+from typing import Callable, Optional
+from bitmap import CallBitmap, CallIndex, positions_to_mask
 from call import Call
+from callhistory import history_version
+from callstore import RowList
 from customer import Customer
+from spatial import CallGrid, MAP_LOWER_LEFT, MAP_UPPER_RIGHT
+
+try:
+    import numpy
+except ImportError:
+    # numpy is optional: without it, the filters use their pure Python path
+    numpy = None
 
 
 class Filter:
@@ -51,16 +62,120 @@ class Filter:
         """
         raise NotImplementedError
 
+    def apply_bitmap(self, customers: list[Customer],
+                     data: CallBitmap,
+                     filter_string: str) -> CallBitmap:
+        """ Return the bitmap of all calls from the set <data>, which match
+        the filter specified in <filter_string>.
+
+        This is the same as apply(), but for calls given and returned as
+        bitmaps over a CallIndex. Subclasses may override it when they can
+        work on the bitmap directly (see has_bitmap_path).
+        """
+        calls = data.to_list()
+        return _result_bitmap(data, calls,
+                              self.apply(customers, calls, filter_string))
+
+    def has_bitmap_path(self, index: CallIndex) -> bool:
+        """ Return whether apply_bitmap works on bitmaps over <index>
+        directly, rather than by applying this filter to a list of calls.
+        """
+        return False
+
     def __str__(self) -> str:
         """ Return a description of this filter to be displayed in the UI menu
         """
         raise NotImplementedError
 
 
+def _result_bitmap(data: CallBitmap, calls: list[Call],
+                   result: list[Call]) -> CallBitmap:
+    """ Return the bitmap of <result>, the calls kept by a filter applied to
+    <calls>, the list of the calls of <data>. If the filter returned <calls>
+    itself, as for an invalid filter string, <data> is returned unchanged,
+    so that repeated calls stay repeated.
+    """
+    if result is calls:
+        return data
+    return data.index.bitmap(result)
+
+
+def _mask_of(keep: 'numpy.ndarray') -> int:
+    """ Return a bitmap (as an int) where bit i is set if and only if
+    keep[i] is True, for the boolean array <keep>.
+
+    Precondition: numpy is available
+    """
+    return int.from_bytes(numpy.packbits(keep, bitorder='little').tobytes(),
+                          'little')
+
+
+def _select_rows(data: RowList, keep: 'numpy.ndarray') -> RowList:
+    """ Return a new RowList with the calls of <data> at the positions where
+    the boolean array <keep> is True, in the same order. Repeated calls are
+    only kept the first time they appear.
+
+    Precondition: numpy is available and len(keep) == len(data)
+    """
+    selected = numpy.frombuffer(data.indices, dtype=numpy.intc)[keep]
+    # Strictly increasing indices (the usual case) cannot have repeats
+    if len(selected) > 1 and not (numpy.diff(selected) > 0).all():
+        first = numpy.unique(selected, return_index=True)[1]
+        if len(first) < len(selected):
+            selected = selected[numpy.sort(first)]
+    result = RowList(data.store)
+    result.indices.frombytes(selected.astype(numpy.intc).tobytes())
+    return result
+
+
+def _customer_calls(customers: list[Customer], cid: int) \
+        -> Optional[set[Call]]:
+    """ Return the set of all calls made or received by the customer(s) with
+    id <cid> in <customers>, or None if there is no such customer.
+    """
+    calls = None
+    for customer in customers:
+        if customer is not None and customer.get_id() == cid:
+            if calls is None:
+                calls = set()
+            history = customer.get_history()
+            calls.update(history[0])
+            calls.update(history[1])
+    return calls
+
+
+def customer_call_index(customers: list[Customer]) -> dict[int, set[Call]]:
+    """ Return a dictionary mapping the id of each of the <customers> to the
+    set of all calls made or received by that customer.
+    It can be given to a CustomerFilter, so that repeated applications of the
+    filter do not have to gather the calls again.
+    """
+    index = {}
+    for customer in customers:
+        history = customer.get_history()
+        calls = index.setdefault(customer.get_id(), set())
+        calls.update(history[0])
+        calls.update(history[1])
+    return index
+
+
 class ResetFilter(Filter):
     """
     A class for resetting all previously applied filters, if any.
     """
+    # === Private Attributes ===
+    # _cache:
+    #     the last result computed by this filter, along with the customers
+    #     it was computed from (a copy of the list) and the history_version()
+    #     at the time; or None if there is none yet.
+    _cache: Optional[tuple[tuple[Customer, ...], int, list[Call]]]
+
+    def __init__(self) -> None:
+        """ Create a new ResetFilter, with nothing cached yet.
+        """
+        super().__init__()
+        self._cache = None
+
     def apply(self, customers: list[Customer],
               data: list[Call],
               filter_string: str) \
@@ -70,16 +185,44 @@ class ResetFilter(Filter):
         The <data> and <filter_string> arguments for this type of filter are
         ignored.
 
+        The list is only built again if a call history changed since this
+        filter last built it, or if <customers> does not hold the same
+        customers. Otherwise, the same list is returned again, so it must not
+        be mutated.
+
         Precondition:
         - <customers> contains the list of all customers from the input dataset
         """
+        cache = self._cache
+        if cache is not None and cache[1] == history_version() \
+                and len(cache[0]) == len(customers) \
+                and all(a is b for a, b in zip(cache[0], customers)):
+            return cache[2]
+
         filtered_calls = []
         for c in customers:
             customer_history = c.get_history()
             # only take outgoing calls, we don't want to include calls twice
             filtered_calls.extend(customer_history[0])
+        self._cache = (tuple(customers), history_version(), filtered_calls)
         return filtered_calls
 
+    def apply_bitmap(self, customers: list[Customer],
+                     data: CallBitmap,
+                     filter_string: str) -> CallBitmap:
+        """ Return the bitmap of all the calls of the index of <data>.
+        The calls of <data> and the <filter_string> are ignored.
+
+        Precondition:
+        - the index of <data> holds all the outgoing calls of <customers>
+        """
+        return data.index.full()
+
+    def has_bitmap_path(self, index: CallIndex) -> bool:
+        """ Return True: resetting never needs the list of calls.
+        """
+        return True
+
     def __str__(self) -> str:
         """ Return a description of this filter to be displayed in the UI menu
         """
@@ -90,6 +233,46 @@ class CustomerFilter(Filter):
     """
     A class for selecting only the calls from a given customer.
     """
+    # === Private Attributes ===
+    # _call_index:
+    #     an optional prebuilt index from each customer id to the set of all
+    #     calls made or received by that customer, as returned by
+    #     customer_call_index(). If None, the calls are gathered from the
+    #     customers.
+    # _gathered:
+    #     the calls last gathered from the customers, along with the list of
+    #     customers, the customer id and the history_version() they were
+    #     gathered for; or None. They are reused by later applications for
+    #     the same customer, e.g. on the other chunks of the same data.
+    # _bitmaps:
+    #     the bitmap of the calls of each customer id asked for so far, over
+    #     the index, for the list of customers and the history_version() they
+    #     were computed for; or None
+    _call_index: Optional[dict[int, set[Call]]]
+    _gathered: Optional[tuple[list[Customer], int, int, Optional[set[Call]]]]
+    _bitmaps: Optional[tuple[CallIndex, list[Customer], int,
+                             dict[int, Optional[int]]]]
+
+    def __init__(self,
+                 call_index: Optional[dict[int, set[Call]]] = None) -> None:
+        """ Create a new CustomerFilter, using <call_index> to look up the
+        calls of a customer if it is given.
+        """
+        super().__init__()
+        self._call_index = call_index
+        self._gathered = None
+        self._bitmaps = None
+
+    def __getstate__(self) -> dict:
+        """ Return the state of this filter to pickle, e.g. to send it to a
+        worker process, without the gathered calls: the receiver gathers
+        them again from its own customers.
+        """
+        state = self.__dict__.copy()
+        state['_gathered'] = None
+        state['_bitmaps'] = None
+        return state
+
     def apply(self, customers: list[Customer],
               data: list[Call],
               filter_string: str) \
@@ -109,29 +292,76 @@ class CustomerFilter(Filter):
         """
         if len(filter_string) != 4 or not filter_string.isdigit():
             return data
-        cid = int(filter_string)
-        cust = []
-        for customer in customers:
-            if customer is None:
-                continue
-            if cid == customer.get_id():
-                if customer not in cust:
-                    cust.append(customer)
-        if len(cust) == 0:
+        customer_calls = self._calls_of(customers, int(filter_string))
+        if customer_calls is None:
             return data
 
+        # Membership checks are done against sets, and the calls are kept
+        # in the order they were given in <data>
         unique_call = []
-        for customer in cust:
-            history_calls = customer.get_history()
-            for call_made in history_calls[0]:
-                if call_made in data and call_made not in unique_call:
-                    unique_call.append(call_made)
-            for call_recive in history_calls[1]:
-                if call_recive in data and call_recive not in unique_call:
-                    unique_call.append(call_recive)
-
+        seen = set()
+        for call in data:
+            if call in customer_calls and call not in seen:
+                seen.add(call)
+                unique_call.append(call)
         return unique_call
 
+    def apply_bitmap(self, customers: list[Customer],
+                     data: CallBitmap,
+                     filter_string: str) -> CallBitmap:
+        """ Return the bitmap of all unique calls from <data> made or
+        received by the customer with the id specified in <filter_string>,
+        as apply() does, by intersecting <data> with the bitmap of the calls
+        of that customer.
+        """
+        if len(filter_string) != 4 or not filter_string.isdigit():
+            return data
+        index = data.index
+        bitmaps = self._bitmaps
+        if bitmaps is None or bitmaps[0] is not index \
+                or bitmaps[1] is not customers \
+                or bitmaps[2] != history_version():
+            bitmaps = (index, customers, history_version(), {})
+            self._bitmaps = bitmaps
+        cid = int(filter_string)
+        if cid not in bitmaps[3]:
+            customer_calls = self._calls_of(customers, cid)
+            bitmaps[3][cid] = None if customer_calls is None \
+                else index.bitmap_within(customer_calls).bits
+        if bitmaps[3][cid] is None:
+            return data
+        return CallBitmap(index,
+                          data.bits & bitmaps[3][cid] & index.unique().bits)
+
+    def has_bitmap_path(self, index: CallIndex) -> bool:
+        """ Return True: the calls of a customer are kept as a bitmap.
+        """
+        return True
+
+    def _calls_of(self, customers: list[Customer], cid: int) \
+            -> Optional[set[Call]]:
+        """ Return the set of all calls made or received by the customer(s)
+        with id <cid>, from the call index if there is one, or None if there
+        is no such customer.
+        """
+        if self._call_index is not None:
+            return self._call_index.get(cid)
+        return self._customer_calls(customers, cid)
+
+    def _customer_calls(self, customers: list[Customer], cid: int) \
+            -> Optional[set[Call]]:
+        """ Return the set of all calls made or received by the customer(s)
+        with id <cid> in <customers>, or None if there is no such customer.
+        The calls gathered last are reused if they are still up to date.
+        """
+        gathered = self._gathered
+        if gathered is None or gathered[0] is not customers \
+                or gathered[1] != cid or gathered[2] != history_version():
+            gathered = (customers, cid, history_version(),
+                        _customer_calls(customers, cid))
+            self._gathered = gathered
+        return gathered[3]
+
     def __str__(self) -> str:
         """ Return a description of this filter to be displayed in the UI menu
         """
@@ -161,9 +391,80 @@ class DurationFilter(Filter):
 
         Do not mutate any of the function arguments!
         """
+        parsed = self._parse(filter_string)
+        if parsed is None:
+            return data
+        filter_key, target_time = parsed
+        if numpy is not None and isinstance(data, RowList) and len(data) > 0:
+            # Vectorized path over the duration column of the call store
+            durations = numpy.frombuffer(data.store.durations,
+                                         dtype=numpy.intc)[
+                numpy.frombuffer(data.indices, dtype=numpy.intc)]
+            if filter_key == "L":
+                return _select_rows(data, durations < target_time)
+            return _select_rows(data, durations > target_time)
+
+        unique_call = []
+        seen = set()
+        for call in data:
+            if filter_key == "L":
+                keep = call.duration < target_time
+            else:
+                keep = call.duration > target_time
+            if keep and call not in seen:
+                seen.add(call)
+                unique_call.append(call)
+        return unique_call
+
+    def apply_bitmap(self, customers: list[Customer],
+                     data: CallBitmap,
+                     filter_string: str) -> CallBitmap:
+        """ Return the bitmap of all unique calls from <data> with a duration
+        of under or over the time indicated in the <filter_string>, as
+        apply() does, by comparing the whole duration column of the index at
+        once.
+        """
+        parsed = self._parse(filter_string)
+        if parsed is None:
+            return data
+        filter_key, target_time = parsed
+        index = data.index
+        if numpy is not None:
+            calls = index.calls
+            if isinstance(calls, RowList):
+                durations = numpy.frombuffer(calls.store.durations,
+                                             dtype=numpy.intc)[
+                    numpy.frombuffer(calls.indices, dtype=numpy.intc)]
+            else:
+                durations = numpy.array(index.column('duration'),
+                                        dtype=numpy.int64)
+            if filter_key == "L":
+                mask = _mask_of(durations < target_time)
+            else:
+                mask = _mask_of(durations > target_time)
+        else:
+            durations = index.column('duration')
+            if filter_key == "L":
+                positions = (i for i, d in enumerate(durations)
+                             if d < target_time)
+            else:
+                positions = (i for i, d in enumerate(durations)
+                             if d > target_time)
+            mask = positions_to_mask(positions, len(index))
+        return CallBitmap(index, data.bits & mask & index.unique().bits)
+
+    def has_bitmap_path(self, index: CallIndex) -> bool:
+        """ Return True: the durations are compared column-wise.
+        """
+        return True
+
+    def _parse(self, filter_string: str) -> Optional[tuple[str, int]]:
+        """ Return the filter key ("L" or "G") and the target time of the
+        <filter_string>, or None if it is invalid.
+        """
         if len(filter_string) != 4 or \
                 (filter_string[0] != "L" and filter_string[0] != "G"):
-            return data
+            return None
         target_time = filter_string[1:]
         counter = 0
         for d in target_time:
@@ -173,19 +474,9 @@ class DurationFilter(Filter):
         if counter == len(target_time):
             counter -= 1
         target_time = target_time[counter:]
-        filter_key = filter_string[0]
         if not target_time.isdigit():
-            return data
-        target_time = int(target_time)
-        unique_call = []
-        for call in data:
-            if filter_key == "L" and call.duration < target_time:
-                if call not in unique_call:
-                    unique_call.append(call)
-            elif filter_key == "G" and call.duration > target_time:
-                if call not in unique_call:
-                    unique_call.append(call)
-        return unique_call
+            return None
+        return filter_string[0], int(target_time)
 
     def __str__(self) -> str:
         """ Return a description of this filter to be displayed in the UI menu
@@ -198,6 +489,25 @@ class LocationFilter(Filter):
     """
     A class for selecting only the calls that took place within a specific area
     """
+    # === Private Attributes ===
+    # _grid:
+    #     an optional spatial index over the endpoints of the calls, used to
+    #     only look at the calls near the search rectangle. If None, every
+    #     call of the data is checked.
+    # _grid_calls:
+    #     the set of the calls indexed by <_grid>, built the first time the
+    #     filter is applied to other calls than those of the grid, or None
+    _grid: Optional[CallGrid]
+    _grid_calls: Optional[set[Call]]
+
+    def __init__(self, grid: Optional[CallGrid] = None) -> None:
+        """ Create a new LocationFilter, using the spatial index <grid> if it
+        is given.
+        """
+        super().__init__()
+        self._grid = grid
+        self._grid_calls = None
+
     def apply(self, customers: list[Customer],
               data: list[Call],
               filter_string: str) \
@@ -224,9 +534,55 @@ class LocationFilter(Filter):
 
         Do not mutate any of the function arguments!
         """
+        bounds = self._parse_bounds(filter_string)
+        if bounds is None:
+            return data
+        low_bound, up_bound = bounds
+
+        if self._grid is not None:
+            return self._apply_grid(data, low_bound, up_bound)
+
+        unique_call = []
+        seen = set()
+        for call in data:
+            if self._call_within(call, low_bound, up_bound):
+                if call not in seen:
+                    seen.add(call)
+                    unique_call.append(call)
+        return unique_call
+
+    def apply_bitmap(self, customers: list[Customer],
+                     data: CallBitmap,
+                     filter_string: str) -> CallBitmap:
+        """ Return the bitmap of all unique calls from <data>, which took
+        place within a location specified by the <filter_string>, as apply()
+        does. If the spatial index is over the calls of the index of <data>,
+        its matches are turned into a bitmap directly.
+        """
+        if not self.has_bitmap_path(data.index):
+            return super().apply_bitmap(customers, data, filter_string)
+        bounds = self._parse_bounds(filter_string)
+        if bounds is None:
+            return data
+        index = data.index
+        mask = positions_to_mask(self._grid.query(bounds[0], bounds[1]),
+                                 len(index))
+        return CallBitmap(index, data.bits & mask & index.unique().bits)
+
+    def has_bitmap_path(self, index: CallIndex) -> bool:
+        """ Return whether the spatial index of this filter is over the
+        calls of <index>, so that it can work on bitmaps over <index>.
+        """
+        return self._grid is not None and self._grid.calls is index.calls
+
+    def _parse_bounds(self, filter_string: str) \
+            -> Optional[tuple[tuple[float, float], tuple[float, float]]]:
+        """ Return the lower left and upper right corners of the rectangle
+        in <filter_string>, or None if it is invalid.
+        """
         separater = filter_string.split(",")
         if len(separater) != 4:
-            return data
+            return None
         low_bound = (separater[0].strip(), separater[1].strip())
         up_bound = (separater[2].strip(), separater[3].strip())
 
@@ -234,21 +590,53 @@ class LocationFilter(Filter):
             low_bound = (float(low_bound[0]), float(low_bound[1]))
             up_bound = (float(up_bound[0]), float(up_bound[1]))
         except ValueError:
-            return data
+            return None
         except TypeError:
-            return data
+            return None
 
         if not self._is_valid(low_bound, up_bound):
-            return data
-
+            return None
+        return low_bound, up_bound
+
+    def _call_within(self, call: Call,
+                     low_bound: tuple[float, float],
+                     up_bound: tuple[float, float]) -> bool:
+        """ Return whether the source or destination of <call> is within
+        <low_bound> and <up_bound>.
+        """
+        src_cor = (call.src_loc[0], call.src_loc[1])
+        dst_cor = (call.dst_loc[0], call.dst_loc[1])
+        return self._bound_checker_helper(low_bound, up_bound, src_cor) or \
+            self._bound_checker_helper(low_bound, up_bound, dst_cor)
+
+    def _apply_grid(self, data: list[Call],
+                    low_bound: tuple[float, float],
+                    up_bound: tuple[float, float]) -> list[Call]:
+        """ Return the unique calls from <data> with an endpoint within
+        <low_bound> and <up_bound>, in order, using the spatial index. Calls
+        of <data> that are not in the index are checked one by one.
+        """
+        positions = self._grid.query(low_bound, up_bound)
         unique_call = []
-        for call in data:
-            src_cor = (call.src_loc[0], call.src_loc[1])
-            dst_cor = (call.dst_loc[0], call.dst_loc[1])
-            if self._bound_checker_helper(low_bound, up_bound, src_cor) or \
-                    self._bound_checker_helper(low_bound, up_bound, dst_cor):
+        seen = set()
+        if self._grid.calls is data:
+            # The grid indexes <data> itself, so only the matches are visited
+            for position in positions:
+                call = data[position]
+                if call not in seen:
+                    seen.add(call)
+                    unique_call.append(call)
+            return unique_call
 
-                if call not in unique_call:
+        matches = {self._grid.calls[position] for position in positions}
+        if self._grid_calls is None:
+            self._grid_calls = set(self._grid.calls)
+        for call in data:
+            if call in matches or (
+                    call not in self._grid_calls
+                    and self._call_within(call, low_bound, up_bound)):
+                if call not in seen:
+                    seen.add(call)
                     unique_call.append(call)
         return unique_call
 
@@ -274,8 +662,8 @@ class LocationFilter(Filter):
         up_long, up_lat = up_bound[0], up_bound[1]
         if low_long > up_long or low_lat > up_lat:
             return False
-        low_map = (-79.697878, 43.576959)
-        up_map = (-79.196382, 43.799568)
+        low_map = MAP_LOWER_LEFT
+        up_map = MAP_UPPER_RIGHT
         check_long = self._map_bound_checker_helper(low_map[0],
                                                     up_map[0],
                                                     low_long,
@@ -294,11 +682,156 @@ class LocationFilter(Filter):
                "upperLong, upperLat\" (e.g., -79.6, 43.6, -79.3, 43.7)"
 
 
+# Order in which the pipeline runs the stages of each type of filter. Filters
+# that are cheap to evaluate and usually very selective come first, so later
+# stages see fewer calls. Any other filter type runs last.
+_STAGE_RANK = {CustomerFilter: 0, DurationFilter: 1, LocationFilter: 2}
+
+
+def _stage_kind(f: Filter) -> tuple[int, type]:
+    """ Return the rank of the pipeline stage for <f>, and the type of filter
+    identifying that stage. Subclasses of a ranked filter share its stage.
+    """
+    for kind, rank in _STAGE_RANK.items():
+        if isinstance(f, kind):
+            return rank, kind
+    return len(_STAGE_RANK), type(f)
+
+
+class FilterPipeline:
+    """ A chain of filters applied to all the calls of the dataset, with one
+    stage for each filter applied since the last reset.
+
+    The result of each stage is cached as a CallBitmap over <index>. When a
+    stage is added, only that stage and the ones after it are computed.
+
+    Stages run in a fixed order (see _STAGE_RANK), regardless of the order in
+    which they were set; stages of the same type of filter run in the order
+    they were set. Since every filter keeps the calls in the order they were
+    given, the result does not depend on the order of the stages. It is the
+    same as applying the filters of the stages one after the other to all
+    the calls, including for calls repeated in <index>: a stage with an
+    invalid filter string keeps the repeats, and any other stage keeps each
+    call once.
+
+    === Public Attributes ===
+    customers:
+         all customers from the input dataset
+    index:
+         all calls the pipeline filters, in output order
+    run_filter:
+         a function applying a filter to a list of calls as Filter.apply
+         does (e.g. FilterExecutor.apply), used to run the stages whose
+         filter has no bitmap path; or None to call Filter.apply_bitmap
+    """
+    # === Private Attributes ===
+    # _stages:
+    #     the filter and filter string of each stage, in the order they run
+    # _results:
+    #     the cached result of the first len(_results) stages
+    customers: list[Customer]
+    index: CallIndex
+    run_filter: Optional[Callable[[Filter, list[Customer], list[Call], str],
+                                  list[Call]]]
+    _stages: list[tuple[Filter, str]]
+    _results: list[CallBitmap]
+
+    def __init__(self, customers: list[Customer],
+                 calls: Optional[list[Call]] = None,
+                 run_filter: Optional[Callable[[Filter, list[Customer],
+                                                list[Call], str],
+                                               list[Call]]] = None) -> None:
+        """ Create a pipeline with no stages over <calls>, or over all the
+        outgoing calls of the <customers> (as ResetFilter returns them) if
+        <calls> is None, running the stages with <run_filter> if given.
+        """
+        self.customers = customers
+        if calls is None:
+            calls = ResetFilter().apply(customers, [], "")
+        self.index = CallIndex(calls)
+        self.run_filter = run_filter
+        self._stages = []
+        self._results = []
+
+    def get_stages(self) -> list[tuple[Filter, str]]:
+        """ Return the filter and filter string of each stage, in the order
+        they run.
+        """
+        return self._stages[:]
+
+    def set_stage(self, f: Filter, filter_string: str) -> list[Call]:
+        """ Add a stage applying <f> with <filter_string>, and return the new
+        result of the pipeline.
+        As when the filters are applied one after the other, the new stage
+        only keeps calls that pass the stages already set, including those of
+        the same type of filter (e.g. "L300" then "G060" keeps the calls
+        lasting between 60 and 300 seconds), and a stage with an invalid
+        filter string leaves the result unchanged. A stage that is already set, with the
+        same type of filter and filter string, is not added again.
+        A ResetFilter removes all the stages instead.
+        """
+        if isinstance(f, ResetFilter):
+            return self.reset()
+        rank, kind = _stage_kind(f)
+        i = 0
+        while i < len(self._stages) and \
+                _stage_kind(self._stages[i][0])[0] <= rank:
+            if _stage_kind(self._stages[i][0])[1] is kind and \
+                    self._stages[i][1] == filter_string:
+                return self.result()
+            i += 1
+        self._stages.insert(i, (f, filter_string))
+        del self._results[i:]
+        return self.result()
+
+    def reset(self) -> list[Call]:
+        """ Remove all the stages and return all the calls.
+        """
+        self._stages = []
+        self._results = []
+        return self.index.calls
+
+    def result_bitmap(self) -> CallBitmap:
+        """ Return the set of calls that pass every stage, running only the
+        stages whose result is not cached.
+        """
+        while len(self._results) < len(self._stages):
+            f, filter_string = self._stages[len(self._results)]
+            if self._results:
+                data = self._results[-1]
+            else:
+                data = self.index.full()
+            self._results.append(self._run_stage(f, data, filter_string))
+        if not self._results:
+            return self.index.full()
+        return self._results[-1]
+
+    def _run_stage(self, f: Filter, data: CallBitmap,
+                   filter_string: str) -> CallBitmap:
+        """ Return the calls of <data> that pass the stage applying <f> with
+        <filter_string>.
+        """
+        if self.run_filter is None or f.has_bitmap_path(data.index):
+            return f.apply_bitmap(self.customers, data, filter_string)
+        calls = data.to_list()
+        return _result_bitmap(data, calls, self.run_filter(
+            f, self.customers, calls, filter_string))
+
+    def result(self) -> list[Call]:
+        """ Return the calls that pass every stage, in order, running only
+        the stages whose result is not cached.
+        """
+        if not self._stages:
+            return self.index.calls
+        return self.result_bitmap().to_list()
+
+
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing', 'time', 'datetime', 'call', 'customer'
+            'python_ta', 'typing', 'time', 'datetime', 'call', 'customer',
+            'callstore', 'numpy', 'spatial', 'bitmap', 'callhistory'
         ],
         'max-nested-blocks': 4,
         'allowed-io': ['apply', '__str__'],
@@ -0,0 +1,336 @@
+"""
+CSC148, Winter 2024
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the BillLedger class, a column-based storage for the
+monthly bills of many phone lines, and the LedgerBill and LedgerBills classes,
+which present the bills in a BillLedger with the same interface as Bill
+objects and the <bills> dictionary of a PhoneLine.
+
+A BillLedger keeps each attribute of all of its bills in a parallel array, so
+a bill costs a few dozen bytes instead of a full Bill object, and the totals
+of the bills of many customers can be computed at once.
+"""
+from array import array
+from collections.abc import Iterator, Mapping, Sequence
+from typing import Union
+
+from bill import Bill
+
+try:
+    import numpy
+except ImportError:  # numpy is optional; totals are then summed one by one
+    numpy = None
+
+# Contract types a bill can have; a bill stores the index of its type
+BILL_TYPES = ('', 'MTM', 'TERM', 'PREPAID')
+_TYPE_CODES = {bill_type: code for code, bill_type in enumerate(BILL_TYPES)}
+
+# Flags of the float_fields column, set for a bill whose fixed costs or
+# minute rate were set to a float rather than an int
+_FIXED_FLOAT = 1
+_RATE_FLOAT = 2
+
+
+class BillLedger:
+    """ A column-based store of bills. Each bill is identified by its row, in
+    the order the bills were added.
+
+    === Public Attributes ===
+    billed_min:
+         number of billable minutes of each bill
+    free_min:
+         number of non-billable minutes of each bill
+    fixed_cost:
+         fixed costs of each bill
+    min_rate:
+         cost for one minute of calling of each bill
+    types:
+         index in BILL_TYPES of the contract type of each bill
+    float_fields:
+         for each bill, whether its fixed costs and its minute rate were set
+         to a float (see _FIXED_FLOAT and _RATE_FLOAT) rather than an int, so
+         that they are read back with the same type as from a Bill
+
+    === Representation Invariants ===
+    - all the arrays have the same length, which is the number of bills
+    """
+    billed_min: array
+    free_min: array
+    fixed_cost: array
+    min_rate: array
+    types: array
+    float_fields: array
+
+    def __init__(self) -> None:
+        """ Create an empty BillLedger.
+        """
+        self.billed_min = array('q')
+        self.free_min = array('q')
+        self.fixed_cost = array('d')
+        self.min_rate = array('d')
+        self.types = array('b')
+        self.float_fields = array('b')
+
+    def __len__(self) -> int:
+        """ Return the number of bills in this ledger.
+        """
+        return len(self.types)
+
+    def add(self) -> int:
+        """ Add a new, empty bill to this ledger and return its row.
+        """
+        self.billed_min.append(0)
+        self.free_min.append(0)
+        self.fixed_cost.append(0)
+        self.min_rate.append(0)
+        self.types.append(0)
+        self.float_fields.append(0)
+        return len(self.types) - 1
+
+    def get_fixed(self, row: int) -> Union[float, int]:
+        """ Return the fixed costs of the bill at <row>, with the type they
+        were set with.
+        """
+        if self.float_fields[row] & _FIXED_FLOAT:
+            return self.fixed_cost[row]
+        return int(self.fixed_cost[row])
+
+    def set_fixed(self, row: int, value: Union[float, int]) -> None:
+        """ Set the fixed costs of the bill at <row> to <value>.
+        """
+        self.fixed_cost[row] = value
+        self._set_float(row, _FIXED_FLOAT, isinstance(value, float))
+
+    def get_rate(self, row: int) -> Union[float, int]:
+        """ Return the minute rate of the bill at <row>, with the type it was
+        set with.
+        """
+        if self.float_fields[row] & _RATE_FLOAT:
+            return self.min_rate[row]
+        return int(self.min_rate[row])
+
+    def set_rate(self, row: int, value: Union[float, int]) -> None:
+        """ Set the minute rate of the bill at <row> to <value>.
+        """
+        self.min_rate[row] = value
+        self._set_float(row, _RATE_FLOAT, isinstance(value, float))
+
+    def _set_float(self, row: int, flag: int, is_float: bool) -> None:
+        """ Set or clear the <flag> of the bill at <row> in float_fields.
+        """
+        if is_float:
+            self.float_fields[row] |= flag
+        else:
+            self.float_fields[row] &= ~flag
+
+    def cost(self, row: int) -> Union[float, int]:
+        """ Return the amount of the bill at <row>, computed as Bill.get_cost
+        does.
+        """
+        return self.get_rate(row) * self.billed_min[row] + self.get_fixed(row)
+
+    def totals(self, groups: Sequence[Sequence[int]]) \
+            -> list[Union[float, int]]:
+        """ Return the sum of the amounts of the bills at each sequence of
+        rows in <groups>, added in order from 0 as Customer.generate_bill
+        adds the totals of its line bills. The sums are the same as that
+        method's, down to their type.
+
+        The amounts of all the bills are computed at once, then added one
+        position of the groups at a time, so the work done in Python does
+        not grow with the number of groups.
+        """
+        if numpy is None:
+            return [self._total(rows) for rows in groups]
+        lengths = numpy.fromiter((len(rows) for rows in groups),
+                                 dtype=numpy.intp, count=len(groups))
+        starts = numpy.zeros(len(groups), dtype=numpy.intp)
+        numpy.cumsum(lengths[:-1], out=starts[1:])
+        index = numpy.fromiter((row for rows in groups for row in rows),
+                               dtype=numpy.intp, count=int(lengths.sum()))
+        costs = numpy.frombuffer(self.min_rate, dtype=numpy.float64)[index] \
+            * numpy.frombuffer(self.billed_min, dtype=numpy.int64)[index] \
+            + numpy.frombuffer(self.fixed_cost, dtype=numpy.float64)[index]
+        floats = numpy.frombuffer(self.float_fields, dtype=numpy.int8)[index]
+        sums = numpy.zeros(len(groups))
+        has_float = numpy.zeros(len(groups), dtype=bool)
+        for position in range(int(lengths.max(initial=0))):
+            have = numpy.flatnonzero(lengths > position)
+            sums[have] += costs[starts[have] + position]
+            has_float[have] |= floats[starts[have] + position] != 0
+        totals = sums.tolist()
+        # A sum is an int when every amount in it is, like 0 for no bills
+        for i in numpy.flatnonzero(~has_float).tolist():
+            totals[i] = self._total(groups[i])
+        return totals
+
+    def _total(self, rows: Sequence[int]) -> Union[float, int]:
+        """ Return the sum of the amounts of the bills at <rows>, added in
+        order from 0.
+        """
+        total = 0
+        for row in rows:
+            total += self.cost(row)
+        return total
+
+    def summary(self, row: int) -> dict[str, Union[float, int]]:
+        """ Return the summary of the bill at <row>, as Bill.get_summary
+        does.
+        """
+        return {'type': BILL_TYPES[self.types[row]],
+                'fixed': self.get_fixed(row),
+                'free_mins': self.free_min[row],
+                'billed_mins': self.billed_min[row],
+                'min_rate': self.get_rate(row),
+                'total': self.cost(row)}
+
+
+class LedgerBill(Bill):
+    """ A lightweight view of one bill in a BillLedger. It offers the same
+    attributes and methods as a Bill, read from and written to the ledger.
+
+    === Public Attributes ===
+    ledger:
+         the BillLedger holding this bill
+    row:
+         the row of this bill in <ledger>
+    """
+    __slots__ = ('ledger', 'row')
+    ledger: BillLedger
+    row: int
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, ledger: BillLedger, row: int) -> None:
+        """ Create a view of the bill at <row> in <ledger>.
+        """
+        self.ledger = ledger
+        self.row = row
+
+    @property
+    def billed_min(self) -> int:
+        """ The number of billable minutes of this bill. """
+        return self.ledger.billed_min[self.row]
+
+    @billed_min.setter
+    def billed_min(self, value: int) -> None:
+        self.ledger.billed_min[self.row] = value
+
+    @property
+    def free_min(self) -> int:
+        """ The number of non-billable minutes of this bill. """
+        return self.ledger.free_min[self.row]
+
+    @free_min.setter
+    def free_min(self, value: int) -> None:
+        self.ledger.free_min[self.row] = value
+
+    @property
+    def fixed_cost(self) -> float:
+        """ The fixed costs of this bill. """
+        return self.ledger.get_fixed(self.row)
+
+    @fixed_cost.setter
+    def fixed_cost(self, value: float) -> None:
+        self.ledger.set_fixed(self.row, value)
+
+    @property
+    def min_rate(self) -> float:
+        """ The cost for one minute of calling of this bill. """
+        return self.ledger.get_rate(self.row)
+
+    @min_rate.setter
+    def min_rate(self, value: float) -> None:
+        self.ledger.set_rate(self.row, value)
+
+    @property
+    def type(self) -> str:
+        """ The contract type of this bill. """
+        return BILL_TYPES[self.ledger.types[self.row]]
+
+    @type.setter
+    def type(self, value: str) -> None:
+        self.ledger.types[self.row] = _TYPE_CODES[value]
+
+    def get_cost(self) -> float:
+        """ Return bill amount, considering the rates for billable calls for
+        this Bill's contract type.
+        """
+        return self.ledger.cost(self.row)
+
+    def get_summary(self) -> dict[str, Union[float, int]]:
+        """ Return a bill summary as a dictionary containing the bill details.
+        """
+        return self.ledger.summary(self.row)
+
+
+class LedgerBills(Mapping):
+    """ The monthly bills of one phone line, stored in a BillLedger. It can be
+    used like the <bills> dictionary of a PhoneLine: each key is a
+    (month, year) tuple, and the corresponding value is a LedgerBill, created
+    on access.
+
+    === Public Attributes ===
+    ledger:
+         the BillLedger holding the bills
+    rows:
+         maps each (month, year) tuple to the row of its bill in <ledger>
+    """
+    ledger: BillLedger
+    rows: dict[tuple[int, int], int]
+
+    def __init__(self, ledger: BillLedger) -> None:
+        """ Create an empty set of bills stored in <ledger>.
+        """
+        self.ledger = ledger
+        self.rows = {}
+
+    def add(self, key: tuple[int, int]) -> LedgerBill:
+        """ Add a new, empty bill for the (month, year) <key>, and return it.
+
+        Precondition: there is no bill for <key> yet.
+        """
+        self.rows[key] = self.ledger.add()
+        return LedgerBill(self.ledger, self.rows[key])
+
+    def __getitem__(self, key: tuple[int, int]) -> LedgerBill:
+        """ Return the bill for the (month, year) <key>.
+        """
+        return LedgerBill(self.ledger, self.rows[key])
+
+    def __contains__(self, key: object) -> bool:
+        """ Return whether there is a bill for the (month, year) <key>.
+        """
+        return key in self.rows
+
+    def __len__(self) -> int:
+        """ Return the number of bills.
+        """
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        """ Yield the (month, year) of each bill, in the order they were added.
+        """
+        return iter(self.rows)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'array', 'collections.abc', 'bill', 'numpy'
+        ],
+        'disable': ['R0902'],
+        'generated-members': 'pygame.*'
+    })
@@ -11,11 +11,13 @@ any changes, are expressly prohibited.
 All of the files in this directory and all subdirectories are:
 Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
+from collections.abc import Sequence
 from typing import Optional, Union
 from call import Call
 from callhistory import CallHistory
 from bill import Bill
 from contract import Contract
+from ledger import BillLedger, LedgerBills
 
 
 class PhoneLine:
@@ -29,7 +31,9 @@ class PhoneLine:
     bills:
          dictionary containing all the bills for this phoneline
          each key is a (month, year) tuple and the corresponding value is
-         the Bill object for that month+year date.
+         the Bill object for that month+year date. If the line was created
+         with a BillLedger, this is a LedgerBills mapping instead, and the
+         bills are LedgerBill views of the ledger.
     callhistory:
          call history for this phone line, represented as a CallHistory object
 
@@ -39,16 +43,18 @@ class PhoneLine:
     """
     number: str
     contract: Contract
-    bills: dict[tuple[int, int], Bill]
+    bills: Union[dict[tuple[int, int], Bill], LedgerBills]
     callhistory: CallHistory
 
-    def __init__(self, number: str, contract: Contract) -> None:
-        """ Create a new PhoneLine with <number> and <contract>.
+    def __init__(self, number: str, contract: Contract,
+                 ledger: Optional[BillLedger] = None) -> None:
+        """ Create a new PhoneLine with <number> and <contract>. If <ledger>
+        is given, the bills of this line are stored in it.
         """
         self.number = number
         self.contract = contract
         self.callhistory = CallHistory()
-        self.bills = {}
+        self.bills = {} if ledger is None else LedgerBills(ledger)
 
     def new_month(self, month: int, year: int) -> None:
         """ Advance to a new month (specified by <month> and <year>) in the
@@ -57,8 +63,12 @@ class PhoneLine:
         create a new bill.
         """
         if (month, year) not in self.bills:
-            self.bills[(month, year)] = Bill()
-            self.contract.new_month(month, year, self.bills[(month, year)])
+            if isinstance(self.bills, LedgerBills):
+                bill = self.bills.add((month, year))
+            else:
+                bill = Bill()
+                self.bills[(month, year)] = bill
+            self.contract.new_month(month, year, bill)
 
     def make_call(self, call: Call) -> None:
         """ Add the <call> to this phone line's callhistory, and bill it
@@ -66,13 +76,32 @@ class PhoneLine:
         If there is no bill for the current monthly billing cycle, then a new
         month must be <started> by advancing to the right month from <call>.
         """
+        self.record_call(call)
+        self.contract.bill_call(call)
+
+    def record_call(self, call: Call) -> None:
+        """ Add the <call> to this phone line's callhistory, advancing to the
+        month of <call> if needed, as make_call does, but without billing it.
+
+        Precondition:
+        - bill_calls is called with the duration of <call> before this line
+        is advanced to another month.
+        """
         # Add to callhistory
         self.callhistory.register_outgoing_call(call)
         # According the bill
         bill_data = call.get_bill_date()
         self.new_month(bill_data[0], bill_data[1])
 
-        self.contract.bill_call(call)
+    def bill_calls(self, durations: Sequence[int]) -> None:
+        """ Bill the calls recorded with record_call that lasted <durations>
+        seconds, in the order they were made, as make_call would have billed
+        them one by one.
+
+        Precondition:
+        - all of the calls were made in the current month of this line.
+        """
+        self.contract.bill_calls(durations)
 
     def receive_call(self, call: Call) -> None:
         """ Add the <call> to this phone line's callhistory.
@@ -152,8 +181,8 @@ if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing',
-            'call', 'callhistory', 'bill', 'contract'
+            'python_ta', 'typing', 'collections.abc',
+            'call', 'callhistory', 'bill', 'contract', 'ledger'
         ],
         'generated-members': 'pygame.*'
     })
@@ -0,0 +1,96 @@
+"""
+CSC148, Winter 2024
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the NumberRegistry class, which interns phone numbers: it
+keeps a single string object for each distinct phone number, and gives each
+number a dense integer id.
+
+Every call and phone line using a registered number then shares the same
+string, instead of each holding its own copy, and the id can be used to look
+up data about a number in a list instead of a dictionary keyed by strings.
+"""
+from typing import Iterable, Optional
+
+
+class NumberRegistry:
+    """ A registry of phone numbers, each with a dense integer id: the ids are
+    0, 1, 2, ... in the order the numbers were registered.
+
+    === Public Attributes ===
+    numbers:
+         every registered phone number; a number is identified by its index
+         in this list
+    ids:
+         maps each phone number in <numbers> to its id
+
+    === Representation Invariants ===
+    - numbers[ids[n]] == n for every number n in <ids>
+    - len(ids) == len(numbers)
+    """
+    numbers: list[str]
+    ids: dict[str, int]
+
+    def __init__(self, numbers: Iterable[str] = ()) -> None:
+        """ Create a registry of the <numbers>, with ids in order.
+
+        Precondition: there are no duplicates in <numbers>.
+        """
+        self.numbers = []
+        self.ids = {}
+        for number in numbers:
+            self.intern(number)
+
+    def __len__(self) -> int:
+        """ Return the number of registered phone numbers.
+        """
+        return len(self.numbers)
+
+    def intern(self, number: str) -> int:
+        """ Return the id of the phone number <number>, registering it with a
+        new id if it has not been seen before.
+        """
+        nid = self.ids.get(number)
+        if nid is None:
+            nid = len(self.numbers)
+            self.ids[number] = nid
+            self.numbers.append(number)
+        return nid
+
+    def get(self, number: str) -> Optional[int]:
+        """ Return the id of the phone number <number>, or None if it is not
+        registered.
+        """
+        return self.ids.get(number)
+
+    def canonical(self, number: str) -> str:
+        """ Return the single string object this registry keeps for the phone
+        number <number>, registering it if needed.
+        """
+        return self.numbers[self.intern(number)]
+
+    def number(self, nid: int) -> str:
+        """ Return the phone number with the id <nid>.
+        """
+        return self.numbers[nid]
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing'
+        ],
+        'generated-members': 'pygame.*'
+    })
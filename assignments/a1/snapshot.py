@@ -0,0 +1,314 @@
+"""
+CSC148, Winter 2024
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains functions to save the state of the application after the
+dataset has been processed to a binary snapshot file, and to load it back.
+Loading a snapshot is much faster than processing the dataset again, since no
+JSON event is parsed and no call is billed.
+
+A snapshot file holds:
+- a magic string, and the length of the header that follows it;
+- a JSON header with the phone numbers, the customers, their phone lines
+  with the state of their contracts and bills (as in a checkpoint), and the
+  number of outgoing and incoming calls of each line in each month;
+- the raw bytes of each column of the CallStore holding the calls, unless
+  the columns were saved to a separate directory to be memory-mapped (see
+  callstore.save_columns). Each save then writes the columns to a new
+  generation subdirectory, named in the header along with the number of
+  calls, so a snapshot always maps the columns saved with it, and processes
+  that mapped older columns are not affected;
+- the raw bytes of the store indices of the calls in each line's history,
+  month by month, in the order given by the header.
+
+The calls must have been processed into a CallStore (see
+process_event_history), so that every call history is made of RowLists.
+"""
+import json
+import os
+import shutil
+import struct
+import sys
+from array import array
+from typing import Optional, Union
+
+from application import IngestStats, build_number_index, create_customers, \
+    import_data, process_event_history
+from callhistory import CallHistory
+from callstore import COLUMNS, CallStore, RowList, map_columns, \
+    save_columns
+from checkpoint import line_state, restore_line
+from customer import Customer
+from ledger import BillLedger
+from registry import NumberRegistry
+
+# Start of every snapshot file, including the format version
+MAGIC = b'A1SNAP02'
+
+# Prefix of the generation subdirectories of a columns directory, and the
+# number of generations kept, so that a process loading the previous snapshot
+# while a new one is saved still finds its columns
+GENERATION_PREFIX = 'gen-'
+KEPT_GENERATIONS = 2
+
+# Magic string and header length
+_PREFIX = struct.Struct('<8sQ')
+
+
+def save_snapshot(filename: str, customers: list[Customer],
+                  store: CallStore, columns_dir: Optional[str] = None) \
+        -> None:
+    """ Save the <customers>, whose calls are all in <store>, to the
+    snapshot file <filename>.
+
+    If <columns_dir> is given, the columns of <store> are saved to a new
+    generation subdirectory of that directory instead of the snapshot file,
+    and they are memory-mapped from there when the snapshot is loaded. Only
+    the last KEPT_GENERATIONS generations are kept.
+
+    The file is replaced atomically, so an interrupted save leaves the
+    previous snapshot intact.
+    """
+    history = array('i')
+    customer_states = []
+    for customer in customers:
+        lines = []
+        for line in customer.get_phone_lines():
+            state = line_state(line)
+            state['calls'] = _save_history(line.get_call_history(), store,
+                                           history)
+            lines.append(state)
+        customer_states.append({'id': customer.get_id(), 'lines': lines})
+
+    header = {'byteorder': sys.byteorder, 'customers': customer_states,
+              'rows': len(store)}
+    generation = None
+    if columns_dir is None:
+        columns = [getattr(store, name) for name in COLUMNS] + [history]
+        header['numbers'] = store.numbers
+    else:
+        generation = _new_generation(columns_dir)
+        save_columns(store, generation)
+        columns = [history]
+        header['columns_dir'] = os.path.relpath(
+            generation, os.path.dirname(os.path.abspath(filename)))
+    header['columns'] = [[_typecode(c), len(c)] for c in columns]
+    header = json.dumps(header).encode()
+
+    temp = filename + '.tmp'
+    with open(temp, 'wb') as o:
+        o.write(_PREFIX.pack(MAGIC, len(header)))
+        o.write(header)
+        for column in columns:
+            o.write(column)
+    os.replace(temp, filename)
+    if generation is not None:
+        for old in _generations(columns_dir)[:-KEPT_GENERATIONS]:
+            shutil.rmtree(old)
+
+
+def load_snapshot(filename: str, ledger: Optional[BillLedger] = None) \
+        -> tuple[list[Customer], CallStore]:
+    """ Return the customers saved in the snapshot file <filename>, and the
+    CallStore holding their calls. If <ledger> is given, the bills of the
+    phone lines are stored in it.
+
+    Raise a ValueError if the file is not a snapshot of this version, or if
+    its memory-mapped columns do not hold the calls it was saved with.
+    """
+    with open(filename, 'rb') as o:
+        data = memoryview(o.read())
+    if len(data) < _PREFIX.size:
+        raise ValueError(f'{filename} is not a snapshot of this version')
+    magic, header_len = _PREFIX.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f'{filename} is not a snapshot of this version')
+    offset = _PREFIX.size + header_len
+    header = json.loads(bytes(data[_PREFIX.size:offset]))
+
+    columns = []
+    for typecode, length in header['columns']:
+        column = array(typecode)
+        end = offset + length * column.itemsize
+        column.frombytes(data[offset:end])
+        if header['byteorder'] != sys.byteorder:
+            column.byteswap()
+        columns.append(column)
+        offset = end
+    history = columns.pop()
+
+    if 'columns_dir' in header:
+        store = map_columns(os.path.join(
+            os.path.dirname(os.path.abspath(filename)), header['columns_dir']))
+    else:
+        store = CallStore(NumberRegistry(header['numbers']))
+        for name, column in zip(COLUMNS, columns):
+            setattr(store, name, column)
+    if len(store) != header['rows']:
+        raise ValueError(f'{filename} was saved with {header["rows"]} calls, '
+                         f'but its columns hold {len(store)}')
+
+    customers = []
+    position = 0
+    for customer_state in header['customers']:
+        customer = Customer(customer_state['id'])
+        for state in customer_state['lines']:
+            line = restore_line(state, ledger)
+            position = _load_history(line.get_call_history(), state['calls'],
+                                     store, history, position)
+            customer.add_phone_line(line)
+        customers.append(customer)
+    return customers, store
+
+
+def snapshot_paths(dataset: str, directory: Optional[str] = None) \
+        -> tuple[str, str]:
+    """ Return the name of the snapshot file of the dataset file <dataset>,
+    and of the directory of its memory-mapped columns. They are next to the
+    dataset, or in <directory> if it is given.
+    """
+    name = os.path.basename(dataset)
+    if directory is None:
+        directory = os.path.dirname(dataset)
+    base = os.path.join(directory, os.path.splitext(name)[0])
+    return base + '.snapshot', base + '.columns'
+
+
+def load_state(dataset: str, filename: str,
+               columns_dir: Optional[str] = None,
+               registry: Optional[NumberRegistry] = None,
+               ledger: Optional[BillLedger] = None,
+               stats: Optional[IngestStats] = None) \
+        -> tuple[list[Customer], CallStore]:
+    """ Return the customers of the dataset in <dataset> with all of its
+    events processed, and the CallStore holding their calls. If <ledger> is
+    given, the bills of the phone lines are stored in it.
+
+    They are loaded from the snapshot file <filename> if it is at least as
+    recent as <dataset> and can be loaded. Otherwise (e.g. for a snapshot of
+    an older format, or whose columns are missing) the dataset is processed,
+    with the phone numbers of the lines and the calls interned in <registry>
+    (or a new registry, if None), and the time spent is added to <stats> if
+    given. The snapshot is then saved for the next time, with its columns in
+    <columns_dir> if given (see save_snapshot).
+    """
+    if is_current(filename, dataset):
+        try:
+            return load_snapshot(filename, ledger)
+        except (ValueError, OSError):
+            # The snapshot cannot be used (this is found out before any bill
+            # is stored in <ledger>), so it is replaced below
+            pass
+    log = import_data(dataset)
+    store = CallStore(registry)
+    customers = create_customers(log, ledger, store.registry)
+    process_event_history(log, customers, build_number_index(customers)[0],
+                          stats, store)
+    save_snapshot(filename, customers, store, columns_dir)
+    return customers, store
+
+
+def _generations(columns_dir: str) -> list[str]:
+    """ Return the generation subdirectories of <columns_dir>, oldest first.
+    """
+    if not os.path.isdir(columns_dir):
+        return []
+    names = [name for name in os.listdir(columns_dir)
+             if name.startswith(GENERATION_PREFIX)
+             and name[len(GENERATION_PREFIX):].isdigit()]
+    names.sort(key=lambda name: int(name[len(GENERATION_PREFIX):]))
+    return [os.path.join(columns_dir, name) for name in names]
+
+
+def _new_generation(columns_dir: str) -> str:
+    """ Create and return a new generation subdirectory of <columns_dir>,
+    after all the existing ones.
+    """
+    generations = _generations(columns_dir)
+    number = 0 if not generations else \
+        int(os.path.basename(generations[-1])[len(GENERATION_PREFIX):]) + 1
+    generation = os.path.join(columns_dir,
+                              f'{GENERATION_PREFIX}{number:06d}')
+    os.makedirs(generation)
+    return generation
+
+
+def _typecode(column: Union[array, memoryview]) -> str:
+    """ Return the array typecode of the items of <column>.
+    """
+    return column.format if isinstance(column, memoryview) \
+        else column.typecode
+
+
+def is_current(filename: str, dataset: str) -> bool:
+    """ Return whether the snapshot file <filename> exists and is at least as
+    recent as the dataset file <dataset>.
+    """
+    return os.path.exists(filename) and \
+        os.path.getmtime(filename) >= os.path.getmtime(dataset)
+
+
+def _save_history(history: CallHistory, store: CallStore, indices: array) \
+        -> list[list[int]]:
+    """ Add the store indices of the calls of the CallHistory <history> to
+    <indices>, month by month, and return the [month, year, outgoing count,
+    incoming count] of each month, in the order they were added.
+    """
+    months = []
+    for month, year in history.get_months():
+        counts = [month, year]
+        for calls in (history.outgoing_calls, history.incoming_calls):
+            monthly = calls.get((month, year), RowList(store))
+            if not isinstance(monthly, RowList) or monthly.store is not store:
+                raise ValueError('calls must be processed into the CallStore '
+                                 'to be saved in a snapshot')
+            indices.extend(monthly.indices)
+            counts.append(len(monthly))
+        months.append(counts)
+    return months
+
+
+def _load_history(history: CallHistory, months: list[list[int]],
+                  store: CallStore, indices: array, position: int) -> int:
+    """ Set the calls of the CallHistory <history> from the store indices in
+    <indices> starting at <position>, for the <months> as returned by
+    _save_history, and return the position after the last index used.
+    """
+    outgoing = {}
+    incoming = {}
+    for month, year, n_out, n_in in months:
+        if n_out > 0:
+            outgoing[(month, year)] = \
+                RowList(store, indices[position:position + n_out])
+        position += n_out
+        if n_in > 0:
+            incoming[(month, year)] = \
+                RowList(store, indices[position:position + n_in])
+        position += n_in
+    history.set_calls(outgoing, incoming)
+    return position
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'json', 'os', 'shutil', 'struct', 'sys',
+            'array',
+            'application', 'callhistory', 'callstore', 'checkpoint',
+            'customer', 'ledger', 'registry'
+        ],
+        'allowed-io': ['save_snapshot', 'load_snapshot'],
+        'generated-members': 'pygame.*'
+    })
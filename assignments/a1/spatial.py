@@ -0,0 +1,156 @@
+"""
+CSC148, Winter 2024
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the CallGrid class, a spatial index over the source and
+destination locations of a list of calls. It divides the Toronto map into a
+uniform grid, so that a rectangle query only looks at the calls in the grid
+cells that overlap the rectangle.
+"""
+from typing import Sequence
+
+from call import Call
+
+# Lower-left and upper-right corners (long, lat) of the Toronto map
+MAP_LOWER_LEFT = (-79.697878, 43.576959)
+MAP_UPPER_RIGHT = (-79.196382, 43.799568)
+
+# Default number of grid cells along each axis
+GRID_SIZE = 64
+
+
+class CallGrid:
+    """ A uniform grid index over the endpoints of a list of calls.
+
+    === Public Attributes ===
+    calls:
+         the calls indexed by this grid; each call is identified by its
+         position in this list
+    size:
+         the number of cells along each axis of the grid
+
+    === Representation Invariants ===
+    - the position of every call with an endpoint in the cell at column x and
+      row y is in _cells[y * size + x]. Endpoints outside of the map are
+      placed in the nearest edge cell.
+    """
+    # === Private Attributes ===
+    # _cells:
+    #     for each cell, in row-major order, the positions in <calls> of the
+    #     calls with an endpoint in that cell
+    # _lower:
+    #     the lower-left corner of the grid
+    # _cell_w, _cell_h:
+    #     the width and height of a cell
+    calls: Sequence[Call]
+    size: int
+    _cells: list[list[int]]
+    _lower: tuple[float, float]
+    _cell_w: float
+    _cell_h: float
+
+    def __init__(self, calls: Sequence[Call], size: int = GRID_SIZE) -> None:
+        """ Build a grid of <size> by <size> cells over the map, indexing
+        the source and destination of each of the <calls>.
+        """
+        self.calls = calls
+        self.size = size
+        self._lower = MAP_LOWER_LEFT
+        self._cell_w = (MAP_UPPER_RIGHT[0] - MAP_LOWER_LEFT[0]) / size
+        self._cell_h = (MAP_UPPER_RIGHT[1] - MAP_LOWER_LEFT[1]) / size
+        self._cells = [[] for _ in range(size * size)]
+        for position, call in enumerate(calls):
+            src_cell = self._cell_of(call.src_loc)
+            dst_cell = self._cell_of(call.dst_loc)
+            self._cells[src_cell].append(position)
+            if dst_cell != src_cell:
+                self._cells[dst_cell].append(position)
+
+    def _column(self, long: float) -> int:
+        """ Return the grid column containing the longitude <long>.
+        """
+        return min(self.size - 1,
+                   max(0, int((long - self._lower[0]) / self._cell_w)))
+
+    def _row(self, lat: float) -> int:
+        """ Return the grid row containing the latitude <lat>.
+        """
+        return min(self.size - 1,
+                   max(0, int((lat - self._lower[1]) / self._cell_h)))
+
+    def _cell_of(self, loc: tuple[float, float]) -> int:
+        """ Return the index in _cells of the cell containing <loc>.
+        """
+        return self._row(loc[1]) * self.size + self._column(loc[0])
+
+    def query(self, lower: tuple[float, float],
+              upper: tuple[float, float]) -> list[int]:
+        """ Return the positions in <calls>, in increasing order, of the calls
+        whose source or destination is within the rectangle with lower-left
+        corner <lower> and upper-right corner <upper>. Points exactly on the
+        boundary of the rectangle are within it.
+        """
+        x0, x1 = self._column(lower[0]), self._column(upper[0])
+        y0, y1 = self._row(lower[1]), self._row(upper[1])
+        found = set()
+        for y in range(y0, y1 + 1):
+            for x in range(x0, x1 + 1):
+                cell = self._cells[y * self.size + x]
+                if self._inside(x, y, lower, upper):
+                    found.update(cell)
+                    continue
+                for position in cell:
+                    call = self.calls[position]
+                    if _within(lower, upper, call.src_loc) or \
+                            _within(lower, upper, call.dst_loc):
+                        found.add(position)
+        return sorted(found)
+
+    def _inside(self, x: int, y: int, lower: tuple[float, float],
+                upper: tuple[float, float]) -> bool:
+        """ Return whether every point that can be placed in the cell at
+        column <x> and row <y> is within the rectangle from <lower> to
+        <upper>. Edge cells can hold points outside of the map, so they are
+        never considered inside.
+        """
+        if x in (0, self.size - 1) or y in (0, self.size - 1):
+            return False
+        left = self._lower[0] + x * self._cell_w
+        bottom = self._lower[1] + y * self._cell_h
+        # Pad by a cell fraction to stay safe from floating point error in
+        # _column and _row
+        pad_w = self._cell_w * 1e-6
+        pad_h = self._cell_h * 1e-6
+        return lower[0] <= left - pad_w \
+            and left + self._cell_w + pad_w <= upper[0] \
+            and lower[1] <= bottom - pad_h \
+            and bottom + self._cell_h + pad_h <= upper[1]
+
+
+def _within(lower: tuple[float, float], upper: tuple[float, float],
+            loc: tuple[float, float]) -> bool:
+    """ Return whether <loc> is within the rectangle from <lower> to <upper>,
+    boundary included.
+    """
+    return lower[0] <= loc[0] <= upper[0] and lower[1] <= loc[1] <= upper[1]
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'call'
+        ],
+        'generated-members': 'pygame.*'
+    })
@@ -1,12 +1,16 @@
 
+import json
+
 import pytest
 from datetime import datetime
 
-from application import create_customers, process_event_history, find_customer_by_number
+from application import create_customers, process_event_history, find_customer_by_number, \
+    build_number_index, IngestStats, parse_timestamp
 from contract import TermContract, MTMContract, PrepaidContract
 from customer import Customer
 from filter import DurationFilter, CustomerFilter, ResetFilter
 from phoneline import PhoneLine
+from call import Call
 
 
 def test_process_event_history_no_events():
@@ -130,6 +134,128 @@ def test_process_event_history_genral():
     assert receiver_call_history[0].time == datetime.strptime("2018-01-03 02:14:31", "%Y-%m-%d %H:%M:%S")
 
 
+def test_parse_timestamp():
+    with open("dataset.json") as o:
+        events = json.load(o)['events']
+    for event in events:
+        assert parse_timestamp(event['time']) == \
+            datetime.strptime(event['time'], "%Y-%m-%d %H:%M:%S")
+    assert parse_timestamp("2018-1-3 2:14:31") == datetime(2018, 1, 3, 2, 14, 31)
+    with pytest.raises(ValueError):
+        parse_timestamp("2018-13-03 02:14:31")
+    with pytest.raises(ValueError):
+        parse_timestamp("not a timestamp")
+    # Shapes fromisoformat accepts, but strptime does not
+    for timestamp in ("2018-01-03 02:14+00", "2018-01-03T02:14:31",
+                      "2018-01-03 02:14:31Z"):
+        with pytest.raises(ValueError):
+            parse_timestamp(timestamp)
+
+
+def test_build_number_index():
+    log = {
+        "events": [],
+        "customers": [
+            {"lines": [{"number": "861-1710", "contract": "mtm"}], "id": 2247},
+            {"lines": [{"number": "386-6346", "contract": "term"},
+                       {"number": "131-3768", "contract": "prepaid"}],
+             "id": 3895}
+        ]
+    }
+    customer_list = create_customers(log)
+    customer_index, line_index = build_number_index(customer_list)
+    assert len(customer_index) == 3
+    assert customer_index["861-1710"].get_id() == 2247
+    assert customer_index["131-3768"].get_id() == 3895
+    assert line_index["386-6346"].get_number() == "386-6346"
+    assert find_customer_by_number("131-3768", customer_list, customer_index) \
+        is customer_index["131-3768"]
+    assert find_customer_by_number("000-0000", customer_list,
+                                   customer_index) is None
+    assert find_customer_by_number("000-0000", customer_list) is None
+
+
+def test_process_event_history_month_changes():
+    log = {
+        "events": [
+            {"type": "sms",
+            "src_number": "861-1710",
+            "dst_number": "386-6346",
+            "time": "2018-01-01 01:01:01",
+            "src_loc": [-79.42848154284123, 43.641401675960374],
+            "dst_loc": [-79.52745693913239, 43.750338501653374]},
+            {"type": "call",
+            "src_number": "861-1710",
+            "dst_number": "386-6346",
+            "time": "2018-01-03 02:14:31",
+            "duration": 80,
+            "src_loc": [-79.45188229255568, 43.62186408875219],
+            "dst_loc": [-79.36866519485261, 43.680793196449336]},
+            {"type": "call",
+            "src_number": "386-6346",
+            "dst_number": "861-1710",
+            "time": "2018-02-04 02:14:31",
+            "duration": 90,
+            "src_loc": [-79.45188229255568, 43.62186408875219],
+            "dst_loc": [-79.36866519485261, 43.680793196449336]}
+        ],
+        "customers": [
+            {"lines": [{"number": "861-1710", "contract": "mtm"}], "id": 2247},
+            {"lines": [{"number": "386-6346", "contract": "term"}], "id": 3895},
+            {"lines": [{"number": "131-3768", "contract": "prepaid"}],
+             "id": 1234}
+        ]
+    }
+    customer_list = create_customers(log)
+    stats = IngestStats()
+    process_event_history(log, customer_list, stats=stats)
+    assert stats.events == 3
+    assert stats.month_changes == 2
+    assert stats.month_time >= 0 and stats.billing_time >= 0
+    # Every customer is advanced to every month, even without any calls
+    idle = find_customer_by_number("131-3768", customer_list)
+    assert idle.generate_bill(1, 2018)[2][0]['type'] == "PREPAID"
+    assert idle.generate_bill(2, 2018)[2][0]['type'] == "PREPAID"
+    term = find_customer_by_number("386-6346", customer_list)
+    assert term.generate_bill(2, 2018)[2][0]['free_mins'] == 2
+
+
+def test_process_event_history_bills_like_make_call():
+    with open("dataset.json") as f:
+        log = json.load(f)
+    customer_list = create_customers(log)
+    process_event_history(log, customer_list)
+
+    # The calls are billed in one batch per line and month, with the same
+    # bills as making each call on its line
+    expected = create_customers(log)
+    index = build_number_index(expected)[0]
+    current_month = None
+    for event in log['events']:
+        time = parse_timestamp(event['time'])
+        if (time.month, time.year) != current_month:
+            current_month = (time.month, time.year)
+            for customer in expected:
+                customer.new_month(time.month, time.year)
+        if event['type'] == "call":
+            call = Call(event['src_number'], event['dst_number'], time,
+                        event['duration'], tuple(event['src_loc']),
+                        tuple(event['dst_loc']))
+            index[call.src_number].get_phone_line(call.src_number) \
+                .make_call(call)
+            index[call.dst_number].get_phone_line(call.dst_number) \
+                .receive_call(call)
+    for customer, other in zip(customer_list, expected):
+        for line, other_line in zip(customer.get_phone_lines(),
+                                    other.get_phone_lines()):
+            assert list(line.bills) == list(other_line.bills)
+            for key in line.bills:
+                assert repr(line.bills[key].get_summary()) == \
+                    repr(other_line.bills[key].get_summary())
+            state = dict(vars(line.contract), bill=None)
+            assert state == dict(vars(other_line.contract), bill=None)
+
+
 # def test_process_event_history_no_customers():
 #     log = {
 #         "events": [
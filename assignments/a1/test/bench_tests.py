@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from application import create_customers, parse_timestamp, process_event_history
+import bench
+from bench import generate_dataset, main, run_benchmark, write_dataset
+
+
+def test_generate_dataset_format():
+    data = generate_dataset(20, 3, 500, 14, seed=1)
+    assert data == generate_dataset(20, 3, 500, 14, seed=1)
+    assert len(data['customers']) == 20
+    assert len(data['events']) == 500
+    numbers = [line['number'] for c in data['customers'] for line in c['lines']]
+    assert len(set(numbers)) == 60
+
+    times = [parse_timestamp(e['time']) for e in data['events']]
+    assert times == sorted(times)
+    assert len({(t.year, t.month) for t in times}) == 14
+    for event in data['events']:
+        assert event['src_number'] in numbers and event['dst_number'] in numbers
+        assert ('duration' in event) == (event['type'] == 'call')
+
+    # The dataset can be processed like dataset.json
+    customers = create_customers(data)
+    process_event_history(data, customers)
+    assert sum(len(c.get_history()[0]) for c in customers) == \
+        sum(e['type'] == 'call' for e in data['events'])
+
+
+@pytest.mark.parametrize("store, registry, ledger",
+                         [(False, False, False), (True, False, False),
+                          (False, True, False), (True, False, True),
+                          (False, True, True)])
+def test_run_benchmark(tmp_path, store, registry, ledger):
+    filename = str(tmp_path / "data.json")
+    write_dataset(filename, 10, 2, 300, 3)
+    result = run_benchmark(filename, store, registry, ledger)
+    assert result['events'] == 300
+    assert result['month_changes'] == 3
+    assert set(result['phases']) >= {'load_json', 'create_customers',
+                                     'build_number_index',
+                                     'process_event_history'}
+    assert result['events_per_sec'] > 0
+    json.dumps(result)
+
+
+def test_run_benchmark_shares_store_registry(tmp_path, monkeypatch):
+    filename = str(tmp_path / "data.json")
+    write_dataset(filename, 10, 2, 300, 3)
+    seen = {}
+
+    def process(log, customers, customer_index, stats, store, registry):
+        seen['store'] = store
+        seen['registry'] = registry
+        seen['lines'] = [line for c in customers for line in c.get_phone_lines()]
+        process_event_history(log, customers, customer_index, stats, store,
+                              registry=registry)
+    monkeypatch.setattr(bench, "process_event_history", process)
+    run_benchmark(filename, store=True)
+    assert seen['registry'] is seen['store'].registry
+    for line in seen['lines']:
+        assert line.get_number() is \
+            seen['registry'].canonical(line.get_number())
+
+
+def test_main_writes_json(tmp_path):
+    output = tmp_path / "bench.json"
+    assert main(['--customers', '5', '--lines', '1', '--events', '50',
+                 '--months', '2', '-o', str(output)]) == 0
+    report = json.loads(output.read_text())
+    assert len(report['results']) == 1
+    result = report['results'][0]
+    assert (result['customers'], result['events']) == (5, 50)
+    assert (result['store'], result['registry'], result['ledger']) == \
+        (False, False, False)
+
+
+def test_main_options(tmp_path):
+    output = tmp_path / "bench.json"
+    assert main(['--customers', '5', '--lines', '1', '--events', '50',
+                 '--months', '2', '--store', '--ledger',
+                 '-o', str(output)]) == 0
+    result = json.loads(output.read_text())['results'][0]
+    # The store's registry is shared with the phone lines
+    assert (result['store'], result['registry'], result['ledger']) == \
+        (True, True, True)
+    assert result['peak_rss_kb'] is None or result['peak_rss_kb'] > 0
+
+
+if __name__ == "__main__":
+    pytest.main(["bench_tests.py"])
@@ -0,0 +1,129 @@
+import csv
+import io
+import json
+import subprocess
+import sys
+
+import pytest
+
+from concurrent.futures import ProcessPoolExecutor
+
+from application import build_number_index, create_customers, import_data, \
+    process_event_history
+from billing import billing_months, generate_bills, load_customers, main, \
+    run_bills, write_csv, write_json
+from callstore import RowList
+import snapshot
+
+
+def test_billing_months_chronological():
+    customers = load_customers("dataset.json")
+    months = billing_months(customers)
+    assert months[0] == (1, 2018)
+    assert months == sorted(months, key=lambda m: (m[1], m[0]))
+    assert len(set(months)) == len(months)
+
+
+def test_generate_bills_matches_customers():
+    customers = load_customers("dataset.json")
+    bills = list(generate_bills(customers, [(2, 2018)]))
+    assert len(bills) == len(customers)
+    for bill, customer in zip(bills, customers):
+        cid, total, lines = customer.generate_bill(2, 2018)
+        assert bill == {'customer_id': cid, 'month': 2, 'year': 2018,
+                        'total': total, 'lines': lines}
+
+
+def test_run_bills_parallel_matches_generate_bill():
+    customers = load_customers("dataset.json")
+    with ProcessPoolExecutor(2) as executor:
+        for month, year in billing_months(customers):
+            expected = [c.generate_bill(month, year) for c in customers]
+            assert run_bills(customers, month, year, executor, 7) == expected
+    assert run_bills(customers, 1, 2018) == \
+        [c.generate_bill(1, 2018) for c in customers]
+
+
+def test_generate_bills_workers():
+    customers = load_customers("dataset.json")
+    months = billing_months(customers)
+    assert list(generate_bills(customers, months, 2)) == \
+        list(generate_bills(customers, months))
+
+
+def test_ledger_output_matches_bills():
+    # The bills of load_customers are in a BillLedger; these are Bill objects
+    log = import_data("dataset.json")
+    expected = create_customers(log)
+    process_event_history(log, expected, build_number_index(expected)[0])
+    customers = load_customers("dataset.json")
+    months = billing_months(customers)
+    for write in (write_csv, write_json):
+        out = io.StringIO()
+        write(generate_bills(customers, months), out)
+        expected_out = io.StringIO()
+        write(generate_bills(expected, months), expected_out)
+        assert out.getvalue() == expected_out.getvalue()
+    # Prepaid lines start from an int balance, which stays an int
+    assert '"fixed": -100,' in out.getvalue()
+    assert '"fixed": -100.0,' not in out.getvalue()
+
+
+def test_main_csv_and_json(tmp_path):
+    customers = load_customers("dataset.json")
+    months = billing_months(customers)
+    lines = sum(len(c.get_phone_numbers()) for c in customers)
+
+    csv_file = tmp_path / "bills.csv"
+    assert main(["dataset.json", "-o", str(csv_file)]) == 0
+    with open(csv_file) as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == lines * len(months)
+    assert rows[0]['month'] == '1' and rows[0]['year'] == '2018'
+
+    json_file = tmp_path / "bills.json"
+    assert main(["dataset.json", "--stream", "-o", str(json_file)]) == 0
+    with open(json_file) as f:
+        bills = json.load(f)
+    assert len(bills) == len(customers) * len(months)
+    assert bills[0]['total'] == customers[0].generate_bill(1, 2018)[1]
+
+
+def test_main_snapshot(tmp_path, monkeypatch):
+    expected = tmp_path / "expected.csv"
+    assert main(["dataset.json", "-o", str(expected)]) == 0
+    snapshot_dir = tmp_path / "snapshot"
+    snapshot_dir.mkdir()
+    first = tmp_path / "first.csv"
+    assert main(["dataset.json", "--snapshot-dir", str(snapshot_dir),
+                 "-o", str(first)]) == 0
+    assert (snapshot_dir / "dataset.snapshot").exists()
+
+    # The next run reads the snapshot and its mapped columns instead
+    def fail(*args, **kwargs):
+        raise AssertionError("the dataset should not be processed again")
+    monkeypatch.setattr(snapshot, "process_event_history", fail)
+    customers = load_customers("dataset.json", snapshot=True,
+                               snapshot_dir=str(snapshot_dir))
+    history = customers[0].get_phone_lines()[0].get_call_history()
+    assert any(isinstance(calls, RowList) and
+               isinstance(calls.store.times, memoryview)
+               for calls in history.outgoing_calls.values())
+    second = tmp_path / "second.csv"
+    assert main(["dataset.json", "--snapshot-dir", str(snapshot_dir),
+                 "-o", str(second)]) == 0
+    assert first.read_text() == expected.read_text()
+    assert second.read_text() == expected.read_text()
+
+
+def test_main_does_not_import_pygame(tmp_path):
+    code = ("import sys\n"
+            "import billing\n"
+            f"billing.main(['dataset.json', '-o', {str(tmp_path / 'b.csv')!r}])\n"
+            "assert 'pygame' not in sys.modules\n")
+    result = subprocess.run([sys.executable, "-c", code])
+    assert result.returncode == 0
+
+
+if __name__ == '__main__':
+    pytest.main(['billing_tests.py'])
@@ -0,0 +1,101 @@
+import pytest
+
+from application import create_customers, import_data, process_event_history
+from bitmap import CallIndex, mask_to_positions, positions_to_mask
+from callstore import CallStore, RowList
+import filter
+from filter import CustomerFilter, DurationFilter, LocationFilter, ResetFilter
+from spatial import CallGrid
+
+
+def load_calls():
+    log = import_data()
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    return customers, ResetFilter().apply(customers, [], "")
+
+
+def test_mask_positions_round_trip():
+    assert mask_to_positions(0) == []
+    assert positions_to_mask([], 10) == 0
+    positions = [0, 3, 8, 63, 64, 100]
+    assert mask_to_positions(positions_to_mask(positions, 101)) == positions
+
+
+def test_bitmap_operations():
+    customers, calls = load_calls()
+    index = CallIndex(calls)
+    full = index.full()
+    assert len(full) == len(calls)
+    assert full.to_list() == calls
+    assert len(index.empty()) == 0
+
+    evens = index.bitmap(calls[::2])
+    firsts = index.bitmap(calls[:10])
+    assert (evens & firsts).to_list() == calls[:10:2]
+    assert (evens | firsts).to_list() == \
+        [c for i, c in enumerate(calls) if i % 2 == 0 or i < 10]
+    assert (firsts - evens).to_list() == calls[1:10:2]
+    assert calls[2] in evens and calls[1] not in evens
+    assert list(evens) == calls[::2]
+    assert index.bitmap(reversed(calls[:10])) == firsts
+
+
+def test_apply_bitmap_matches_apply():
+    customers, calls = load_calls()
+    index = CallIndex(calls)
+    data = index.bitmap(calls[::2])
+    cases = [(CustomerFilter(), str(customers[1].get_id())),
+             (DurationFilter(), "G200"),
+             (DurationFilter(), "bad"),
+             (LocationFilter(), "-79.6, 43.6, -79.3, 43.7")]
+    for f, filter_string in cases:
+        expected = f.apply(customers, data.to_list(), filter_string)
+        assert f.apply_bitmap(customers, data, filter_string).to_list() == \
+            expected
+    assert ResetFilter().apply_bitmap(customers, data, "") == index.full()
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_native_bitmap_paths(monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(filter, "numpy", None)
+    customers, calls = load_calls()
+    # Repeated calls are only kept once by a valid filter
+    repeated = calls + calls[:30]
+    index = CallIndex(repeated)
+    grid = CallGrid(repeated, 16)
+    cases = [(CustomerFilter(), str(customers[1].get_id())),
+             (CustomerFilter(), "0000"),
+             (DurationFilter(), "G200"),
+             (DurationFilter(), "L050"),
+             (DurationFilter(), "bad"),
+             (LocationFilter(grid), "-79.6, 43.6, -79.3, 43.7"),
+             (LocationFilter(grid), "-79.6, 43.6")]
+    for data in [index.full(), index.bitmap(repeated[::2])]:
+        for f, filter_string in cases:
+            assert f.has_bitmap_path(index)
+            expected = f.apply(customers, data.to_list(), filter_string)
+            assert f.apply_bitmap(customers, data, filter_string).to_list() \
+                == expected
+    # The grid only works on bitmaps over the calls it indexes
+    assert not LocationFilter(grid).has_bitmap_path(CallIndex(calls))
+    assert not LocationFilter().has_bitmap_path(index)
+
+    # Over the rows of a CallStore, the durations are read from the store
+    store = CallStore()
+    rows = RowList(store)
+    for call in repeated:
+        rows.append(store.add_call(call))
+    row_index = CallIndex(rows)
+    data = row_index.full()
+    for filter_string in ["G200", "L050", "bad"]:
+        expected = DurationFilter().apply(customers, list(rows), filter_string)
+        result = DurationFilter().apply_bitmap(customers, data, filter_string)
+        assert [row.index for row in result] == [row.index for row in expected]
+
+
+if __name__ == '__main__':
+    pytest.main(['bitmap_tests.py'])
@@ -0,0 +1,50 @@
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+from call import Call
+
+
+def create_call() -> Call:
+    return Call("861-1710", "386-6346", datetime(2018, 1, 3, 2, 14, 31), 80,
+                (-79.45188229255568, 43.62186408875219),
+                (-79.36866519485261, 43.680793196449336))
+
+
+def test_call_drawables_are_lazy():
+    call = create_call()
+    assert call.drawables is None
+    assert call.connection is None
+    drawables = call.get_drawables()
+    assert len(drawables) == 2
+    assert drawables[0].get_position() == call.src_loc
+    assert drawables[1].get_position() == call.dst_loc
+    assert call.get_drawables() is drawables
+    assert call.get_connection().get_linelimits() == (call.src_loc,
+                                                      call.dst_loc)
+
+
+def test_call_sprites_are_shared():
+    first = create_call().get_drawables()
+    second = create_call().get_drawables()
+    assert first[0].sprite is second[0].sprite
+    assert first[1].sprite is second[1].sprite
+
+
+def test_billing_does_not_import_pygame():
+    code = ("import sys\n"
+            "from application import create_customers, import_data\n"
+            "from application import process_event_history\n"
+            "log = import_data()\n"
+            "customers = create_customers(log)\n"
+            "process_event_history(log, customers)\n"
+            "customers[0].generate_bill(1, 2018)\n"
+            "assert 'pygame' not in sys.modules\n")
+    result = subprocess.run([sys.executable, "-c", code])
+    assert result.returncode == 0
+
+
+if __name__ == '__main__':
+    pytest.main(['call_tests.py'])
@@ -155,5 +155,74 @@ def test_register_incoming_call_mix_month():
         assert calls[i] in call_history.incoming_calls[(dates[i].month, dates[i].year)]
 
 
+def test_get_monthly_history_all_calls_view():
+    call_history = CallHistory()
+    jan = datetime.strptime("2018-01-03 02:14:31", "%Y-%m-%d %H:%M:%S")
+    feb = datetime.strptime("2018-02-03 02:14:31", "%Y-%m-%d %H:%M:%S")
+    calls = [Call("123-4567", "890-1234", feb, 120, (-79.42, 43.64), (-79.52, 43.75)),
+             Call("123-4567", "890-1234", jan, 60, (-79.42, 43.64), (-79.52, 43.75))]
+    call_history.register_outgoing_call(calls[0])
+    outgoing, incoming = call_history.get_monthly_history()
+    assert outgoing == calls[:1]
+    assert len(incoming) == 0
+
+    # The view sees calls registered later, month by month
+    call_history.register_outgoing_call(calls[1])
+    assert outgoing == calls
+    assert call_history.get_monthly_history(1, 2018) == ([calls[1]], [])
+
+
+def test_get_all_outgoing_out_of_order():
+    call_history = CallHistory()
+    calls = []
+    # A call of January registered after the calls of February is kept with
+    # the other calls of January, as get_monthly_history lists them
+    for month, day in [(1, 3), (2, 3), (1, 20), (2, 10), (1, 25)]:
+        time = datetime(2018, month, day, 10, 0, 0)
+        calls.append(Call("123-4567", "890-1234", time, 60,
+                          (-79.42, 43.64), (-79.52, 43.75)))
+    outgoing = call_history.get_all_outgoing()
+    for call in calls:
+        call_history.register_outgoing_call(call)
+    expected = [calls[0], calls[2], calls[4], calls[1], calls[3]]
+    assert outgoing == expected
+    assert len(outgoing) == 5
+    assert [outgoing[i] for i in range(-5, 5)] == expected + expected
+    assert list(call_history.get_all_outgoing()) == \
+        [c for key in call_history.outgoing_calls
+         for c in call_history.outgoing_calls[key]]
+
+    call_history.register_outgoing_call(Call(
+        "123-4567", "890-1234", datetime(2018, 3, 1), 60,
+        (-79.42, 43.64), (-79.52, 43.75)))
+    assert len(outgoing) == 6
+    assert outgoing[-1].time == datetime(2018, 3, 1)
+
+
+def test_get_history_range():
+    call_history = CallHistory()
+    calls = {}
+    # Registered out of chronological order, across a year boundary
+    for month, year in [(3, 2018), (11, 2017), (8, 2018), (1, 2018), (9, 2018)]:
+        time = datetime(year, month, 5, 10, 0, 0)
+        calls[(month, year)] = Call("123-4567", "890-1234", time, 60,
+                                    (-79.42, 43.64), (-79.52, 43.75))
+        call_history.register_outgoing_call(calls[(month, year)])
+    incoming = Call("890-1234", "123-4567", datetime(2018, 4, 1), 60,
+                    (-79.42, 43.64), (-79.52, 43.75))
+    call_history.register_incoming_call(incoming)
+
+    assert call_history.get_months() == [(11, 2017), (1, 2018), (3, 2018),
+                                         (4, 2018), (8, 2018), (9, 2018)]
+    outgoing, incoming_calls = call_history.get_history_range((3, 2018), (8, 2018))
+    assert outgoing == [calls[(3, 2018)], calls[(8, 2018)]]
+    assert incoming_calls == [incoming]
+    assert outgoing[-1] == calls[(8, 2018)]
+
+    outgoing, _ = call_history.get_history_range((12, 2017), (2, 2018))
+    assert outgoing == [calls[(1, 2018)]]
+    assert call_history.get_history_range((10, 2018), (12, 2018)) == ([], [])
+
+
 if __name__ == "__main__":
     pytest.main(["callhistory_tests.py"])
\ No newline at end of file
@@ -0,0 +1,141 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from application import create_customers, import_data, process_event_history
+from call import Call
+from callhistory import CallHistory
+from callstore import CallStore, CallRow, RowList, map_columns, save_columns
+from filter import CustomerFilter, DurationFilter, LocationFilter, ResetFilter
+
+
+def test_call_has_no_dict():
+    call = Call("861-1710", "386-6346", datetime(2018, 1, 3, 2, 14, 31), 80,
+                (-79.4, 43.6), (-79.3, 43.7))
+    assert not hasattr(call, '__dict__')
+
+
+def test_store_row_matches_call():
+    call = Call("861-1710", "386-6346", datetime(2018, 1, 3, 2, 14, 31), 80,
+                (-79.45188229255568, 43.62186408875219),
+                (-79.36866519485261, 43.680793196449336))
+    store = CallStore()
+    row = store.add_call(call)
+    assert len(store) == 1
+    assert row.src_number == call.src_number
+    assert row.dst_number == call.dst_number
+    assert row.time == call.time
+    assert row.duration == call.duration
+    assert row.src_loc == call.src_loc
+    assert row.dst_loc == call.dst_loc
+    assert row.get_bill_date() == (1, 2018)
+    assert str(row) == str(call)
+    assert row == store.row(0)
+    assert row in {store.row(0)}
+    assert row != CallStore().add_call(call)
+    assert store.number_ids == {"861-1710": 0, "386-6346": 1}
+
+
+def test_row_drawables_kept_by_store():
+    call = Call("861-1710", "386-6346", datetime(2018, 1, 3, 2, 14, 31), 80,
+                (-79.4, 43.6), (-79.3, 43.7))
+    store = CallStore()
+    row = store.add_call(call)
+    drawables = row.get_drawables()
+    assert [d.get_position() for d in drawables] == \
+        [call.src_loc, call.dst_loc]
+    assert row.get_connection().get_linelimits() == (call.src_loc,
+                                                     call.dst_loc)
+    # A fresh row of the same call reuses them
+    assert store.row(0).get_drawables() is drawables
+    assert store.row(0).get_connection() is row.get_connection()
+
+
+def test_call_history_keeps_row_indices():
+    store = CallStore()
+    history = CallHistory()
+    for day in range(1, 4):
+        history.register_outgoing_call(
+            store.add("1", "2", datetime(2018, day, 1), 10, (0, 0), (0, 0)))
+    assert isinstance(history.outgoing_calls[(1, 2018)], RowList)
+    assert store.row(1) in history.outgoing_calls[(2, 2018)]
+    assert history.get_monthly_history()[0] == [store.row(0), store.row(1),
+                                                store.row(2)]
+
+    # All the calls are kept in a single RowList too, a call of an earlier
+    # month being inserted after the other calls of its month
+    history.register_outgoing_call(
+        store.add("1", "2", datetime(2018, 1, 20), 10, (0, 0), (0, 0)))
+    outgoing = history.get_all_outgoing()
+    assert isinstance(outgoing[:], RowList)
+    assert outgoing == [store.row(0), store.row(3), store.row(1),
+                        store.row(2)]
+
+
+def test_process_event_history_with_store():
+    log = import_data()
+    customers = create_customers(log)
+    process_event_history(log, customers)
+
+    store = CallStore()
+    store_customers = create_customers(log)
+    process_event_history(log, store_customers, store=store)
+    assert len(store) == sum(len(c.get_history()[0]) for c in customers)
+
+    for c1, c2 in zip(customers, store_customers):
+        assert c1.generate_bill(3, 2018) == c2.generate_bill(3, 2018)
+
+    calls = ResetFilter().apply(customers, [], "")
+    rows = ResetFilter().apply(store_customers, [], "")
+    assert all(isinstance(row, CallRow) for row in rows)
+    for f, filter_string in [(CustomerFilter(), "5716"),
+                             (DurationFilter(), "G300"),
+                             (LocationFilter(), "-79.6, 43.6, -79.3, 43.7")]:
+        expected = f.apply(customers, calls, filter_string)
+        result = f.apply(store_customers, rows, filter_string)
+        assert [str(c) for c in result] == [str(c) for c in expected]
+
+
+def test_mapped_columns(tmp_path):
+    log = import_data()
+    customers = create_customers(log)
+    store = CallStore()
+    process_event_history(log, customers, store=store)
+    save_columns(store, str(tmp_path))
+    mapped = map_columns(str(tmp_path))
+
+    assert len(mapped) == len(store)
+    assert isinstance(mapped.times, memoryview)
+    assert [str(row) for row in mapped.rows()] == [str(row) for row in store.rows()]
+    with pytest.raises(ValueError):
+        mapped.add("123-4567", "890-1234", datetime(2018, 1, 1), 60,
+                   (-79.42, 43.64), (-79.52, 43.75))
+
+    # Filters read the mapped columns in place
+    rows = RowList(mapped, range(len(mapped)))
+    expected = DurationFilter().apply(customers, RowList(store, range(len(store))), "L60")
+    assert list(DurationFilter().apply(customers, rows, "L60").indices) == \
+        list(expected.indices)
+
+    numpy = pytest.importorskip("numpy")
+    assert numpy.load(str(tmp_path / "durations.npy"), mmap_mode="r").tolist() == \
+        store.durations.tolist()
+
+
+def test_save_columns_keeps_mapped_columns(tmp_path):
+    store = CallStore()
+    for i in range(100):
+        store.add("123-4567", "890-1234", datetime(2018, 1, 1), i,
+                  (-79.42, 43.64), (-79.52, 43.75))
+    save_columns(store, str(tmp_path))
+    mapped = map_columns(str(tmp_path))
+    # Saving again replaces the files instead of overwriting them in place
+    save_columns(CallStore(), str(tmp_path))
+    assert list(mapped.durations) == list(range(100))
+    assert len(map_columns(str(tmp_path))) == 0
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+if __name__ == '__main__':
+    pytest.main(['callstore_tests.py'])
@@ -0,0 +1,93 @@
+import datetime
+
+import pytest
+
+from application import EventCursor, build_number_index, create_customers, \
+    import_data, process_event_history
+from billing import billing_months
+from checkpoint import backfill, load_checkpoint, save_checkpoint
+from ledger import BillLedger
+
+
+def all_bills(customers):
+    return [[c.generate_bill(month, year) for c in customers]
+            for month, year in billing_months(customers)]
+
+
+def histories(customers):
+    return [[(call.src_number, call.dst_number, call.time, call.duration)
+             for calls in c.get_history() for call in calls]
+            for c in customers]
+
+
+def test_event_cursor_index():
+    t1 = datetime.datetime(2018, 1, 1, 10, 0, 0)
+    t2 = datetime.datetime(2018, 1, 1, 11, 0, 0)
+    cursor = EventCursor(t1, 2)
+    cursor.advance(t1)
+    assert (cursor.time, cursor.index) == (t1, 3)
+    cursor.advance(t2)
+    assert (cursor.time, cursor.index) == (t2, 4)
+    # The events must follow the ones already processed
+    with pytest.raises(ValueError):
+        cursor.advance(t1)
+
+
+@pytest.mark.parametrize("use_ledger", [False, True])
+def test_resume_matches_full_run(tmp_path, use_ledger):
+    log = import_data("dataset.json")
+    expected = create_customers(log)
+    process_event_history(log, expected)
+
+    # Stop in the middle of the events, in the middle of a month
+    cut = len(log['events']) // 2
+    ledger = BillLedger() if use_ledger else None
+    partial = create_customers(log, ledger)
+    cursor = EventCursor()
+    process_event_history({'events': log['events'][:cut]}, partial,
+                          cursor=cursor)
+    filename = str(tmp_path / "state.json")
+    save_checkpoint(filename, partial, cursor)
+
+    customers, restored = load_checkpoint(filename, BillLedger() if use_ledger else None)
+    assert (restored.time, restored.index) == (cursor.time, cut)
+    assert all_bills(customers) == all_bills(partial)
+    assert histories(customers) == histories(partial)
+
+    process_event_history(import_data("dataset.json", start_event=cut),
+                          customers, build_number_index(customers)[0],
+                          cursor=restored)
+    assert restored.index == len(log['events'])
+    assert all_bills(customers) == all_bills(expected)
+    assert histories(customers) == histories(expected)
+    # A call is shared by its caller and its receiver, as in a full run
+    calls = {id(call) for c in customers for call in c.get_history()[0]}
+    assert all(id(call) in calls
+               for c in customers for call in c.get_history()[1])
+    for c, e in zip(customers, expected):
+        for line, expected_line in zip(c.get_phone_lines(), e.get_phone_lines()):
+            assert vars(line.contract).keys() == vars(expected_line.contract).keys()
+            if hasattr(line.contract, 'balance'):
+                assert line.contract.balance == expected_line.contract.balance
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_backfill_creates_then_resumes(tmp_path, stream):
+    filename = str(tmp_path / "state.json")
+    first = backfill("dataset.json", filename, stream)
+    second = backfill("dataset.json", filename, stream)
+    # Nothing new to process: the state is unchanged
+    assert all_bills(second) == all_bills(first)
+    assert histories(second) == histories(first)
+
+
+def test_backfill_without_histories(tmp_path):
+    filename = str(tmp_path / "state.json")
+    first = backfill("dataset.json", filename, histories=False)
+    second = backfill("dataset.json", filename)
+    assert all_bills(second) == all_bills(first)
+    assert all(len(c.get_history()[0]) == 0 for c in second)
+
+
+if __name__ == "__main__":
+    pytest.main(["checkpoint_tests.py"])
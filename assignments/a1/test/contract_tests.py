@@ -387,5 +387,33 @@ def test_cancel_contract_with_no_credit_left():
     assert prepaid_contract.start is None
     
 
+@pytest.mark.parametrize("use_numpy", [True, False])
+@pytest.mark.parametrize("make_contract", [
+    lambda: TermContract(date(2017, 12, 25), date(2019, 6, 25)),
+    lambda: MTMContract(date(2017, 12, 25)),
+    lambda: PrepaidContract(date(2017, 12, 25), 100)])
+def test_bill_calls_matches_bill_call(monkeypatch, use_numpy, make_contract):
+    import contract
+    if not use_numpy:
+        monkeypatch.setattr(contract, "numpy", None)
+    call_time = str_to_datetime("2018-01-05 10:00:00")
+    earlier = [600, 3000]
+    durations = [0, 59, 60, 61, 1800, 2400, 90, 5000]
+    for split in range(len(durations) + 1):
+        one_by_one, batch = make_contract(), make_contract()
+        one_by_one.new_month(1, 2018, Bill())
+        batch.new_month(1, 2018, Bill())
+        for duration in earlier + durations[:split]:
+            one_by_one.bill_call(create_call_objects("111-1111", "222-2222", call_time, duration))
+            batch.bill_call(create_call_objects("111-1111", "222-2222", call_time, duration))
+        for duration in durations[split:]:
+            one_by_one.bill_call(create_call_objects("111-1111", "222-2222", call_time, duration))
+        batch.bill_calls(durations[split:])
+        assert batch.bill.get_summary() == one_by_one.bill.get_summary()
+        assert type(batch.bill.billed_min) is int
+        if isinstance(batch, PrepaidContract):
+            assert batch.balance == one_by_one.balance
+
+
 if __name__ == "__main__":
     pytest.main(["contract_tests.py"])
\ No newline at end of file
@@ -185,6 +185,75 @@ def test_receive_call_not_exist_number():
     bill = cust.generate_bill(call_date.month, call_date.year)
     assert bill[1] == pytest.approx(-30)
     
+
+def test_cancel_phone_line_updates_lookup():
+    """ Test that cancelling a line removes it from every lookup """
+    cust = create_single_customer_with_all_lines()
+    call_date = str_to_datetime("2018-01-01 01:01:03")
+    cust.new_month(call_date.month, call_date.year)
+    assert "273-8255" in cust
+    assert cust.get_phone_line("273-8255").get_number() == "273-8255"
+    assert len(cust.get_call_history("273-8255")) == 1
+
+    assert cust.cancel_phone_line("273-8255") == pytest.approx(50)
+    assert "273-8255" not in cust
+    assert cust.get_phone_line("273-8255") is None
+    assert cust.get_phone_numbers() == ['867-5309', '649-2568']
+    assert cust.get_call_history("273-8255") == []
+    assert cust.cancel_phone_line("273-8255") is None
+
+    # Calls to the cancelled number are no longer recorded
+    cust.receive_call(create_call_objects_no_dutation("867-5309", "273-8255",
+                                                      call_date))
+    assert len(cust.get_history()[1]) == 0
+
+    cust.add_phone_line(PhoneLine("123-1234", MTMContract(date(2017, 12, 25))))
+    assert "123-1234" in cust
+    assert len(cust.get_call_history()) == 3
+
+
+def test_get_history_incremental():
+    cust = create_single_customer_with_all_lines()
+    call_date = str_to_datetime("2018-01-01 01:01:03")
+    cust.new_month(call_date.month, call_date.year)
+    first = create_call_objects_no_dutation("867-5309", "111-1111", call_date)
+    cust.make_call(first)
+    history = cust.get_history()
+    assert history[0] == [first]
+    assert history[1] == []
+
+    # A call registered on the line directly is picked up too
+    second = create_call_objects_no_dutation("273-8255", "111-1111", call_date)
+    third = create_call_objects_no_dutation("111-1111", "649-2568", call_date)
+    cust.get_phone_lines()[1].make_call(second)
+    cust.receive_call(third)
+    history = cust.get_history()
+    assert list(history[0]) == [first, second]
+    assert history[1] == [third]
+    assert history[0] + history[1] == [first, second, third]
+
+    # The views are read-only
+    with pytest.raises(AttributeError):
+        history[0].append(third)
+
+    cust.cancel_phone_line("867-5309")
+    assert cust.get_history()[0] == [second]
+
+
+def test_get_history_grouped_by_line():
+    cust = create_single_customer_with_all_lines()
+    call_date = str_to_datetime("2018-01-01 01:01:03")
+    cust.new_month(call_date.month, call_date.year)
+    first = create_call_objects_no_dutation("273-8255", "111-1111", call_date)
+    second = create_call_objects_no_dutation("867-5309", "111-1111", call_date)
+    third = create_call_objects_no_dutation("273-8255", "111-1111", call_date)
+    for call in (first, second, third):
+        cust.make_call(call)
+    # The calls of the first line come first, whatever the order they were
+    # made in, as when the histories are restored line by line
+    assert list(cust.get_history()[0]) == [second, first, third]
+
+
 if __name__ == "__main__":
     pytest.main(["cusomer_tests.py"])
     
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+import eventstream
+from application import create_customers, import_data, process_event_history
+from eventstream import iter_customers, iter_events, stream_data
+
+
+def test_stream_matches_json_load():
+    with open("dataset.json") as o:
+        log = json.load(o)
+    assert list(iter_customers("dataset.json")) == log['customers']
+    assert list(iter_events("dataset.json")) == log['events']
+
+
+def test_stream_small_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(eventstream, 'CHUNK_SIZE', 7)
+    log = {"customers": [{"lines": [{"number": '1"}', "contract": "mtm"}],
+                          "id": 1234}],
+           "other": {"skip": ["[", "]", {"a": "\\\\"}]},
+           "events": [{"type": "sms", "time": "2018-01-01 01:01:01",
+                       "duration": 1234567}, []]}
+    filename = tmp_path / "data.json"
+    filename.write_text(json.dumps(log, indent=1))
+    assert list(iter_customers(str(filename))) == log['customers']
+    assert list(iter_events(str(filename))) == log['events']
+
+
+def test_stream_empty_lists(tmp_path):
+    filename = tmp_path / "data.json"
+    filename.write_text('{"events": [], "customers": [ ]}')
+    assert list(iter_customers(str(filename))) == []
+    assert list(iter_events(str(filename))) == []
+
+
+def test_stream_jsonl(tmp_path):
+    customer = {"lines": [{"number": "861-1710", "contract": "mtm"}],
+                "id": 2247}
+    event = {"type": "call", "src_number": "861-1710",
+             "dst_number": "861-1710", "time": "2018-01-03 02:14:31",
+             "duration": 80, "src_loc": [-79.4, 43.6],
+             "dst_loc": [-79.3, 43.6]}
+    filename = tmp_path / "data.jsonl"
+    filename.write_text(json.dumps(customer) + "\n\n" + json.dumps(event)
+                        + "\n" + json.dumps(event) + "\n")
+    log = stream_data(str(filename))
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    assert len(customers) == 1
+    assert len(customers[0].get_history()[0]) == 2
+
+
+def test_stream_start_event(tmp_path, monkeypatch):
+    monkeypatch.setattr(eventstream, 'CHUNK_SIZE', 64)
+    with open("dataset.json") as o:
+        log = json.load(o)
+    events = log['events'][:50]
+    lines = tmp_path / "data.jsonl"
+    lines.write_text("\n".join(json.dumps(record) for record
+                               in log['customers'][:2] + events) + "\n")
+    small = tmp_path / "data.json"
+    small.write_text(json.dumps({"events": events, "customers": []}))
+    for filename in [str(small), str(lines)]:
+        for start in [0, 1, 17, 49, 50, 60]:
+            assert list(iter_events(filename, start)) == events[start:]
+    assert list(iter_customers(str(lines))) == log['customers'][:2]
+    assert import_data(start_event=20)['events'] == log['events'][20:]
+    assert list(import_data(stream=True, start_event=20)['events']) == \
+        log['events'][20:]
+
+
+def test_import_data_stream_same_result():
+    full = import_data()
+    customers = create_customers(full)
+    process_event_history(full, customers)
+
+    streamed = import_data(stream=True)
+    streamed_customers = create_customers(streamed)
+    process_event_history(streamed, streamed_customers)
+
+    assert len(customers) == len(streamed_customers)
+    for c1, c2 in zip(customers, streamed_customers):
+        assert c1.get_id() == c2.get_id()
+        assert len(c1.get_history()[0]) == len(c2.get_history()[0])
+        assert c1.generate_bill(1, 2018) == c2.generate_bill(1, 2018)
+
+
+if __name__ == '__main__':
+    pytest.main(['eventstream_tests.py'])
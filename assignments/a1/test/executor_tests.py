@@ -0,0 +1,107 @@
+from datetime import datetime
+
+import pytest
+
+import filter as filter_module
+from application import create_customers, import_data, process_event_history
+from call import Call
+from callstore import CallStore, RowList
+from executor import FilterExecutor
+from filter import CustomerFilter, DurationFilter, LocationFilter, ResetFilter
+
+
+def load_calls():
+    log = import_data()
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    return customers, ResetFilter().apply(customers, [], "")
+
+
+def test_chunks():
+    assert FilterExecutor('thread', 3).chunks(10) == [(0, 4), (4, 8), (8, 10)]
+    assert FilterExecutor('thread', 3, 5).chunks(10) == [(0, 5), (5, 10)]
+    assert FilterExecutor().chunks(0) == []
+    with pytest.raises(ValueError):
+        FilterExecutor('gpu')
+
+
+@pytest.mark.parametrize("mode", ["serial", "thread", "process"])
+def test_executor_matches_apply(mode):
+    customers, calls = load_calls()
+    executor = FilterExecutor(mode, 3, 97)
+    cases = [(CustomerFilter(), str(customers[1].get_id())),
+             (DurationFilter(), "L100"),
+             (LocationFilter(), "-79.6, 43.6, -79.3, 43.7")]
+    for f, filter_string in cases:
+        expected = f.apply(customers, calls, filter_string)
+        assert executor.apply(f, customers, calls, filter_string) == expected
+        assert len(executor.timings) == len(executor.chunks(len(calls)))
+    assert executor.apply(DurationFilter(), customers, calls, "bad") is calls
+    assert executor.report()['mode'] == mode
+
+
+def test_executor_process_call_store():
+    customers, calls = load_calls()
+    store = CallStore()
+    rows = RowList(store)
+    for call in calls:
+        rows.append(store.add_call(call))
+    executor = FilterExecutor('process', 2)
+    result = executor.apply(DurationFilter(), customers, rows, "G300")
+    assert result == list(DurationFilter().apply(customers, rows, "G300"))
+
+
+@pytest.mark.parametrize("mode", ["serial", "thread", "process"])
+def test_executor_dedups_across_chunks(mode):
+    customers, calls = load_calls()
+    data = calls[:50] + calls[:50]
+    executor = FilterExecutor(mode, 2)
+    for f, filter_string in [(DurationFilter(), "G100"),
+                             (CustomerFilter(), str(customers[1].get_id()))]:
+        assert executor.apply(f, customers, data, filter_string) == \
+            f.apply(customers, data, filter_string)
+    # Invalid filter strings keep the data as it is, repeats included
+    assert executor.apply(DurationFilter(), customers, data, "bad") is data
+    executor.close()
+
+
+def test_executor_reuses_process_pool():
+    customers, calls = load_calls()
+    executor = FilterExecutor('process', 2, 50)
+    executor.apply(DurationFilter(), customers, calls, "G100")
+    pool = executor._pool
+    # Calls among those the workers were forked with reuse the same pool
+    subset = calls[::3]
+    assert executor.apply(DurationFilter(), customers, subset, "L500") == \
+        DurationFilter().apply(customers, subset, "L500")
+    assert executor._pool is pool
+    # Other calls need new workers
+    other = [Call("861-1710", "386-6346", datetime(2018, 1, 3), 10,
+                  (-79.4, 43.6), (-79.3, 43.7))] + subset
+    assert executor.apply(DurationFilter(), customers, other, "L500") == \
+        DurationFilter().apply(customers, other, "L500")
+    assert executor._pool is not pool
+    executor.close()
+    assert executor._pool is None
+
+
+def test_customer_filter_gathers_calls_once(monkeypatch):
+    customers, calls = load_calls()
+    gathered = []
+    original = filter_module._customer_calls
+
+    def counting(customers, cid):
+        gathered.append(cid)
+        return original(customers, cid)
+    monkeypatch.setattr(filter_module, "_customer_calls", counting)
+    executor = FilterExecutor('serial', 4)
+    cid = str(customers[1].get_id())
+    expected = CustomerFilter().apply(customers, calls, cid)
+    gathered.clear()
+    assert executor.apply(CustomerFilter(), customers, calls, cid) == expected
+    assert len(executor.timings) == 4
+    assert len(gathered) == 1
+
+
+if __name__ == '__main__':
+    pytest.main(['executor_tests.py'])
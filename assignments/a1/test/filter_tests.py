@@ -1,10 +1,15 @@
 import time
 import datetime
 import pytest
+
+import filter
+from callstore import CallStore, RowList
+from spatial import CallGrid
 from call import Call
 from customer import Customer
-from filter import CustomerFilter, DurationFilter, LocationFilter
-from application import create_customers, process_event_history
+from filter import CustomerFilter, DurationFilter, LocationFilter, ResetFilter, \
+    customer_call_index, FilterPipeline
+from application import create_customers, import_data, process_event_history
 from contract import TermContract, MTMContract, PrepaidContract
 from customer import Customer
 from phoneline import PhoneLine
@@ -123,7 +128,247 @@ def test_filter_more_detail():
                 print(result)
                 print(filter_strings[i][j])
             assert len(result) == expected_return_lengths[i][j]
-            
-            
+
+
+
+def test_customer_filter_keeps_data_order():
+    log = import_data()
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    calls = ResetFilter().apply(customers, [], "")
+    data = calls[::-1] + calls[:10]
+    index = customer_call_index(customers)
+
+    for customer in customers[:10]:
+        cid = str(customer.get_id())
+        if len(cid) != 4:
+            continue
+        history = customer.get_history()
+        own = history[0] + history[1]
+        expected = []
+        for call in data:
+            if any(call is c for c in own) and \
+                    not any(call is c for c in expected):
+                expected.append(call)
+        result = CustomerFilter().apply(customers, data, cid)
+        assert result == expected
+        assert CustomerFilter(index).apply(customers, data, cid) == expected
+    assert CustomerFilter(index).apply(customers, data, "0000") is data
+
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_duration_filter_call_store(monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(filter, "numpy", None)
+    log = import_data()
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    calls = ResetFilter().apply(customers, [], "")
+
+    store = CallStore()
+    rows = RowList(store)
+    for call in calls:
+        rows.append(store.add_call(call))
+    # Repeated calls are only returned once
+    data = rows[::-1]
+    data.indices.extend(rows.indices[:20])
+
+    assert DurationFilter().apply(customers, data, "G9X9") is data
+    for filter_string in ["L050", "G300", "G000", "L999", "L000"]:
+        expected = DurationFilter().apply(customers, calls[::-1],
+                                          filter_string)
+        result = DurationFilter().apply(customers, data, filter_string)
+        assert [row.index for row in result] == \
+            [calls.index(call) for call in expected]
+    assert DurationFilter().apply(customers, RowList(store), "L100") == []
+
+
+
+def test_location_filter_grid():
+    log = import_data()
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    calls = ResetFilter().apply(customers, [], "")
+    grid = CallGrid(calls, 16)
+    subset = calls[::3]
+
+    rectangles = ["-79.6, 43.6, -79.3, 43.7",
+                  "-79.697878, 43.576959, -79.196382, 43.799568",
+                  "-79.5, 43.65, -79.5, 43.65",
+                  "-79.9, 43.6, -79.3, 43.7"]
+    # Rectangles with a corner exactly on a call
+    for call in calls[:5]:
+        long, lat = call.src_loc
+        rectangles.append(f"{long}, {lat}, -79.196382, 43.799568")
+        rectangles.append(f"-79.697878, 43.576959, {long}, {lat}")
+    # Calls the grid does not index are checked one by one
+    outside = [Call("861-1710", "386-6346", datetime.datetime(2018, 1, 3), 10,
+                    (-79.5, 43.65), (-79.3, 43.7))]
+    for rectangle in rectangles:
+        for data in [calls, subset, calls[::-1], outside + subset]:
+            expected = LocationFilter().apply(customers, data, rectangle)
+            assert LocationFilter(grid).apply(customers, data, rectangle) \
+                == expected
+    assert LocationFilter(grid).apply(customers, outside + subset,
+                                      "-79.6, 43.6, -79.4, 43.7")[0] \
+        is outside[0]
+
+
+
+class CountingDurationFilter(DurationFilter):
+    """ A DurationFilter that counts how many times it was applied, to a
+    list or to a bitmap """
+    def __init__(self) -> None:
+        super().__init__()
+        self.count = 0
+
+    def apply(self, customers, data, filter_string):
+        self.count += 1
+        return super().apply(customers, data, filter_string)
+
+    def apply_bitmap(self, customers, data, filter_string):
+        self.count += 1
+        return super().apply_bitmap(customers, data, filter_string)
+
+
+def test_filter_pipeline():
+    log = import_data()
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    calls = ResetFilter().apply(customers, [], "")
+    cid = str(customers[1].get_id())
+    rectangle = "-79.6, 43.6, -79.3, 43.7"
+
+    pipeline = FilterPipeline(customers)
+    assert pipeline.result() == calls
+    duration = CountingDurationFilter()
+    pipeline.set_stage(LocationFilter(), rectangle)
+    pipeline.set_stage(duration, "G100")
+    result = pipeline.set_stage(CustomerFilter(), cid)
+    assert [type(f) for f, _ in pipeline.get_stages()] == \
+        [CustomerFilter, CountingDurationFilter, LocationFilter]
+
+    expected = CustomerFilter().apply(customers, calls, cid)
+    expected = DurationFilter().apply(customers, expected, "G100")
+    expected = LocationFilter().apply(customers, expected, rectangle)
+    assert result == expected
+    # Recomputed once when set, and once when the customer stage was added
+    # before it
+    assert duration.count == 2
+
+    # Only the new location stage is computed
+    result = pipeline.set_stage(LocationFilter(), "-79.6, 43.6, -79.5, 43.7")
+    assert duration.count == 2
+    assert result == LocationFilter().apply(
+        customers, expected, "-79.6, 43.6, -79.5, 43.7")
+
+    # Setting the same string again does not recompute anything
+    pipeline.set_stage(duration, "G100")
+    assert duration.count == 2
+    pipeline.set_stage(duration, "L200")
+    assert duration.count == 3
+    assert len(pipeline.get_stages()) == 5
+
+    assert pipeline.set_stage(ResetFilter(), "") == calls
+    assert pipeline.get_stages() == []
+
+
+def test_filter_pipeline_same_type():
+    log = import_data()
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    calls = ResetFilter().apply(customers, [], "")
+    pipeline = FilterPipeline(customers)
+
+    # A second filter of the same type narrows down the first one
+    expected = DurationFilter().apply(customers, calls, "L300")
+    assert pipeline.set_stage(DurationFilter(), "L300") == expected
+    expected = DurationFilter().apply(customers, expected, "G060")
+    assert pipeline.set_stage(DurationFilter(), "G060") == expected
+    assert expected
+    assert all(60 < call.duration < 300 for call in expected)
+
+    # An invalid filter string leaves the result unchanged
+    assert pipeline.set_stage(DurationFilter(), "bad") == expected
+    assert pipeline.set_stage(LocationFilter(), "1, 2") == expected
+    cid = str(customers[0].get_id())
+    expected = CustomerFilter().apply(customers, expected, cid)
+    assert pipeline.set_stage(CustomerFilter(), cid) == expected
+
+
+def test_filter_pipeline_repeated_calls():
+    log = import_data()
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    calls = ResetFilter().apply(customers, [], "")[:60]
+    calls = calls + calls[:30]
+    cid = str(customers[1].get_id())
+    pipeline = FilterPipeline(customers, calls)
+
+    # An invalid filter string keeps the repeats, as applying it would
+    assert pipeline.set_stage(DurationFilter(), "bad") == calls
+    result = pipeline.set_stage(CustomerFilter(), cid)
+    expected = DurationFilter().apply(customers, calls, "bad")
+    assert result == CustomerFilter().apply(customers, expected, cid)
+    assert pipeline.set_stage(DurationFilter(), "G100") == \
+        DurationFilter().apply(customers, result, "G100")
+
+
+def test_filter_pipeline_run_filter():
+    log = import_data()
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    calls = ResetFilter().apply(customers, [], "")
+    ran = []
+
+    def run_filter(f, customers, data, filter_string):
+        ran.append(type(f))
+        return f.apply(customers, data, filter_string)
+    pipeline = FilterPipeline(customers, run_filter=run_filter)
+    rectangle = "-79.6, 43.6, -79.3, 43.7"
+    assert pipeline.set_stage(LocationFilter(), rectangle) == \
+        LocationFilter().apply(customers, calls, rectangle)
+    assert ran == [LocationFilter]
+    assert pipeline.set_stage(ResetFilter(), "") == calls
+    assert ran == [LocationFilter]
+
+
+def test_reset_filter_cached():
+    log = import_data()
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    reset = ResetFilter()
+    first = reset.apply(customers, [], "")
+    assert reset.apply(customers, [], "") is first
+    assert reset.apply(customers[:], [], "") is first
+    # Each filter keeps its own result
+    assert ResetFilter().apply(customers, [], "") is not first
+
+    # A new call invalidates the cached list
+    call = Call("861-1710", "386-6346", datetime.datetime(2018, 1, 3), 10,
+                (-79.4, 43.6), (-79.3, 43.7))
+    customers[0].get_phone_lines()[0].make_call(call)
+    second = reset.apply(customers, [], "")
+    assert second is not first
+    assert len(second) == len(first) + 1
+    assert reset.apply(customers[:3], [], "") is not second
+
+    # So does adding a line
+    third = reset.apply(customers, [], "")
+    customers[0].add_phone_line(
+        PhoneLine("000-0000", MTMContract(datetime.date(2017, 12, 25))))
+    assert reset.apply(customers, [], "") is not third
+
+    # And replacing a customer in the same list
+    fourth = reset.apply(customers, [], "")
+    customers[0] = customers[1]
+    fifth = reset.apply(customers, [], "")
+    assert fifth is not fourth
+    assert fifth == ResetFilter().apply(customers, [], "")
+
+
 if __name__ == "__main__":
     pytest.main(["filter_tests.py"])
\ No newline at end of file
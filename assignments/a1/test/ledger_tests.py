@@ -0,0 +1,93 @@
+import pytest
+
+from application import build_number_index, create_customers, import_data, \
+    process_event_history
+from bill import Bill
+from billing import billing_months
+import ledger
+from ledger import BillLedger, LedgerBill, LedgerBills
+
+
+def test_ledger_bill_matches_bill():
+    bill = Bill()
+    bill_ledger = BillLedger()
+    bill_ledger.add()
+    ledger_bill = LedgerBill(bill_ledger, bill_ledger.add())
+    for b in (bill, ledger_bill):
+        b.set_rates("TERM", 0.1)
+        b.add_fixed_cost(20)
+        b.add_fixed_cost(300)
+        b.add_free_minutes(100)
+        b.add_billed_minutes(7)
+    assert ledger_bill.type == "TERM"
+    assert ledger_bill.get_cost() == bill.get_cost()
+    assert ledger_bill.get_summary() == bill.get_summary()
+    assert bill_ledger.billed_min.tolist() == [0, 7]
+
+
+def test_ledger_bill_keeps_int_fields():
+    bill = Bill()
+    bill_ledger = BillLedger()
+    ledger_bill = LedgerBill(bill_ledger, bill_ledger.add())
+    # Prepaid bills start from an int balance, and a new bill from int rates
+    assert repr(ledger_bill.get_summary()) == repr(bill.get_summary())
+    for b in (bill, ledger_bill):
+        b.set_rates("PREPAID", 0.025)
+        b.fixed_cost = -100
+    assert repr(ledger_bill.get_summary()) == repr(bill.get_summary())
+    for b in (bill, ledger_bill):
+        b.add_fixed_cost(25.0)
+        b.add_billed_minutes(3)
+    assert repr(ledger_bill.get_summary()) == repr(bill.get_summary())
+    assert isinstance(ledger_bill.fixed_cost, float)
+
+
+def test_ledger_bills_mapping():
+    bills = LedgerBills(BillLedger())
+    first = bills.add((1, 2018))
+    first.add_billed_minutes(3)
+    bills.add((2, 2018))
+    assert list(bills) == [(1, 2018), (2, 2018)]
+    assert (1, 2018) in bills and (3, 2018) not in bills
+    assert bills[(1, 2018)].billed_min == 3
+    assert bills[(2, 2018)].billed_min == 0
+    assert len(bills.ledger) == 2
+
+
+def test_ledger_customers_match_bills():
+    log = import_data("dataset.json")
+    expected = create_customers(log)
+    process_event_history(log, expected, build_number_index(expected)[0])
+    customers = create_customers(log, BillLedger())
+    process_event_history(log, customers, build_number_index(customers)[0])
+
+    assert billing_months(customers) == billing_months(expected)
+    for month, year in billing_months(customers):
+        for c, e in zip(customers, expected):
+            assert c.generate_bill(month, year) == e.generate_bill(month, year)
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_ledger_totals_match_generate_bill(monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(ledger, "numpy", None)
+    log = import_data("dataset.json")
+    expected = create_customers(log)
+    process_event_history(log, expected, build_number_index(expected)[0])
+    bill_ledger = BillLedger()
+    customers = create_customers(log, bill_ledger)
+    process_event_history(log, customers, build_number_index(customers)[0])
+
+    for month, year in billing_months(customers):
+        groups = [[line.bills.rows[(month, year)]
+                   for line in c.get_phone_lines()
+                   if (month, year) in line.bills] for c in customers]
+        totals = [e.generate_bill(month, year)[1] for e in expected]
+        assert repr(bill_ledger.totals(groups)) == repr(totals)
+    # No bills add up to an int, as in Customer.generate_bill
+    assert bill_ledger.totals([[], [0]]) == [0, bill_ledger.cost(0)]
+    assert isinstance(bill_ledger.totals([[]])[0], int)
+    assert bill_ledger.totals([]) == []
+
+
+if __name__ == "__main__":
+    pytest.main(["ledger_tests.py"])
@@ -0,0 +1,69 @@
+import pytest
+
+from application import build_number_index, create_customers, import_data, \
+    process_event_history
+from callstore import CallStore
+from registry import NumberRegistry
+
+
+def test_registry_dense_ids():
+    registry = NumberRegistry(["111-1111", "222-2222"])
+    assert registry.intern("333-3333") == 2
+    assert registry.intern("111-1111") == 0
+    assert registry.get("444-4444") is None
+    assert registry.number(1) == "222-2222"
+    assert len(registry) == 3
+    # The same string object is returned for equal numbers
+    number = "".join(["222", "-", "2222"])
+    assert registry.canonical(number) is registry.number(1)
+
+
+def test_process_event_history_interns_numbers():
+    log = import_data()
+    registry = NumberRegistry()
+    customers = create_customers(log, registry=registry)
+    process_event_history(log, customers, build_number_index(customers)[0],
+                          registry=registry)
+    for customer in customers:
+        for line in customer.get_phone_lines():
+            assert line.get_number() is registry.canonical(line.get_number())
+            for call in line.get_monthly_history()[0]:
+                assert call.src_number is line.get_number()
+                assert call.dst_number is registry.canonical(call.dst_number)
+
+    expected = create_customers(log)
+    process_event_history(log, expected)
+    assert [c.generate_bill(2, 2018) for c in customers] == \
+        [c.generate_bill(2, 2018) for c in expected]
+
+
+def test_store_shares_registry():
+    registry = NumberRegistry(["111-1111"])
+    store = CallStore(registry)
+    log = import_data()
+    customers = create_customers(log, registry=registry)
+    process_event_history(log, customers, store=store)
+    assert store.numbers is registry.numbers
+    row = store.row(0)
+    assert registry.number(row.src_id) == row.src_number
+    assert registry.number(row.dst_id) == row.dst_number
+
+
+def test_store_adds_calls_by_id(monkeypatch):
+    registry = NumberRegistry()
+    store = CallStore(registry)
+    log = import_data()
+    customers = create_customers(log, registry=registry)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the numbers should not be interned again")
+    monkeypatch.setattr(store, "number_id", fail)
+    process_event_history(log, customers, store=store)
+    calls = [event for event in log['events'] if event['type'] == 'call']
+    assert len(store) == len(calls)
+    assert [(row.src_number, row.dst_number) for row in store.rows()] == \
+        [(call['src_number'], call['dst_number']) for call in calls]
+
+
+if __name__ == "__main__":
+    pytest.main(["registry_tests.py"])
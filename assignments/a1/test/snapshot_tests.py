@@ -0,0 +1,159 @@
+import os
+import shutil
+
+import pytest
+
+from application import build_number_index, create_customers, import_data, \
+    process_event_history
+from billing import billing_months
+from callstore import CallStore, save_columns
+from ledger import BillLedger
+from registry import NumberRegistry
+from snapshot import load_snapshot, load_state, save_snapshot, \
+    snapshot_paths
+import snapshot
+
+
+def ingest(filename="dataset.json"):
+    log = import_data(filename)
+    customers = create_customers(log)
+    store = CallStore()
+    process_event_history(log, customers, build_number_index(customers)[0],
+                          store=store)
+    return customers, store
+
+
+def call_values(calls):
+    return [str(call) for call in calls]
+
+
+@pytest.mark.parametrize("ledger", [None, BillLedger()])
+def test_snapshot_round_trip(tmp_path, ledger):
+    customers, store = ingest()
+    filename = str(tmp_path / "dataset.snapshot")
+    save_snapshot(filename, customers, store)
+    loaded, loaded_store = load_snapshot(filename, ledger)
+
+    assert len(loaded_store) == len(store)
+    assert list(loaded_store.times) == list(store.times)
+    assert loaded_store.numbers == store.numbers
+    for month, year in billing_months(customers):
+        assert [c.generate_bill(month, year) for c in loaded] == \
+            [c.generate_bill(month, year) for c in customers]
+    for c, e in zip(loaded, customers):
+        assert call_values(c.get_history()[0]) == \
+            call_values(e.get_history()[0])
+        assert call_values(c.get_history()[1]) == \
+            call_values(e.get_history()[1])
+        for line, expected in zip(c.get_phone_lines(), e.get_phone_lines()):
+            history = line.get_call_history()
+            assert history.get_months() == expected.get_call_history().get_months()
+            for month, year in history.get_months():
+                assert call_values(line.get_monthly_history(month, year)[0]) == \
+                    call_values(expected.get_monthly_history(month, year)[0])
+
+
+def test_snapshot_with_mapped_columns(tmp_path):
+    customers, store = ingest()
+    filename = str(tmp_path / "dataset.snapshot")
+    save_snapshot(filename, customers, store, str(tmp_path / "columns"))
+    loaded, loaded_store = load_snapshot(filename)
+    assert isinstance(loaded_store.times, memoryview)
+    assert [str(row) for row in loaded_store.rows()] == \
+        [str(row) for row in store.rows()]
+    assert [c.generate_bill(2, 2018) for c in loaded] == \
+        [c.generate_bill(2, 2018) for c in customers]
+    assert call_values(loaded[0].get_history()[0]) == \
+        call_values(customers[0].get_history()[0])
+
+
+def test_snapshot_columns_generations(tmp_path):
+    customers, store = ingest()
+    filename = str(tmp_path / "dataset.snapshot")
+    columns_dir = tmp_path / "columns"
+    save_snapshot(filename, customers, store, str(columns_dir))
+    first_store = load_snapshot(filename)[1]
+    expected = [str(row) for row in store.rows()]
+
+    # Saving again does not touch the columns already mapped
+    for _ in range(3):
+        save_snapshot(filename, customers, store, str(columns_dir))
+    assert [str(row) for row in first_store.rows()] == expected
+    assert sorted(os.listdir(columns_dir)) == ["gen-000002", "gen-000003"]
+    assert [str(row) for row in load_snapshot(filename)[1].rows()] == \
+        expected
+
+    # Columns that do not match the snapshot are refused
+    smaller = CallStore()
+    smaller.add_call(store.row(0))
+    save_columns(smaller, str(columns_dir / "gen-000003"))
+    with pytest.raises(ValueError):
+        load_snapshot(filename)
+
+
+def test_snapshot_requires_call_store(tmp_path):
+    log = import_data()
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    with pytest.raises(ValueError):
+        save_snapshot(str(tmp_path / "x.snapshot"), customers, CallStore())
+
+
+def test_load_state_reuses_snapshot(tmp_path, monkeypatch):
+    filename = str(tmp_path / "dataset.snapshot")
+    customers, _ = load_state("dataset.json", filename)
+    assert os.path.exists(filename)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the dataset should not be processed again")
+    monkeypatch.setattr(snapshot, "process_event_history", fail)
+    loaded, _ = load_state("dataset.json", filename)
+    assert [c.generate_bill(1, 2018) for c in loaded] == \
+        [c.generate_bill(1, 2018) for c in customers]
+
+
+def test_load_state_replaces_unusable_snapshot(tmp_path):
+    filename = str(tmp_path / "dataset.snapshot")
+    columns_dir = str(tmp_path / "columns")
+    expected, _ = ingest()
+    bills = [c.generate_bill(1, 2018) for c in expected]
+
+    # A snapshot of an older format
+    with open(filename, "wb") as o:
+        o.write(b"A1SNAP01" + bytes(8))
+    customers, store = load_state("dataset.json", filename, columns_dir)
+    assert [c.generate_bill(1, 2018) for c in customers] == bills
+    assert isinstance(load_snapshot(filename)[1].times, memoryview)
+
+    # A snapshot whose columns are gone
+    for name in os.listdir(columns_dir):
+        shutil.rmtree(os.path.join(columns_dir, name))
+    ledger = BillLedger()
+    customers, store = load_state("dataset.json", filename, columns_dir,
+                                  ledger=ledger)
+    assert [c.generate_bill(1, 2018) for c in customers] == bills
+    assert len(ledger) > 0
+
+    # An empty file
+    open(filename, "wb").close()
+    registry = NumberRegistry()
+    customers, store = load_state("dataset.json", filename,
+                                  registry=registry)
+    assert store.registry is registry
+    line = customers[0].get_phone_lines()[0]
+    assert line.get_number() is registry.canonical(line.get_number())
+
+
+def test_snapshot_paths():
+    data = os.path.join("data", "dataset.json")
+    assert snapshot_paths(data) == (os.path.join("data", "dataset.snapshot"),
+                                    os.path.join("data", "dataset.columns"))
+    assert snapshot_paths(data, "cache") == \
+        (os.path.join("cache", "dataset.snapshot"),
+         os.path.join("cache", "dataset.columns"))
+    assert snapshot_paths("dataset.json") == ("dataset.snapshot",
+                                              "dataset.columns")
+
+
+if __name__ == "__main__":
+    pytest.main(["snapshot_tests.py"])
@@ -22,9 +22,7 @@ longitude/latitude coordinates and pixel coordinates on the pygame window.
 
 DO NOT CHANGE ANY CODE IN THIS FILE, unless instructed in the handout.
 """
-import math
 import os
-import threading
 import time
 from tkinter import *
 from typing import Optional, Union, Callable, Any
@@ -33,7 +31,10 @@ import pygame
 
 from call import Drawable, Call
 from customer import Customer
-from filter import Filter, DurationFilter, CustomerFilter, LocationFilter, ResetFilter
+from executor import FilterExecutor
+from filter import Filter, DurationFilter, CustomerFilter, LocationFilter, \
+    ResetFilter, FilterPipeline
+from spatial import CallGrid
 
 # ----------------------------------------------------------------------------
 # NOTE: You do not need to understand any of the visualization details from
@@ -52,8 +53,17 @@ MAP_MAX = (-79.196382, 43.576959)
 # Window size
 SCREEN_SIZE = (1000, 700)
 
-# Thread settings for Task 5
-NUM_THREADS = 1
+# Executor settings for Task 5: how the chunks of a filter application are
+# run ('serial', 'thread' or 'process'), by how many workers, and how many
+# calls are in each chunk (None splits the calls evenly between the workers).
+# To spread CPU-bound filters over processes, use 'process' with e.g.
+# os.cpu_count() workers.
+EXECUTOR_MODE = 'serial'
+NUM_WORKERS = 1
+CHUNK_SIZE = None
+
+# Whether to print the time taken by each chunk after applying a filter
+SHOW_TIMINGS = False
 
 
 def get_filter(unicode: str) -> Optional[Filter]:
@@ -82,11 +92,20 @@ class Visualizer:
     #   on the pygame window.
     # _map: the Map object responsible for converting between longitude/latitude
     #   coordinates and the pixels of the visualization window.
+    # _executor: the FilterExecutor used to apply filters.
+    # _pipeline: the FilterPipeline over all the calls, whose stages are set
+    #   by the filters the user applies, and the spatial index over those
+    #   calls used by location filters; or None before the first filter.
+    # _shown: the calls the pipeline returned last, while they are the calls
+    #   shown; or None when the calls shown did not come from the pipeline.
     _uiscreen: pygame.Surface
     _screen: pygame.Surface
     _mouse_down: bool
     _map: 'Map'
     _quit: bool
+    _executor: FilterExecutor
+    _pipeline: Optional[tuple[FilterPipeline, CallGrid]]
+    _shown: Optional[list[Call]]
     r: Tk
 
     def __init__(self) -> None:
@@ -125,6 +144,9 @@ class Visualizer:
         self._screen.fill(WHITE)
         self._mouse_down = False
         self._map = Map(SCREEN_SIZE)
+        self._executor = FilterExecutor(EXECUTOR_MODE, NUM_WORKERS, CHUNK_SIZE)
+        self._pipeline = None
+        self._shown = None
 
         # Initial render
         self.render_drawables([])
@@ -143,6 +165,29 @@ class Visualizer:
         # Show the new image
         pygame.display.flip()
 
+    def get_pipeline(self, customers: list[Customer]) \
+            -> tuple[FilterPipeline, CallGrid]:
+        """Returns the filter pipeline over all the calls of <customers>, and
+        the spatial index over those calls, building them the first time they
+        are needed
+        """
+        if self._pipeline is None or \
+                self._pipeline[0].customers is not customers:
+            pipeline = FilterPipeline(customers,
+                                      run_filter=self._executor.apply)
+            self._pipeline = (pipeline, CallGrid(pipeline.index.calls))
+            self._shown = pipeline.index.calls
+        return self._pipeline
+
+    def print_timings(self) -> None:
+        """Prints the time taken by each chunk of the last filter application
+        """
+        report = self._executor.report()
+        print("Executor:", report['mode'], "workers:", report['workers'],
+              "chunks:", report['chunks'])
+        for i, elapsed in enumerate(report['timings']):
+            print(f"  chunk {i}: {elapsed:.4f}s")
+
     def has_quit(self) -> bool:
         """Returns if the program has received the quit command
         """
@@ -187,57 +232,40 @@ class Visualizer:
                 f = get_filter(event.unicode)
 
                 if f is not None:
-                    def result_wrapper(fun: Callable[[list[Customer],
-                                                      list[Call],
-                                                      str], list[Call]],
-                                       customers: list[Customer],
-                                       data: list[Call],
-                                       filter_string: str,
-                                       res: list) -> None:
-                        """A final wrapper to return the result of the operation
-                        """
-                        res.append(fun(customers, data, filter_string))
-
-                    def threading_wrapper(customers: list[Customer],
-                                          data: list[Call],
-                                          filter_string: str) -> list[Call]:
-                        """A wrapper for the application of filters with
-                        threading
+                    pipeline, grid = self.get_pipeline(customers)
+                    if isinstance(f, LocationFilter):
+                        f = LocationFilter(grid)
+
+                    def pipeline_wrapper(customers: list[Customer],
+                                         data: list[Call],
+                                         filter_string: str) -> list[Call]:
+                        """A wrapper applying the filter to the calls shown,
+                        <data>. When they are the result of the pipeline,
+                        the filter is added as a stage of the pipeline, so
+                        that only that stage and the ones after it are
+                        applied. Otherwise (e.g. the last entry window was
+                        closed without applying its filter), the filter is
+                        applied to <data> until the next reset. Either way,
+                        filters that cannot work on bitmaps are run by the
+                        executor configured for Task 5
                         """
-                        chk_cls = math.ceil(
-                            (len(data) + NUM_THREADS - 1) / NUM_THREADS)
-                        print("Num_threads:", NUM_THREADS)
-                        print("Chunk_calls:", chk_cls)
-                        threads = []
-                        results = []
-                        for i in range(NUM_THREADS):
-                            res = []
-                            results.append(res)
-                            t = threading.Thread(target=result_wrapper,
-                                                 args=(f.apply,
-                                                       customers,
-                                                       data[i * chk_cls:
-                                                            (i + 1) * chk_cls],
-                                                       filter_string,
-                                                       res))
-                            t.daemon = True
-                            t.start()
-                            threads.append(t)
-                            # f.apply(customers, data, filter_string)
-                        # Wait to finish
-                        for t in threads:
-                            t.join()
-
-                        # Now reconstruct the data
-                        new_data = []
-                        for res in results:
-                            new_data.extend(res[0])
-                        return new_data
+                        self._executor.timings = []
+                        if isinstance(f, ResetFilter) or \
+                                data is self._shown or data == self._shown:
+                            result = pipeline.set_stage(f, filter_string)
+                            self._shown = result
+                        else:
+                            result = self._executor.apply(f, customers, data,
+                                                          filter_string)
+                            self._shown = None
+                        if SHOW_TIMINGS:
+                            self.print_timings()
+                        return result
 
                     new_drawables = self.entry_window(str(f),
                                                       customers,
                                                       drawables,
-                                                      threading_wrapper)
+                                                      pipeline_wrapper)
 
                 # Perform the billing for a selected customer:
                 if event.unicode == "m":
@@ -298,6 +326,8 @@ class Visualizer:
                 self._mouse_down = False
             elif event.type == pygame.MOUSEMOTION:
                 self.set_event_button_motion()
+        if self._quit:
+            self._executor.close()
         return new_drawables
 
     def entry_window(self, field: str,
@@ -470,12 +500,11 @@ if __name__ == '__main__':
         'allowed-import-modules': [
             'doctest', 'python_ta', 'typing',
             'tkinter', 'os', 'pygame',
-            'threading', 'math', 'time',
-            'customer', 'call', 'filter',
+            'time', 'customer', 'call', 'filter', 'executor', 'spatial',
         ],
         'allowed-io': [
-            'entry_window', 'callback_wrapper', 'threading_wrapper',
-            '__init__', 'handle_window_events'
+            'entry_window', 'callback_wrapper', 'pipeline_wrapper',
+            '__init__', 'handle_window_events', 'print_timings'
         ],
         'disable': ['R0915', 'W0613', 'W0401', 'R0201'],
         'generated-members': 'pygame.*'